@@ -1,3 +1,5 @@
+import { useToast } from "vue-toastification";
+
 import { baseAdjust } from "../core/http";
 import type { Asset } from "../core/models/types";
 import { socketManager } from "../core/socket";
@@ -5,6 +7,8 @@ import { router } from "../router";
 
 import { assetStore } from "./state";
 
+const toast = useToast();
+
 export const socket = socketManager.socket("/pa_assetmgmt");
 
 let disConnected = false;
@@ -42,6 +46,10 @@ socket.on("Asset.Upload.Finish", (data: { asset: Asset; parent: number }) => {
     assetStore.addAsset(data.asset, data.parent);
     assetStore.resolveUpload(data.asset.name);
 });
+socket.on("Asset.Upload.Fail", (data: { uuid: string; name: string; reason: string }) => {
+    assetStore.failUpload(data.uuid, data.name);
+    toast.error(`Could not upload ${data.name}: ${data.reason}`);
+});
 
 socket.on("Asset.Export.Finish", (uuid: string) => {
     window.open(baseAdjust(`/static/temp/${uuid}.paa`));
@@ -1,13 +1,19 @@
 import type { ComputedRef } from "vue";
 import { computed } from "vue";
+import { useToast } from "vue-toastification";
 
+import { http } from "../core/http";
 import type { Asset } from "../core/models/types";
 import { Store } from "../core/store";
-import { uuidv4 } from "../core/utils";
 import { router } from "../router";
 
 import { socket } from "./socket";
 
+const toast = useToast();
+
+// Number of times an interrupted upload is resumed before giving up
+const MAX_UPLOAD_RETRIES = 5;
+
 interface AssetState {
     modalActive: boolean;
 
@@ -29,6 +35,8 @@ class AssetStore extends Store<AssetState> {
     parentFolder: ComputedRef<number>;
     currentFilePath: ComputedRef<string>;
 
+    private failedUploads = new Set<string>();
+
     constructor() {
         super();
         this.currentFolder = computed(() => {
@@ -188,6 +196,11 @@ class AssetStore extends Store<AssetState> {
         }
     }
 
+    failUpload(uuid: string, file: string): void {
+        this.failedUploads.add(uuid);
+        this.resolveUpload(file);
+    }
+
     async upload(fls?: FileList, target?: number, targetOffset: string[] = []): Promise<void> {
         if (fls === undefined) {
             const files = (document.getElementById("files")! as HTMLInputElement).files;
@@ -198,38 +211,61 @@ class AssetStore extends Store<AssetState> {
         this._state.expectedUploads += fls.length;
 
         if (target === undefined) target = this.currentFolder.value;
-        const CHUNK_SIZE = 100000;
+        const chunkSize: number = await (await http.get("/api/server/upload_limit")).json();
         for (const file of fls) {
-            const uuid = uuidv4();
-            const slices = Math.ceil(file.size / CHUNK_SIZE);
             this._state.pendingUploads.push(file.name);
-            for (let slice = 0; slice < slices; slice++) {
-                await new Promise((resolve) => {
-                    const fr = new FileReader();
-                    fr.readAsArrayBuffer(
-                        file.slice(
-                            slice * CHUNK_SIZE,
-                            slice * CHUNK_SIZE + Math.min(CHUNK_SIZE, file.size - slice * CHUNK_SIZE),
-                        ),
-                    );
-                    fr.onload = (_e) => {
-                        socket.emit(
-                            "Asset.Upload",
-                            {
-                                name: file.name,
-                                directory: target,
-                                newDirectories: targetOffset,
-                                data: fr.result,
-                                slice,
-                                totalSlices: slices,
-                                uuid,
-                            },
-                            resolve,
-                        );
-                    };
-                });
+            const error = await this.uploadFile(file, target, targetOffset, chunkSize);
+            if (error !== undefined) {
+                this.resolveUpload(file.name);
+                toast.error(`Could not upload ${file.name}: ${error}`);
+            }
+        }
+    }
+
+    // Sends the file in chunks of chunkSize, resuming from the last received offset when a request fails.
+    // Returns the reason when the upload did not succeed.
+    private async uploadFile(
+        file: File,
+        directory: number,
+        newDirectories: string[],
+        chunkSize: number,
+    ): Promise<string | undefined> {
+        const response = await http.postJson("/api/assets/upload", {
+            name: file.name,
+            directory,
+            newDirectories,
+            length: file.size,
+            sid: socket.id,
+        });
+        if (!response.ok) return response.statusText;
+        const { id } = (await response.json()) as { id: string };
+        const url = `/api/assets/upload/${id}`;
+
+        let offset = 0;
+        let retries = 0;
+        while (offset < file.size) {
+            // The server already reported the reason with Asset.Upload.Fail
+            if (this.failedUploads.has(id)) return undefined;
+
+            let result = await http
+                .patch(url, file.slice(offset, offset + chunkSize), {
+                    "Content-Type": "application/offset+octet-stream",
+                    "Upload-Offset": offset.toString(),
+                })
+                .catch(() => undefined);
+            // 409 means that the server has a different offset than we have, so resume from the server's offset
+            if (result === undefined || result.status === 409) {
+                if (retries++ >= MAX_UPLOAD_RETRIES) return "the connection to the server was lost";
+                await new Promise((resolve) => setTimeout(resolve, 1000 * retries));
+                result = await http.head(url).catch(() => undefined);
+                if (result === undefined) continue;
+            } else {
+                retries = 0;
             }
+            if (!result.ok) return result.statusText;
+            offset = Number.parseInt(result.headers.get("Upload-Offset") ?? "0");
         }
+        return undefined;
     }
 }
 export const assetStore = new AssetStore();
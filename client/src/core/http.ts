@@ -10,6 +10,8 @@ export function getStaticImg(img: string): string {
 export const http = {
     delete: _delete,
     get,
+    head,
+    patch,
     patchJson,
     post,
     postJson,
@@ -20,6 +22,23 @@ async function get(url: string): Promise<Response> {
     return fetch(import.meta.env.BASE_URL + url);
 }
 
+async function head(url: string): Promise<Response> {
+    if (url.startsWith("/")) url = url.slice(1);
+    return fetch(import.meta.env.BASE_URL + url, {
+        method: "HEAD",
+    });
+}
+
+// eslint-disable-next-line @typescript-eslint/explicit-module-boundary-types
+async function patch(url: string, body?: any, headers?: Record<string, string>): Promise<Response> {
+    if (url.startsWith("/")) url = url.slice(1);
+    return fetch(import.meta.env.BASE_URL + url, {
+        method: "PATCH",
+        headers,
+        body,
+    });
+}
+
 // eslint-disable-next-line @typescript-eslint/explicit-module-boundary-types
 async function post(url: string, body?: any): Promise<Response> {
     if (url.startsWith("/")) url = url.slice(1);
@@ -5,6 +5,15 @@ export interface AssetList {
     [inode: string]: AssetList | AssetFile[];
 }
 
+export interface AssetListPatch {
+    // Folder names from the root folder
+    path: string[];
+    // New files of the folder at path
+    files?: AssetFile[];
+    // New contents of the folder at path, null if the folder was removed
+    folder?: AssetList | null;
+}
+
 export interface AssetFile {
     id: number;
     name: string;
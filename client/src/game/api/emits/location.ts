@@ -16,6 +16,21 @@ export const sendLocationArchive = wrapSocket<number>("Location.Archive");
 export const sendLocationUnarchive = wrapSocket<number>("Location.Unarchive");
 export const sendLocationClone = wrapSocket<{ location: number; room: string }>("Location.Clone");
 
+export interface LocationVersion {
+    location: number;
+    version: number;
+    epoch: string;
+}
+
+export const sendLocationLoad = wrapSocket<{
+    snapshot: boolean;
+    progressive: boolean;
+    viewport: { width: number; height: number };
+    versions: boolean;
+    // Only the changes since this version are requested, sid is the previous connection of this client
+    resync?: LocationVersion & { sid: string };
+}>("Location.Load");
+
 export async function requestSpawnInfo(location: number): Promise<ServerAsset[]> {
     socket.emit("Location.Spawn.Info.Get", location);
     return new Promise((resolve: (value: ServerAsset[]) => void) => socket.once("Location.Spawn.Info", resolve));
@@ -8,6 +8,7 @@ import { wrapSocket } from "../../helpers";
 import { socket } from "../../socket";
 
 export const sendShapeAdd = wrapSocket<{ shape: ServerShape; temporary: boolean }>("Shape.Add");
+export const sendShapesAdd = wrapSocket<{ shapes: ServerShape[]; temporary: boolean }>("Shapes.Add");
 export const sendRemoveShapes = (data: { uuids: string[]; temporary: boolean }): void => {
     if (data.uuids.length === 0) {
         if (process.env.NODE_ENV === "production") {
@@ -32,14 +32,15 @@ import "./gbsocket"; // Start tuio listener
 
 import { toGP } from "../../core/geometry";
 import { SyncMode } from "../../core/models/types";
-import type { AssetList } from "../../core/models/types";
+import type { AssetList, AssetListPatch } from "../../core/models/types";
 import { debugLayers } from "../../localStorageHelpers";
 import { router } from "../../router";
 import { coreStore } from "../../store/core";
 import { locationStore } from "../../store/location";
 import { convertAssetListToMap } from "../assets/utils";
 import { clearGame } from "../clear";
-import { addServerFloor } from "../floor/server";
+import { addServerFloor, addStreamedShapes, clearShapeStream, finishShapeStream } from "../floor/server";
+import type { StreamedShape } from "../floor/server";
 import { getShapeFromGlobal } from "../id";
 import type { GlobalId } from "../id";
 import type { ServerFloor } from "../models/general";
@@ -51,9 +52,39 @@ import { floorState } from "../systems/floors/state";
 import { gameSystem } from "../systems/game";
 import { playerSystem } from "../systems/players";
 import { positionSystem } from "../systems/position";
+import { locationSettingsState } from "../systems/settings/location/state";
 
+import { sendLocationLoad } from "./emits/location";
+import type { LocationVersion } from "./emits/location";
 import { socket } from "./socket";
 
+interface LocationSnapshot {
+    complete: boolean;
+    room?: unknown;
+    players: unknown;
+    playerOptions: unknown;
+    location: unknown;
+    locationSettings?: unknown;
+    locations: unknown;
+    floors: ServerFloor[];
+    initiative?: unknown;
+    labels?: unknown;
+    labelFilters?: unknown;
+    notes: unknown;
+    markers: unknown;
+    assets?: unknown;
+    gameboards: unknown[];
+}
+
+// The last known version of the active location, a reconnect only requests the changes made since then
+let locationVersion: LocationVersion | undefined;
+let lastClientId: string | undefined;
+
+// Snapshots and resyncs contain regular events, these are handled by their usual listeners
+function replayEvent(event: string, data?: unknown): void {
+    for (const listener of socket.listeners(event)) listener(data);
+}
+
 // Core WS events
 
 socket.on("connect", () => {
@@ -65,12 +96,28 @@ socket.on("connect", () => {
         socket.emit("Client.Gameboard.Set", coreStore.state.boardId);
     }
 
-    socket.emit("Location.Load");
-    coreStore.setLoading(true);
+    const resync =
+        locationVersion !== undefined && lastClientId !== undefined
+            ? { ...locationVersion, sid: lastClientId }
+            : undefined;
+    lastClientId = socket.id;
+    sendLocationLoad({
+        snapshot: true,
+        progressive: true,
+        viewport: { width: window.innerWidth, height: window.innerHeight },
+        versions: true,
+        resync,
+    });
+    if (resync === undefined) coreStore.setLoading(true);
 });
 socket.on("disconnect", (reason: string) => {
     gameSystem.setConnected(false);
     console.log("Disconnected");
+    // The game was left on purpose, the next connection starts from scratch
+    if (reason === "io client disconnect") {
+        locationVersion = undefined;
+        lastClientId = undefined;
+    }
     if (reason === "io server disconnect") socket.open();
 });
 socket.on("connect_error", async (error: any) => {
@@ -90,8 +137,54 @@ socket.on("redirect", async (destination: string) => {
 
 // Bootup events
 
-socket.on("CLEAR", () => clearGame(false));
-socket.on("PARTIAL-CLEAR", () => clearGame(true));
+socket.on("CLEAR", () => {
+    clearShapeStream();
+    clearGame(false);
+});
+socket.on("PARTIAL-CLEAR", () => {
+    clearShapeStream();
+    clearGame(true);
+});
+
+socket.on("Location.Snapshot", (snapshot: LocationSnapshot) => {
+    replayEvent(snapshot.complete ? "CLEAR" : "PARTIAL-CLEAR");
+    if (snapshot.room !== undefined) replayEvent("Room.Info.Set", snapshot.room);
+    replayEvent("Players.Info.Set", snapshot.players);
+    replayEvent("Player.Options.Set", snapshot.playerOptions);
+    replayEvent("Location.Set", snapshot.location);
+    if (snapshot.locationSettings !== undefined) replayEvent("Locations.Settings.Set", snapshot.locationSettings);
+    replayEvent("Board.Locations.Set", snapshot.locations);
+    for (const floor of snapshot.floors) replayEvent("Board.Floor.Set", floor);
+    if (snapshot.initiative !== undefined) replayEvent("Initiative.Set", snapshot.initiative);
+    if (snapshot.labels !== undefined) {
+        replayEvent("Labels.Set", snapshot.labels);
+        replayEvent("Labels.Filters.Set", snapshot.labelFilters);
+    }
+    replayEvent("Notes.Set", snapshot.notes);
+    replayEvent("Markers.Set", snapshot.markers);
+    if (snapshot.assets !== undefined) replayEvent("Asset.List.Set", snapshot.assets);
+    for (const gameboard of snapshot.gameboards) replayEvent("Client.Gameboard.Set", gameboard);
+});
+
+// Shapes outside of the initial viewport are sent after the rest of the location
+socket.on("Board.Shapes.Stream", (data: { location: number; shapes: StreamedShape[] }) => {
+    if (data.location !== locationSettingsState.raw.activeLocation) return;
+    addStreamedShapes(data.shapes);
+});
+
+socket.on("Board.Shapes.Stream.End", (location: number) => {
+    if (location !== locationSettingsState.raw.activeLocation) return;
+    finishShapeStream();
+});
+
+socket.on("Location.Version.Set", (data: LocationVersion) => {
+    locationVersion = data;
+});
+
+socket.on("Location.Resync", (data: LocationVersion & { events: [string, unknown][] }) => {
+    for (const [event, eventData] of data.events) replayEvent(event, eventData);
+    locationVersion = { location: data.location, version: data.version, epoch: data.epoch };
+});
 
 socket.on("Board.Locations.Set", (locationInfo: Location[]) => {
     locationStore.setLocations(locationInfo, false);
@@ -130,6 +223,10 @@ socket.on("Asset.List.Set", (assets: AssetList) => {
     gameSystem.setAssets(convertAssetListToMap(assets));
 });
 
+socket.on("Asset.List.Patch", (patches: AssetListPatch[]) => {
+    gameSystem.patchAssets(patches);
+});
+
 socket.on("Temp.Clear", (shapeIds: GlobalId[]) => {
     const shapes = shapeIds.map((s) => getShapeFromGlobal(s)!).filter((s) => s !== undefined);
     deleteShapes(shapes, SyncMode.NO_SYNC);
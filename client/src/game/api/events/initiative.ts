@@ -1,9 +1,10 @@
 import type { GlobalId } from "../../id";
-import type { InitiativeEffect, InitiativeSettings, InitiativeSort } from "../../models/initiative";
+import type { InitiativeEffect, InitiativePatch, InitiativeSettings, InitiativeSort } from "../../models/initiative";
 import { initiativeStore } from "../../ui/initiative/state";
 import { socket } from "../socket";
 
 socket.on("Initiative.Set", (data: InitiativeSettings) => initiativeStore.setData(data));
+socket.on("Initiative.Entry.Patch", (data: InitiativePatch) => initiativeStore.patchData(data));
 socket.on("Initiative.Active.Set", (isActive: boolean) => initiativeStore.setActive(isActive));
 socket.on("Initiative.Value.Set", (data: { shape: GlobalId; value: number }) =>
     initiativeStore.setInitiative(data.shape, data.value, false),
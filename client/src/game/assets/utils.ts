@@ -1,4 +1,10 @@
-import type { AssetFile, AssetList, AssetListMap, ReadonlyAssetListMap } from "../../core/models/types";
+import type {
+    AssetFile,
+    AssetList,
+    AssetListMap,
+    AssetListPatch,
+    ReadonlyAssetListMap,
+} from "../../core/models/types";
 import { alphSort } from "../../core/utils";
 
 export function convertAssetListToMap(assets: AssetList): AssetListMap {
@@ -17,6 +23,31 @@ export function convertAssetListToMap(assets: AssetList): AssetListMap {
     return new Map([...m].sort((a, b) => alphSort(a[0], b[0])));
 }
 
+// Applies the changes in place, changes to folders that are not known are ignored
+export function patchAssetListMap(assets: AssetListMap, patches: AssetListPatch[]): void {
+    for (const patch of patches) {
+        const path = [...patch.path];
+        const name = patch.files === undefined ? path.pop() : undefined;
+
+        let folder: AssetListMap | undefined = assets;
+        for (const part of path) folder = folder?.get(part) as AssetListMap | undefined;
+        if (folder === undefined) continue;
+
+        if (patch.files !== undefined) {
+            folder.set("__files", patch.files.sort((a, b) => alphSort(a.name, b.name)));
+        } else if (name === undefined) {
+            continue;
+        } else if (patch.folder === null || patch.folder === undefined) {
+            folder.delete(name);
+        } else {
+            folder.set(name, convertAssetListToMap(patch.folder));
+            const entries = [...folder].sort((a, b) => alphSort(a[0], b[0]));
+            folder.clear();
+            for (const [key, value] of entries) folder.set(key, value);
+        }
+    }
+}
+
 export function filterAssetMap(assets: ReadonlyAssetListMap, filter = ""): AssetListMap {
     const m = new Map();
     for (const [key, value] of assets.entries()) {
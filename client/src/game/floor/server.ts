@@ -1,3 +1,4 @@
+import { InvalidationMode, SyncMode } from "../../core/models/types";
 import { hasGroup, addNewGroup } from "../groups";
 import type { ILayer } from "../interfaces/layer";
 import { createCanvas } from "../layers/canvas";
@@ -9,11 +10,23 @@ import { GridLayer } from "../layers/variants/grid";
 import { Layer } from "../layers/variants/layer";
 import { MapLayer } from "../layers/variants/map";
 import { LayerName } from "../models/floor";
-import type { Floor } from "../models/floor";
+import type { Floor, FloorId } from "../models/floor";
 import type { ServerFloor, ServerLayer } from "../models/general";
 import { groupToClient } from "../models/groups";
+import type { ServerShape } from "../models/shapes";
+import { createShapeFromDict } from "../shapes/create";
 import { floorSystem } from "../systems/floors";
-import { visionState } from "../vision/state";
+import { VisibilityMode, visionState } from "../vision/state";
+
+export interface StreamedShape {
+    // position of the shape in its layer once all shapes are loaded
+    index: number;
+    shape: ServerShape;
+}
+
+// Toggle composites need their variants to exist, so they are only added once the stream has ended
+const streamedComposites = new Map<ILayer, StreamedShape[]>();
+const streamedFloors = new Set<FloorId>();
 
 export function addServerFloor(serverFloor: ServerFloor): void {
     const floor: Floor = {
@@ -86,3 +99,56 @@ function addServerLayer(layerInfo: ServerLayer, floor: Floor): void {
     // Load layer shapes
     layer.setServerShapes(layerInfo.shapes);
 }
+
+export function addStreamedShapes(shapes: StreamedShape[]): void {
+    for (const { index, shape } of shapes) {
+        const floor = floorSystem.getFloor({ name: shape.floor });
+        const layer = floor === undefined ? undefined : floorSystem.getLayer(floor, shape.layer);
+        if (floor === undefined || layer === undefined) {
+            console.log(`Shape with unknown layer ${shape.layer} could not be added`);
+            continue;
+        }
+        streamedFloors.add(floor.id);
+
+        const composites = streamedComposites.get(layer) ?? [];
+        if (shape.type_ === "togglecomposite") {
+            composites.push({ index, shape });
+            streamedComposites.set(layer, composites);
+        } else {
+            // The index counts the composites that are held back
+            addServerShapeAt(layer, shape, index - composites.length);
+        }
+    }
+}
+
+export function finishShapeStream(): void {
+    for (const [layer, composites] of streamedComposites) {
+        for (const { index, shape } of composites) addServerShapeAt(layer, shape, index);
+    }
+    for (const floorId of streamedFloors) {
+        visionState.recalculateVision(floorId);
+        visionState.recalculateMovement(floorId);
+    }
+    clearShapeStream();
+}
+
+export function clearShapeStream(): void {
+    streamedComposites.clear();
+    streamedFloors.clear();
+}
+
+function addServerShapeAt(layer: ILayer, serverShape: ServerShape, index: number): void {
+    const shape = createShapeFromDict(serverShape);
+    if (shape === undefined) {
+        console.log(`Shape with unknown type ${serverShape.type_} could not be added`);
+        return;
+    }
+    // Vision is recalculated once the stream has ended
+    let invalidate = InvalidationMode.NO;
+    if (visionState.state.mode === VisibilityMode.TRIANGLE_ITERATIVE) {
+        invalidate = InvalidationMode.WITH_LIGHT;
+    }
+    layer.addShape(shape, SyncMode.NO_SYNC, invalidate);
+    layer.moveShapeOrder(shape, index, SyncMode.NO_SYNC);
+    layer.invalidate(true);
+}
@@ -36,6 +36,18 @@ export type InitiativeSettings = {
     isActive: boolean;
 };
 
+export type InitiativeEntryPatch = Partial<RawInitiativeData> & { shape: GlobalId };
+
+export type InitiativePatch = {
+    // Changed or added entries, existing entries only contain the changed fields
+    entries?: InitiativeEntryPatch[];
+    removed?: GlobalId[];
+    // All entries in their new order
+    order?: GlobalId[];
+    turn?: number;
+    sort?: InitiativeSort;
+};
+
 export enum InitiativeEffectMode {
     ActiveAndHover = "active",
     Always = "always",
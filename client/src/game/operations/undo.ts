@@ -1,6 +1,7 @@
 import { toGP, Vector } from "../../core/geometry";
 import type { GlobalPoint } from "../../core/geometry";
 import { SyncMode } from "../../core/models/types";
+import { sendShapesAdd } from "../api/emits/shape/core";
 import { getLocalId, getShape } from "../id";
 import type { LocalId } from "../id";
 import type { LayerName } from "../models/floor";
@@ -134,7 +135,12 @@ function handleLayerMove(shapes: LocalId[], from: LayerName, to: LayerName, dire
 
 function handleShapeRemove(shapes: ServerShape[], direction: "undo" | "redo"): void {
     if (direction === "undo") {
-        for (const shape of shapes) addShape(shape, SyncMode.FULL_SYNC);
+        const added: ServerShape[] = [];
+        for (const shape of shapes) {
+            const sh = addShape(shape, SyncMode.NO_SYNC);
+            if (sh !== undefined && !sh.preventSync) added.push(sh.asDict());
+        }
+        if (added.length > 0) sendShapesAdd({ shapes: added, temporary: false });
     } else {
         deleteShapes(
             shapes.map((s) => getShape(getLocalId(s.uuid)!)!),
@@ -42,6 +42,12 @@ import { computeVisibility } from "../vision/te";
 import type { SHAPE_TYPE } from "./types";
 import { BoundingRect } from "./variants/simple/boundingRect";
 
+// Asset templates can still contain the older list of [key, value] pairs
+function parseOptions(options: string): Partial<ServerShapeOptions> {
+    const data = JSON.parse(options);
+    return Array.isArray(data) ? Object.fromEntries(data) : data;
+}
+
 export abstract class Shape implements IShape {
     // Used to create class instance from server shape data
     abstract readonly type: SHAPE_TYPE;
@@ -508,7 +514,7 @@ export abstract class Shape implements IShape {
             is_token: props.isToken,
             is_invisible: props.isInvisible,
             is_defeated: props.isDefeated,
-            options: JSON.stringify(Object.entries(this.options)),
+            options: JSON.stringify(this.options),
             badge: this.badge,
             show_badge: props.showBadge,
             is_locked: props.isLocked,
@@ -523,8 +529,7 @@ export abstract class Shape implements IShape {
         };
     }
     fromDict(data: ServerShape): void {
-        const options: Partial<ServerShapeOptions> =
-            data.options === undefined ? {} : Object.fromEntries(JSON.parse(data.options));
+        const options: Partial<ServerShapeOptions> = data.options === undefined ? {} : parseOptions(data.options);
 
         this._layer = data.layer;
         this._floor = floorSystem.getFloor({ name: data.floor })!.id;
@@ -1,7 +1,7 @@
 import { subtractP, Vector } from "../../core/geometry";
 import { SyncMode, InvalidationMode } from "../../core/models/types";
 import { uuidv4 } from "../../core/utils";
-import { sendRemoveShapes } from "../api/emits/shape/core";
+import { sendRemoveShapes, sendShapesAdd } from "../api/emits/shape/core";
 import { addGroupMembers, createNewGroupForShapes } from "../groups";
 import { getGlobalId, getLocalId } from "../id";
 import type { GlobalId } from "../id";
@@ -129,16 +129,23 @@ export function pasteShapes(targetLayer?: LayerName): readonly IShape[] {
     }
 
     // Finalize
+    // The shapes are synced together afterwards, to send them to the server in a single message
+    const addedShapes: ServerShape[] = [];
     for (const serverShape of serverShapes) {
         const shape = createShapeFromDict(serverShape);
         if (shape === undefined) continue;
 
-        layer.addShape(shape, SyncMode.FULL_SYNC, InvalidationMode.WITH_LIGHT);
+        layer.addShape(shape, SyncMode.NO_SYNC, InvalidationMode.WITH_LIGHT);
+        if (!shape.preventSync) addedShapes.push(shape.asDict());
 
         if (!(shape.options.skipDraw ?? false)) {
             selectedSystem.push(shape.id);
         }
     }
+    if (addedShapes.length > 0) {
+        sendShapesAdd({ shapes: addedShapes, temporary: false });
+        addOperation({ type: "shapeadd", shapes: addedShapes });
+    }
 
     for (const [group, shapes] of Object.entries(groupShapes)) {
         addGroupMembers(
@@ -1,7 +1,8 @@
 import { registerSystem } from "..";
 import type { System } from "..";
-import type { AssetListMap } from "../../../core/models/types";
+import type { AssetListMap, AssetListPatch } from "../../../core/models/types";
 import { sendRoomLock } from "../../api/emits/room";
+import { patchAssetListMap } from "../../assets/utils";
 import { updateFogColour } from "../../colour";
 import { floorSystem } from "../floors";
 
@@ -58,6 +59,10 @@ class GameSystem implements System {
     setAssets(assets: AssetListMap): void {
         $.assets = assets;
     }
+
+    patchAssets(patches: AssetListPatch[]): void {
+        patchAssetListMap($.assets, patches);
+    }
 }
 
 export const gameSystem = new GameSystem();
@@ -19,7 +19,7 @@ import {
 import { getGlobalId, getLocalId, getShape } from "../../id";
 import type { GlobalId, LocalId } from "../../id";
 import { InitiativeSort } from "../../models/initiative";
-import type { InitiativeData, InitiativeEffect, InitiativeSettings } from "../../models/initiative";
+import type { InitiativeData, InitiativeEffect, InitiativePatch, InitiativeSettings } from "../../models/initiative";
 import { setCenterPosition } from "../../position";
 import { accessSystem } from "../../systems/access";
 import { accessState } from "../../systems/access/state";
@@ -96,6 +96,38 @@ class InitiativeStore extends Store<InitiativeState> {
         this._state.sort = data.sort;
     }
 
+    patchData(patch: InitiativePatch): void {
+        let data = this.getDataSet();
+        if (patch.removed !== undefined) {
+            for (const globalId of patch.removed) this.removeInitiative(globalId, false);
+        }
+        for (const { shape: globalId, ...shapeData } of patch.entries ?? []) {
+            const actor = data.find((a) => a.globalId === globalId);
+            if (actor === undefined) {
+                data.push({
+                    effects: [],
+                    isGroup: false,
+                    isVisible: false,
+                    ...shapeData,
+                    globalId,
+                    localId: getLocalId(globalId, false),
+                });
+            } else {
+                Object.assign(actor, shapeData);
+            }
+        }
+        if (patch.order !== undefined) {
+            const actors = new Map(data.map((a) => [a.globalId, a]));
+            data = patch.order
+                .map((globalId) => actors.get(globalId))
+                .filter((a): a is InitiativeData => a !== undefined);
+            if (this._state.editLock !== undefined) this._state.newData = data;
+            else this._state.locationData = data;
+        }
+        if (patch.sort !== undefined) this._state.sort = patch.sort;
+        if (patch.turn !== undefined) this._state.turnCounter = patch.turn;
+    }
+
     // Ideally we get rid of this
     _forceUpdate(): void {
         this._state.locationData = [...this._state.locationData];
@@ -0,0 +1,21 @@
+from aiohttp import web
+
+from ....backup import BackupInProgress, backup_manager
+
+
+async def collect(_request: web.Request) -> web.Response:
+    backups = [
+        {"name": backup.name, "size": backup.stat().st_size}
+        for backup in backup_manager.get_backups()
+    ]
+    return web.json_response({"backups": backups, **backup_manager.get_stats()})
+
+
+async def create(_request: web.Request) -> web.Response:
+    try:
+        backup = await backup_manager.backup()
+    except BackupInProgress:
+        return web.HTTPConflict(reason="A backup is already running.")
+    except Exception:
+        return web.HTTPInternalServerError(reason="Backup did not succeed.")
+    return web.json_response({"name": backup.name, "size": backup.stat().st_size})
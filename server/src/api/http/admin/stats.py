@@ -0,0 +1,76 @@
+import asyncio
+from typing import Any, Dict, Tuple
+from uuid import uuid4
+
+from aiohttp import web
+
+from ....backup import backup_manager
+from ....cluster import cluster
+from ....config import config
+from ....db_executor import db_executor
+from ....serialization import serialization_pool
+from ....state.board import board_cache
+from ....state.transfers import transfer_manager
+
+# How long the admin API waits for the stats of the other workers
+CLUSTER_STATS_TIMEOUT = 2
+
+# request id => (stats per worker, set when all workers answered)
+_requests: Dict[str, Tuple[Dict[int, Any], asyncio.Event]] = {}
+
+
+def get_stats() -> Dict[str, Any]:
+    return {
+        "serialization": serialization_pool.get_stats(),
+        "database": db_executor.get_stats(),
+        "backups": backup_manager.get_stats(),
+        "transfers": transfer_manager.get_stats(),
+        "boardCache": {
+            "size": board_cache.size,
+            "maxSize": board_cache.max_size,
+            "hits": board_cache.hits,
+            "misses": board_cache.misses,
+        },
+    }
+
+
+async def collect(_request: web.Request) -> web.Response:
+    if not cluster.enabled:
+        return web.json_response(get_stats())
+
+    # The admin API only runs on the first worker, the others are asked through the broker
+    assert cluster.worker_id is not None
+    request_id = uuid4().hex
+    stats = {cluster.worker_id: get_stats()}
+    answered = asyncio.Event()
+    _requests[request_id] = (stats, answered)
+    cluster.publish("stats.request", request_id)
+    try:
+        await asyncio.wait_for(answered.wait(), CLUSTER_STATS_TIMEOUT)
+    except asyncio.TimeoutError:
+        # A worker that is restarting is left out
+        pass
+    finally:
+        del _requests[request_id]
+
+    return web.json_response(
+        {"workers": {str(worker): stats[worker] for worker in sorted(stats)}}
+    )
+
+
+@cluster.on("stats.request")
+async def _send_stats(request_id: str) -> None:
+    cluster.publish("stats.response", (request_id, cluster.worker_id, get_stats()))
+
+
+@cluster.on("stats.response")
+async def _receive_stats(message: Tuple[str, int, Dict[str, Any]]) -> None:
+    request_id, worker, worker_stats = message
+    request = _requests.get(request_id)
+    if request is None:
+        return
+
+    stats, answered = request
+    stats[worker] = worker_stats
+    if len(stats) >= config.getint("Webserver", "workers", fallback=1):
+        answered.set()
@@ -3,6 +3,7 @@ import secrets
 from aiohttp import web
 
 from ....models import User
+from ....state.board import board_cache
 
 
 async def collect(_request: web.Request) -> web.Response:
@@ -26,4 +27,5 @@ async def remove(request: web.Request) -> web.Response:
         user.delete_instance(recursive=True)
     except:
         return web.HTTPBadRequest(reason="User removal did not succeed.")
+    board_cache.clear()
     return web.HTTPOk()
@@ -0,0 +1,259 @@
+import asyncio
+import re
+from functools import partial
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+from typing_extensions import TypedDict
+from uuid import uuid4
+
+from aiohttp import hdrs, web
+from aiohttp.abc import AbstractStreamWriter
+from aiohttp.helpers import ETag
+from aiohttp_security import check_authorized
+from multidict import CIMultiDict
+
+from ...cluster import cluster
+from ...models import User
+from ...state.asset import asset_state
+from ...state.transfers import TransferLimitExceeded, transfer_manager
+from ...upload import PendingUpload
+from ...utils import ASSETS_DIR
+from ..socket.asset_manager import process_upload, send_upload_failure
+from ..socket.asset_manager.common import UploadInfo
+
+# The request body of an upload is written to disk in pieces of this size
+READ_CHUNK_SIZE = 64 * 1024
+
+# Asset files are named by the hash of their content, so they never change
+ASSET_CACHE_CONTROL = "public, max-age=31536000, immutable"
+ASSET_NAME_PATTERN = re.compile(r"[0-9A-Za-z]+")
+
+
+class ResumableUpload(TypedDict):
+    info: UploadInfo
+    user: int
+    sid: str
+    length: int
+    file: PendingUpload
+    busy: bool
+
+
+resumable_uploads: Dict[str, ResumableUpload] = {}
+
+
+def drop_upload(upload_id: str) -> None:
+    transfer_manager.remove("upload", upload_id)
+    upload = resumable_uploads.pop(upload_id, None)
+    if upload is not None:
+        upload["file"].discard()
+
+
+async def evict_upload(upload_id: str) -> None:
+    upload = resumable_uploads.get(upload_id)
+    drop_upload(upload_id)
+    if upload is not None:
+        await send_upload_failure(
+            upload["sid"], upload_id, upload["info"]["name"], "The upload timed out."
+        )
+
+
+def get_offset_headers(upload: ResumableUpload) -> Dict[str, str]:
+    return {
+        "Upload-Offset": str(upload["file"].size),
+        "Upload-Length": str(upload["length"]),
+        "Cache-Control": "no-store",
+    }
+
+
+async def get_upload(request: web.Request) -> ResumableUpload:
+    user: User = await check_authorized(request)
+    upload = resumable_uploads.get(request.match_info["id"])
+    if upload is None:
+        raise web.HTTPNotFound()
+    if upload["user"] != user.id:
+        raise web.HTTPForbidden()
+    return upload
+
+
+async def create(request: web.Request):
+    """
+    Starts an upload of `length` bytes.
+
+    The data is sent with PATCH requests to the returned location, each starting at the current `Upload-Offset`.
+    If a request is interrupted, a HEAD request returns the offset from which the upload can be resumed.
+    Once all data is received, the assets are created as if the file was uploaded over the asset socket `sid`.
+    """
+    user: User = await check_authorized(request)
+
+    data = await request.json()
+    try:
+        sid = data["sid"]
+        length = int(data["length"])
+        info: UploadInfo = {
+            "uuid": "",
+            "name": data["name"],
+            "directory": data["directory"],
+            "newDirectories": data.get("newDirectories", []),
+        }
+    except (KeyError, TypeError, ValueError):
+        return web.HTTPBadRequest(reason="Incomplete upload request.")
+    if length <= 0:
+        return web.HTTPBadRequest(reason="The file is empty.")
+    try:
+        if asset_state.get_user(sid) != user:
+            return web.HTTPForbidden()
+    except KeyError:
+        return web.HTTPBadRequest(reason="Unknown asset connection.")
+
+    upload_id = uuid4().hex
+    if cluster.enabled:
+        # The router uses the prefix to send all requests of the upload to this worker
+        upload_id = f"w{cluster.worker_id}.{upload_id}"
+    info["uuid"] = upload_id
+
+    upload: ResumableUpload = {
+        "info": info,
+        "user": user.id,
+        "sid": sid,
+        "length": length,
+        "file": PendingUpload(),
+        "busy": False,
+    }
+    resumable_uploads[upload_id] = upload
+    transfer_manager.add("upload", upload_id, user.id, partial(evict_upload, upload_id))
+
+    return web.json_response(
+        {"id": upload_id},
+        status=201,
+        headers={
+            "Location": f"{request.path}/{upload_id}",
+            **get_offset_headers(upload),
+        },
+    )
+
+
+async def get_offset(request: web.Request):
+    upload = await get_upload(request)
+    return web.Response(headers=get_offset_headers(upload))
+
+
+async def append(request: web.Request):
+    upload_id = request.match_info["id"]
+    upload = await get_upload(request)
+    file = upload["file"]
+
+    if upload["busy"]:
+        return web.HTTPConflict(
+            reason="The upload is already receiving data.",
+            headers=get_offset_headers(upload),
+        )
+    try:
+        offset = int(request.headers["Upload-Offset"])
+    except (KeyError, ValueError):
+        return web.HTTPBadRequest(reason="Missing Upload-Offset header.")
+    if offset != file.size:
+        return web.HTTPConflict(
+            reason="Upload-Offset does not match the received data.",
+            headers=get_offset_headers(upload),
+        )
+
+    upload["busy"] = True
+    try:
+        async for data in request.content.iter_chunked(READ_CHUNK_SIZE):
+            # The upload can have been cancelled while the data was being received
+            if resumable_uploads.get(upload_id) is not upload:
+                return web.HTTPNotFound()
+            if file.size + len(data) > upload["length"]:
+                drop_upload(upload_id)
+                return web.HTTPBadRequest(reason="More data than announced.")
+            try:
+                transfer_manager.reserve("upload", upload_id, len(data))
+            except TransferLimitExceeded as e:
+                drop_upload(upload_id)
+                return web.HTTPInsufficientStorage(reason=str(e))
+            file.append(data)
+    except ConnectionResetError:
+        # The client went away, it can resume from the data that was received
+        return web.HTTPNoContent(headers=get_offset_headers(upload))
+    finally:
+        upload["busy"] = False
+
+    if file.size < upload["length"]:
+        return web.HTTPNoContent(headers=get_offset_headers(upload))
+
+    # All data is present
+    try:
+        asset_state.get_user(upload["sid"])
+    except KeyError:
+        drop_upload(upload_id)
+        return web.HTTPGone(reason="The asset manager that started the upload is gone.")
+    del resumable_uploads[upload_id]
+    transfer_manager.remove("upload", upload_id)
+    # Creating the assets should not be interrupted when the client disconnects
+    await asyncio.shield(process_upload(upload["info"], file, upload["sid"]))
+
+    return web.HTTPNoContent(headers=get_offset_headers(upload))
+
+
+async def cancel(request: web.Request):
+    await get_upload(request)
+    drop_upload(request.match_info["id"])
+    return web.HTTPNoContent()
+
+
+class AssetFileResponse(web.FileResponse):
+    """
+    FileResponse for a file in the assets folder.
+
+    The hash of the file is used as its (strong) ETag, instead of the modification time that FileResponse uses.
+    Range requests and sending the file (with sendfile where possible) are left to FileResponse.
+    """
+
+    def __init__(self, path: Path, file_hash: str, **kwargs: Any) -> None:
+        super().__init__(path, **kwargs)
+        self.file_hash = file_hash
+        self.headers[hdrs.CACHE_CONTROL] = ASSET_CACHE_CONTROL
+
+    @property
+    def etag(self) -> Optional[ETag]:
+        return ETag(value=self.file_hash)
+
+    @etag.setter
+    def etag(self, value: Any) -> None:
+        # FileResponse sets an ETag based on the modification time, which is replaced by the hash
+        self.headers[hdrs.ETAG] = f'"{self.file_hash}"'
+
+    def _matches(self, etags: Tuple[ETag, ...]) -> bool:
+        return any(etag.value in ("*", self.file_hash) for etag in etags)
+
+    async def prepare(self, request: web.BaseRequest) -> Optional[AbstractStreamWriter]:
+        if_match = request.if_match
+        if_none_match = request.if_none_match
+        if if_match is None and if_none_match is None:
+            return await super().prepare(request)
+
+        if if_match is not None and not self._matches(if_match):
+            self.set_status(web.HTTPPreconditionFailed.status_code)
+            return await web.StreamResponse.prepare(self, request)
+        if if_none_match is not None and self._matches(if_none_match):
+            self.set_status(web.HTTPNotModified.status_code)
+            self._length_check = False
+            self.etag = self.file_hash
+            return await web.StreamResponse.prepare(self, request)
+
+        # The ETag conditions are answered, FileResponse would compare them with its own ETag
+        headers = CIMultiDict(request.headers)
+        headers.popall(hdrs.IF_MATCH, None)
+        headers.popall(hdrs.IF_NONE_MATCH, None)
+        return await super().prepare(request.clone(headers=headers))
+
+
+async def get_file(request: web.Request):
+    file_hash = request.match_info["file_hash"]
+    if not ASSET_NAME_PATTERN.fullmatch(file_hash):
+        raise web.HTTPNotFound()
+
+    path = ASSETS_DIR / file_hash
+    if not path.is_file():
+        raise web.HTTPNotFound()
+    return AssetFileResponse(path, file_hash)
@@ -1,7 +1,8 @@
 import asyncio
 import io
 from datetime import datetime
-from typing import Dict, List, Optional, cast
+from functools import partial
+from typing import Dict, List, Optional, Tuple, cast
 from typing_extensions import TypedDict
 
 from aiohttp import web
@@ -10,9 +11,12 @@ from aiohttp_security import check_authorized
 from ...app import sio
 from ...config import config
 from ...export.campaign import export_campaign, import_campaign
+from ...logs import logger
 from ...models import Location, LocationOptions, PlayerRoom, Room, User
 from ...models.db import db
 from ...models.role import Role
+from ...state.board import board_cache
+from ...state.transfers import TransferLimitExceeded, transfer_manager
 from ..socket.constants import DASHBOARD_NS
 
 
@@ -149,6 +153,7 @@ async def delete(request: web.Request):
             return web.HTTPBadRequest()
 
         room.delete_instance(True)
+        board_cache.clear()
         return web.HTTPOk()
     else:
         pr = (
@@ -218,14 +223,27 @@ class ImportData(TypedDict):
     sid: Optional[str]
 
 
-import_mapping: Dict[str, ImportData] = {}
+# Imports are keyed by (user id, name), users can pick the same name independently
+import_mapping: Dict[Tuple[int, str], ImportData] = {}
+
+
+async def evict_import(key: Tuple[int, str]):
+    import_data = import_mapping.pop(key, None)
+    if import_data is None or import_data["sid"] is None:
+        return
+    await sio.emit(
+        "Campaign.Import.Done",
+        {"success": False, "reason": "The upload timed out."},
+        room=import_data["sid"],
+        namespace=DASHBOARD_NS,
+    )
 
 
 async def import_info(request: web.Request):
     if not config.getboolean("General", "enable_export"):
         return web.HTTPForbidden(reason="Import is disabled by the server.")
 
-    await check_authorized(request)
+    user: User = await check_authorized(request)
 
     name = request.match_info["name"]
 
@@ -245,13 +263,13 @@ async def import_info(request: web.Request):
             reason="Bad Request: something went wrong with this import request. (Chunk Length is not an integer)"
         )
 
-    import_mapping[name] = {
+    key = (user.id, name)
+    import_mapping[key] = {
         "totalLength": length,
         "chunks": [None for _ in range(length)],
         "sid": data.get("sid", None),
     }
-
-    # todo: some timer / or other condition to clear the import_mapping
+    transfer_manager.add("import", key, user.id, partial(evict_import, key))
 
     return web.HTTPOk()
 
@@ -268,23 +286,40 @@ async def import_chunk(request: web.Request):
     except ValueError:
         return web.HTTPBadRequest()
 
-    print(f"Got chunk {chunk} for {name}")
+    logger.debug(f"Got chunk {chunk} for {name}")
 
-    if name not in import_mapping:
+    key = (user.id, name)
+    if key not in import_mapping:
         return web.HTTPNotFound()
-    if not (0 <= chunk < import_mapping[name]["totalLength"]):
+    import_data = import_mapping[key]
+    if not (0 <= chunk < import_data["totalLength"]):
         return web.HTTPBadRequest()
 
     data = await request.read()
 
-    import_mapping[name]["chunks"][chunk] = data
-    sid = import_mapping[name]["sid"]
+    # The import can have been dropped while the chunk was being received
+    if import_mapping.get(key) is not import_data:
+        return web.HTTPNotFound()
+
+    try:
+        transfer_manager.reserve(
+            "import", key, len(data) - len(import_data["chunks"][chunk] or b"")
+        )
+    except TransferLimitExceeded as e:
+        del import_mapping[key]
+        transfer_manager.remove("import", key)
+        return web.HTTPInsufficientStorage(reason=str(e))
+
+    import_data["chunks"][chunk] = data
+    sid = import_data["sid"]
 
     await sio.emit("Campaign.Import.Chunk", chunk, room=sid, namespace=DASHBOARD_NS)
 
-    chunks = import_mapping[name]["chunks"]
+    chunks = import_data["chunks"]
     if all(chunks):
-        print(f"Got all chunks for {name}")
+        logger.info(f"Got all chunks for {name}")
+        del import_mapping[key]
+        transfer_manager.remove("import", key)
         await asyncio.create_task(
             import_campaign(
                 user,
@@ -292,6 +327,5 @@ async def import_chunk(request: web.Request):
                 sid=sid,
             )
         )
-        del import_mapping[name]
 
     return web.HTTPOk()
@@ -2,6 +2,7 @@ from aiohttp import web
 from aiohttp_security import check_authorized, forget
 
 from ...models import User
+from ...state.board import board_cache
 
 
 async def set_email(request: web.Request):
@@ -23,6 +24,7 @@ async def set_password(request: web.Request):
 async def delete_account(request: web.Request):
     user: User = await check_authorized(request)
     user.delete_instance(recursive=True)
+    board_cache.clear()
     response = web.HTTPOk()
     await forget(request, response)
     return response
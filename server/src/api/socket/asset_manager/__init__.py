@@ -1,4 +1,3 @@
-import hashlib
 import io
 import json
 import os
@@ -7,8 +6,9 @@ import tarfile
 import tempfile
 import time
 from collections import defaultdict
+from functools import partial
 from pathlib import Path
-from typing import cast, Dict, List, Optional, Union
+from typing import Any, cast, Dict, List, Optional, Tuple, Union
 from typing_extensions import TypedDict
 from uuid import uuid4
 
@@ -17,14 +17,20 @@ from aiohttp_security import authorized_userid
 
 from .... import auth
 from ....app import app, sio
+from ....cluster import cluster
+from ....db_executor import db_executor
 from ....logs import logger
 from ....models import Asset
+from ....models.asset import get_structure_patch
 from ....models.user import User
-from ....state.asset import asset_state
+from ....state.asset import asset_state, asset_tree_cache
+from ....state.board import board_cache
 from ....state.game import game_state
+from ....state.transfers import TransferLimitExceeded, transfer_manager
+from ....upload import PendingUpload, SlicedUpload, UploadError
 from ....utils import ASSETS_DIR, TEMP_DIR
 from ..constants import ASSET_NS, GAME_NS
-from .common import UploadData
+from .common import UploadData, UploadInfo
 from .ddraft import handle_ddraft_file
 
 
@@ -42,14 +48,37 @@ class AssetExport(TypedDict):
 
 
 async def update_live_game(user: User):
-    for sid, pr in game_state._sid_map.items():
-        if pr.player == user:
-            await sio.emit(
-                "Asset.List.Set",
-                Asset.get_user_structure(user),
-                room=sid,
-                namespace=GAME_NS,
-            )
+    """
+    Sends the changes to the asset tree of the user to their game clients.
+
+    The other workers only invalidated their cached tree (see AssetTreeCache.refresh),
+    so they are sent the same update for their own clients.
+    """
+    old_tree, tree = asset_tree_cache.refresh(user)
+    if old_tree is None:
+        event, data = "Asset.List.Set", tree
+    else:
+        # The game clients already have the cached tree, only send what changed
+        event, data = "Asset.List.Patch", get_structure_patch(old_tree, tree)
+        if len(data) == 0:
+            return
+
+    cluster.publish("asset.update", (user.id, event, data))
+    await send_live_game_update(user, event, data)
+
+
+async def send_live_game_update(user: User, event: str, data: Any):
+    for sid in game_state.get_sids(player=user):
+        if game_state.is_local(sid):
+            await sio.emit(event, data, room=sid, namespace=GAME_NS)
+
+
+@cluster.on("asset.update")
+async def _update_remote_live_game(message: Tuple[int, str, Any]):
+    user_id, event, data = message
+    user = User.get_or_none(id=user_id)
+    if user is not None:
+        await send_live_game_update(user, event, data)
 
 
 @sio.on("connect", namespace=ASSET_NS)
@@ -68,6 +97,10 @@ async def disconnect(sid):
     if not asset_state.has_sid(sid):
         return
 
+    for uuid, upload in list(asset_state.pending_file_upload_cache.items()):
+        if upload.sid == sid:
+            drop_upload(uuid)
+
     await asset_state.remove_sid(sid)
 
 
@@ -127,7 +160,9 @@ async def create_folder(sid: str, data):
     parent = data.get("parent", None)
     if parent is None:
         parent = Asset.get_root_folder(user).id
-    asset = Asset.create(name=data["name"], owner=user, parent=parent)
+    asset = await db_executor.write(
+        Asset.create, name=data["name"], owner=user.id, parent=parent
+    )
     await sio.emit(
         "Folder.Create",
         {"asset": asset.as_dict(), "parent": parent},
@@ -143,14 +178,15 @@ async def move_inode(sid: str, data):
     user = asset_state.get_user(sid)
     target = data.get("target", None)
     if target is None:
-        target = Asset.get_root_folder(user)
+        target = Asset.get_root_folder(user).id
 
     asset = Asset.get_by_id(data["inode"])
     if asset.owner != user:
         logger.warning(f"{user.name} attempted to move files it doesn't own.")
         return
-    asset.parent = target
-    asset.save()
+    await db_executor.write(
+        Asset.update(parent=target).where(Asset.id == asset.id).execute
+    )
     await update_live_game(user)
 
 
@@ -162,8 +198,9 @@ async def assetmgmt_rename(sid: str, data):
     if asset.owner != user:
         logger.warning(f"{user.name} attempted to rename a file it doesn't own.")
         return
-    asset.name = data["name"]
-    asset.save()
+    await db_executor.write(
+        Asset.update(name=data["name"]).where(Asset.id == asset.id).execute
+    )
     await update_live_game(user)
 
 
@@ -176,7 +213,8 @@ async def assetmgmt_rm(sid: str, data):
         logger.warning(f"{user.name} attempted to remove a file it doesn't own.")
         return
     asset_dict = asset.as_dict(children=True, recursive=True)
-    asset.delete_instance()
+    await db_executor.write(Asset.delete().where(Asset.id == asset.id).execute)
+    board_cache.clear()
 
     await update_live_game(user)
     cleanup_assets([asset_dict])
@@ -211,9 +249,9 @@ def get_safe_members(members: List[tarfile.TarInfo]) -> List[tarfile.TarInfo]:
     return safe_members
 
 
-async def handle_paa_file(upload_data: UploadData, data: bytes, sid: str):
+async def handle_paa_file(upload_data: UploadInfo, upload: PendingUpload, sid: str):
     with tempfile.TemporaryDirectory() as tmpdir:
-        with tarfile.open(fileobj=io.BytesIO(data), mode="r:bz2") as tar:
+        with tarfile.open(upload.path, mode="r:bz2") as tar:
             files = tarfile.TarInfo("files")
             files.type = tarfile.DIRTYPE
             # We need to explicitly list our members for security reasons
@@ -229,37 +267,40 @@ async def handle_paa_file(upload_data: UploadData, data: bytes, sid: str):
             raw_assets: List[AssetDict] = json.load(json_data)
 
     user = asset_state.get_user(sid)
-    parent_map: Dict[int, int] = defaultdict(lambda: upload_data["directory"])
+    await db_executor.write(
+        import_assets, raw_assets, user.id, upload_data["directory"]
+    )
+
+    await sio.emit(
+        "Asset.Import.Finish", upload_data["name"], room=sid, namespace=ASSET_NS
+    )
+
+
+def import_assets(raw_assets: List[AssetDict], user_id: int, directory: int) -> None:
+    parent_map: Dict[int, int] = defaultdict(lambda: directory)
 
     for raw_asset in raw_assets:
         new_asset = Asset.create(
             name=raw_asset["name"],
             file_hash=raw_asset["file_hash"],
-            owner=user,
+            owner=user_id,
             parent=parent_map[raw_asset["parent"]],
             options=raw_asset["options"],
         )
         parent_map[raw_asset["id"]] = new_asset.id
 
-    await sio.emit(
-        "Asset.Import.Finish", upload_data["name"], room=sid, namespace=ASSET_NS
-    )
-
-
-async def handle_regular_file(upload_data: UploadData, data: bytes, sid: str):
-    sh = hashlib.sha1(data)
-    hashname = sh.hexdigest()
 
-    if not (ASSETS_DIR / hashname).exists():
-        with open(ASSETS_DIR / hashname, "wb") as f:
-            f.write(data)
+async def handle_regular_file(upload_data: UploadInfo, upload: PendingUpload, sid: str):
+    hashname = upload.store()
 
     user = asset_state.get_user(sid)
 
     target = upload_data["directory"]
 
     for directory in upload_data["newDirectories"]:
-        asset, created = Asset.get_or_create(name=directory, owner=user, parent=target)
+        asset, created = await db_executor.write(
+            Asset.get_or_create, name=directory, owner=user.id, parent=target
+        )
         if created:
             await sio.emit(
                 "Folder.Create",
@@ -269,10 +310,11 @@ async def handle_regular_file(upload_data: UploadData, data: bytes, sid: str):
             )
         target = asset.id
 
-    asset = Asset.create(
+    asset = await db_executor.write(
+        Asset.create,
         name=upload_data["name"],
         file_hash=hashname,
-        owner=user,
+        owner=user.id,
         parent=target,
     )
 
@@ -284,32 +326,81 @@ async def handle_regular_file(upload_data: UploadData, data: bytes, sid: str):
     )
 
 
+def drop_upload(uuid: str) -> None:
+    transfer_manager.remove("upload", uuid)
+    upload = asset_state.pending_file_upload_cache.pop(uuid, None)
+    if upload is not None:
+        upload.discard()
+
+
+async def send_upload_failure(sid: str, uuid: str, name: str, reason: str):
+    await sio.emit(
+        "Asset.Upload.Fail",
+        {"uuid": uuid, "name": name, "reason": reason},
+        room=sid,
+        namespace=ASSET_NS,
+    )
+
+
+async def evict_upload(sid: str, uuid: str, name: str):
+    drop_upload(uuid)
+    await send_upload_failure(sid, uuid, name, "The upload timed out.")
+
+
 @sio.on("Asset.Upload", namespace=ASSET_NS)
 @auth.login_required(app, sio, "asset")
 async def assetmgmt_upload(sid: str, upload_data: UploadData):
     uuid = upload_data["uuid"]
+    name = upload_data["name"]
 
-    if uuid not in asset_state.pending_file_upload_cache:
-        asset_state.pending_file_upload_cache[uuid] = {}
-    asset_state.pending_file_upload_cache[uuid][upload_data["slice"]] = upload_data
-    if len(asset_state.pending_file_upload_cache[uuid]) != upload_data["totalSlices"]:
-        # wait for the rest of the slices
+    upload = asset_state.pending_file_upload_cache.get(uuid)
+    if upload is not None and upload.sid != sid:
+        logger.warning(f"{sid} attempted to add to an upload it didn't start.")
         return
 
-    # All slices are present
-    data = b""
-    for slice_ in range(upload_data["totalSlices"]):
-        data += asset_state.pending_file_upload_cache[uuid][slice_]["data"]
+    try:
+        if upload is None:
+            upload = SlicedUpload(sid, upload_data["totalSlices"])
+            asset_state.pending_file_upload_cache[uuid] = upload
+            transfer_manager.add(
+                "upload",
+                uuid,
+                asset_state.get_user(sid).id,
+                partial(evict_upload, sid, uuid, name),
+            )
+        # A slice that is sent twice is ignored, so it is only counted once
+        if not upload.has_slice(upload_data["slice"]):
+            transfer_manager.reserve("upload", uuid, len(upload_data["data"]))
+        upload.add_slice(upload_data["slice"], upload_data["data"])
+    except (UploadError, TransferLimitExceeded) as e:
+        logger.warning(f"Upload {name} failed: {e}")
+        drop_upload(uuid)
+        await send_upload_failure(sid, uuid, name, str(e))
+        return
 
-    del asset_state.pending_file_upload_cache[upload_data["uuid"]]
+    if not upload.complete:
+        # wait for the rest of the slices
+        return
 
-    file_name = upload_data["name"]
-    if file_name.endswith(".paa"):
-        await handle_paa_file(upload_data, data, sid)
-    elif file_name.endswith(".dd2vtt"):
-        await handle_ddraft_file(upload_data, data, sid)
-    else:
-        await handle_regular_file(upload_data, data, sid)
+    # All slices are present
+    del asset_state.pending_file_upload_cache[uuid]
+    transfer_manager.remove("upload", uuid)
+
+    await process_upload(upload_data, upload, sid)
+
+
+async def process_upload(upload_info: UploadInfo, upload: PendingUpload, sid: str):
+    """Creates the assets of a completed upload, the upload is discarded afterwards."""
+    file_name = upload_info["name"]
+    try:
+        if file_name.endswith(".paa"):
+            await handle_paa_file(upload_info, upload, sid)
+        elif file_name.endswith(".dd2vtt"):
+            await handle_ddraft_file(upload_info, upload.read(), sid)
+        else:
+            await handle_regular_file(upload_info, upload, sid)
+    finally:
+        upload.discard()
 
     user = asset_state.get_user(sid)
     await update_live_game(user)
@@ -2,11 +2,14 @@ from typing import List
 from typing_extensions import TypedDict
 
 
-class UploadData(TypedDict):
+class UploadInfo(TypedDict):
     uuid: str
     name: str
     directory: int
     newDirectories: List[str]
+
+
+class UploadData(UploadInfo):
     slice: int
     totalSlices: int
     data: bytes
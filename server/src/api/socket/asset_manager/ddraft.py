@@ -5,11 +5,12 @@ from typing import List
 from typing_extensions import TypedDict
 
 from ....app import sio
+from ....db_executor import db_executor
 from ....models import Asset
 from ....state.asset import asset_state
 from ....utils import ASSETS_DIR
 from ..constants import ASSET_NS
-from .common import UploadData
+from .common import UploadInfo
 
 
 class Coord(TypedDict):
@@ -39,7 +40,7 @@ class DDraftData(TypedDict):
     image: str
 
 
-async def handle_ddraft_file(upload_data: UploadData, data: bytes, sid: str):
+async def handle_ddraft_file(upload_data: UploadInfo, data: bytes, sid: str):
     ddraft_file: DDraftData = json.loads(data)
 
     image = base64.b64decode(ddraft_file["image"])
@@ -59,7 +60,7 @@ async def handle_ddraft_file(upload_data: UploadData, data: bytes, sid: str):
                 "width": ddraft_file["resolution"]["map_size"]["x"] * 50,
                 "height": ddraft_file["resolution"]["map_size"]["y"] * 50,
                 "options": json.dumps(
-                    [[f"ddraft_{k}", v] for k, v in ddraft_file.items() if k != "image"]
+                    {f"ddraft_{k}": v for k, v in ddraft_file.items() if k != "image"}
                 ),
             }
         },
@@ -67,10 +68,11 @@ async def handle_ddraft_file(upload_data: UploadData, data: bytes, sid: str):
 
     user = asset_state.get_user(sid)
 
-    asset = Asset.create(
+    asset = await db_executor.write(
+        Asset.create,
         name=upload_data["name"],
         file_hash=hashname,
-        owner=user,
+        owner=user.id,
         parent=upload_data["directory"],
         options=json.dumps(template),
     )
@@ -8,6 +8,7 @@ from ...logs import logger
 from ...models import Floor, PlayerRoom
 from ...models.db import db
 from ...models.role import Role
+from ...state.board import board_cache
 from ...state.game import game_state
 
 # DATA CLASSES FOR TYPE CHECKING
@@ -41,6 +42,8 @@ async def create_floor(sid: str, data: str):
         return
 
     floor: Floor = pr.active_location.create_floor(data)
+    board_cache.bump(pr.active_location)
+    game_state.refresh_location_sessions(pr.active_location)
 
     for psid, player in game_state.get_users(active_location=pr.active_location):
         await sio.emit(
@@ -67,6 +70,8 @@ async def remove_floor(sid: str, data: str):
 
     floor: Floor = Floor.get(location=pr.active_location, name=data)
     floor.delete_instance(recursive=True)
+    board_cache.bump(pr.active_location)
+    game_state.refresh_location_sessions(pr.active_location)
 
     await sio.emit(
         "Floor.Remove",
@@ -89,6 +94,7 @@ async def set_floor_visibility(sid: str, data: FloorVisibleData):
     floor: Floor = Floor.get(location=pr.active_location, name=data["name"])
     floor.player_visible = data["visible"]
     floor.save()
+    board_cache.bump(pr.active_location)
 
     await sio.emit(
         "Floor.Visible.Set",
@@ -111,6 +117,8 @@ async def rename_floor(sid: str, data: FloorRename):
     floor: Floor = Floor.get(location=pr.active_location, index=data["index"])
     floor.name = data["name"]
     floor.save()
+    board_cache.bump(pr.active_location)
+    game_state.refresh_location_sessions(pr.active_location)
 
     await sio.emit(
         "Floor.Rename",
@@ -133,6 +141,7 @@ async def set_floor_type(sid: str, data: FloorTypeData):
     floor: Floor = Floor.get(location=pr.active_location, name=data["name"])
     floor.type_ = data["floorType"]
     floor.save()
+    board_cache.bump(pr.active_location)
 
     await sio.emit(
         "Floor.Type.Set",
@@ -155,6 +164,7 @@ async def set_floor_background(sid: str, data: FloorBackgroundData):
     floor: Floor = Floor.get(location=pr.active_location, name=data["name"])
     floor.background_color = data.get("background", None)
     floor.save()
+    board_cache.bump(pr.active_location)
 
     await sio.emit(
         "Floor.Background.Set",
@@ -179,6 +189,7 @@ async def reorder_floors(sid: str, data: List[str]):
             init = Floor.get(location=pr.active_location, name=name)
             init.index = i
             init.save()
+    board_cache.bump(pr.active_location)
 
     await sio.emit(
         "Floors.Reorder",
@@ -8,6 +8,7 @@ from ...api.socket.constants import GAME_NS
 from ...app import app, sio
 from ...logs import logger
 from ...models import Group, PlayerRoom, Shape
+from ...state.board import board_cache
 from ...state.game import game_state
 
 
@@ -60,6 +61,7 @@ async def update_group(sid: str, group_info: ServerGroup):
     else:
         update_model_from_dict(group, group_info)
         group.save()
+        board_cache.bump_room(pr.room)
 
     for psid, _ in game_state.get_users(room=pr.room):
         await sio.emit(
@@ -86,6 +88,7 @@ async def update_group_badges(sid: str, member_badges: List[MemberBadge]):
         else:
             shape.badge = member["badge"]
             shape.save()
+    board_cache.bump_room(pr.room)
 
     for psid, player in game_state.get_users(room=pr.room):
         await sio.emit(
@@ -143,6 +146,7 @@ async def join_group(sid: str, group_join: GroupJoin):
     # Group joining can be the result of a merge or a split and thus other groups might be empty now
     for group_id in group_ids:
         await remove_group_if_empty(group_id)
+    board_cache.bump_room(pr.room)
 
     for psid, _ in game_state.get_users(room=pr.room):
         await sio.emit(
@@ -176,6 +180,7 @@ async def leave_group(sid: str, client_shapes: List[LeaveGroup]):
 
     for group_id in group_ids:
         await remove_group_if_empty(group_id)
+    board_cache.bump_room(pr.room)
 
     for psid, _ in game_state.get_users(room=pr.room):
         await sio.emit(
@@ -199,6 +204,7 @@ async def remove_group(sid: str, group_id: str):
 
     # check if group still has members
     await remove_group_if_empty(group_id)
+    board_cache.bump_room(pr.room)
 
     for psid, _ in game_state.get_users(room=pr.room):
         await sio.emit(
@@ -1,5 +1,4 @@
-import json
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from typing_extensions import TypedDict
 
 from socketio import AsyncServer
@@ -7,17 +6,20 @@ from socketio import AsyncServer
 from ... import auth
 from ...api.socket.constants import GAME_NS
 from ...app import app, sio
+from ...db_executor import db_executor
 from ...logs import logger
 from ...models import (
     Initiative,
+    InitiativeEffect,
+    InitiativeEntry,
     PlayerRoom,
 )
-from ...models.db import db
-from ...models.groups import Group
+from ...models.initiative import store_entry_order
 from ...models.role import Role
 from ...models.shape import Shape
-from ...models.shape.access import has_ownership
-from ...state.game import game_state
+from ...models.shape.access import has_ownership_many
+from ...state.changelog import change_log
+from ...state.game import Session, game_state
 
 
 class ServerInitiativeEffect(TypedDict):
@@ -73,10 +75,28 @@ class ServerInitiativeOrderChange(TypedDict):
     newIndex: int
 
 
-def sort_initiative(data, sort: int):
+class ServerInitiativeEntryPatch(TypedDict, total=False):
+    shape: str
+    initiative: Optional[int]
+    isVisible: bool
+    isGroup: bool
+    effects: List[ServerInitiativeEffect]
+
+
+class ServerInitiativePatch(TypedDict, total=False):
+    # changed or added entries, only the changed fields of existing entries are included
+    entries: List[ServerInitiativeEntryPatch]
+    removed: List[str]
+    # the shapes of all entries in their new order
+    order: List[str]
+    turn: int
+    sort: int
+
+
+def sort_initiative(data: List[InitiativeEntry], sort: int) -> List[InitiativeEntry]:
     if sort == 2:
         return data
-    return sorted(data, key=lambda x: x.get("initiative", 0) or 0, reverse=sort == 0)
+    return sorted(data, key=lambda x: x.value or 0, reverse=sort == 0)
 
 
 async def send_initiative(sio: AsyncServer, data: Dict[str, Any], pr: PlayerRoom):
@@ -88,19 +108,115 @@ async def send_initiative(sio: AsyncServer, data: Dict[str, Any], pr: PlayerRoom
     )
 
 
+async def send_initiative_patch(
+    sio: AsyncServer, patch: ServerInitiativePatch, pr: PlayerRoom
+):
+    if len(patch) == 0:
+        return
+    await sio.emit(
+        "Initiative.Entry.Patch",
+        patch,
+        room=pr.active_location.get_path(),
+        namespace=GAME_NS,
+    )
+
+
+def get_initiative_data(location_id: int, uuids: List[str]) -> Optional[Dict[str, Any]]:
+    location_data = Initiative.get_or_none(location=location_id)
+    if location_data is None:
+        return None
+    if not location_data.entries.where(InitiativeEntry.shape << uuids).exists():
+        return None
+    return location_data.as_dict()
+
+
 async def check_initiative(sio: AsyncServer, uuids: List[str], pr: PlayerRoom):
-    location_data = Initiative.get_or_none(location=pr.active_location)
-    if location_data is not None:
-        json_data = json.loads(location_data.data)
-        if any(data["shape"] in uuids for data in json_data):
-            await send_initiative(sio, location_data.as_dict(), pr)
+    data = await db_executor.read(get_initiative_data, pr.active_location.id, uuids)
+    if data is not None:
+        await send_initiative(sio, data, pr)
+
+
+def get_entry(location_data: Initiative, shape: str) -> Optional[InitiativeEntry]:
+    return InitiativeEntry.get_or_none(
+        InitiativeEntry.initiative == location_data, InitiativeEntry.shape == shape
+    )
+
 
+def apply_order(
+    location_data: Initiative,
+    current: List[InitiativeEntry],
+    order: List[InitiativeEntry],
+    patch: ServerInitiativePatch,
+) -> None:
+    """
+    Stores `order` (sorted according to the initiative sort) as the new order of the entries.
 
-def get_turn_order(data: List[Dict[str, Any]], shape: str) -> int:
-    for i, info in enumerate(data):
-        if info["shape"] == shape:
-            return i
-    raise IndexError()
+    `current` are the entries in their stored order, the turn stays with the entry that is currently active.
+    Only the ordering keys of the moved entries are written (see store_entry_order).
+    """
+    active = current[location_data.turn] if location_data.turn < len(current) else None
+
+    order = sort_initiative(order, location_data.sort)
+    if [entry.id for entry in order] != [entry.id for entry in current]:
+        store_entry_order(order)
+        patch["order"] = [entry.shape_id for entry in order]
+
+    if active is not None:
+        turn = order.index(active)
+        if turn != location_data.turn:
+            location_data.turn = turn
+            patch["turn"] = turn
+
+
+def get_shape_access(uuid: str, session: Session) -> Tuple[Optional[Shape], bool]:
+    owned, shapes = has_ownership_many([uuid], session)
+    shape = shapes.get(uuid)
+    return shape, shape is not None and owned
+
+
+class _Abort(Exception):
+    """Rolls back the changes of an initiative update."""
+
+
+InitiativeUpdate = Callable[[Initiative, ServerInitiativePatch], Optional[bool]]
+
+
+async def update_initiative(
+    pr: PlayerRoom, update: InitiativeUpdate, *, create=False
+) -> Optional[ServerInitiativePatch]:
+    """
+    Changes the initiative of the active location in a single database write.
+
+    `update` changes the entries and/or the initiative itself and collects the changes for clients in the patch.
+    It can return False to not save anything.
+    The patch is returned, or None if nothing was saved.
+    """
+    location = pr.active_location
+    location_id = location.id
+
+    def work() -> Optional[ServerInitiativePatch]:
+        if create:
+            location_data, _ = Initiative.get_or_create(
+                location=location_id, defaults={"round": 0, "turn": 0}
+            )
+        else:
+            location_data = Initiative.get_or_none(location=location_id)
+            if location_data is None:
+                return None
+        patch: ServerInitiativePatch = {}
+        if update(location_data, patch) is False:
+            raise _Abort()
+        if location_data.is_dirty():
+            location_data.save()
+        return patch
+
+    try:
+        patch = await db_executor.write(work)
+    except _Abort:
+        return None
+    if patch is not None:
+        change_log.touch(location)
+    return patch
 
 
 @sio.on("Initiative.Request", namespace=GAME_NS)
@@ -116,38 +232,42 @@ async def request_initiatives(sid: str):
     )
 
 
+INITIATIVE_OPTIONS = {"isVisible": "is_visible", "isGroup": "is_group"}
+
+
 @sio.on("Initiative.Option.Update", namespace=GAME_NS)
 @auth.login_required(app, sio, "game")
 async def update_initiative_option(sid: str, data: ServerInitiativeOption):
     pr = game_state.get(sid)
 
-    shape = Shape.get_or_none(uuid=data["shape"])
+    shape, owned = await db_executor.read(
+        get_shape_access, data["shape"], game_state.get_session(sid)
+    )
 
     if shape is None:
         logger.warning("Attempt to update initiative option for unknown shape")
         return
 
-    if not has_ownership(shape, pr):
+    if not owned:
         logger.warning(
             f"{pr.player.name} attempted to change initiative of an asset it does not own"
         )
         return
 
-    location_data = Initiative.get_or_none(location=pr.active_location)
-    if location_data is None:
-        logger.error("Initiative updated for location without initiative tracking")
+    field = INITIATIVE_OPTIONS.get(data["option"])
+    if field is None:
+        logger.warning(f"Attempt to update unknown initiative option {data['option']}")
         return
 
-    json_data = json.loads(location_data.data)
+    def update(location_data: Initiative, _: ServerInitiativePatch):
+        InitiativeEntry.update({field: data["value"]}).where(
+            InitiativeEntry.initiative == location_data,
+            InitiativeEntry.shape == data["shape"],
+        ).execute()
 
-    with db.atomic():
-        for i, initiative_data in enumerate(json_data):
-            if initiative_data["shape"] == data["shape"]:
-                json_data[i][data["option"]] = data["value"]
-                break
-
-        location_data.data = json.dumps(json_data)
-        location_data.save()
+    if await update_initiative(pr, update) is None:
+        logger.error("Initiative updated for location without initiative tracking")
+        return
 
     await sio.emit(
         "Initiative.Option.Set",
@@ -167,12 +287,10 @@ async def set_initiative_active(sid: str, is_active: bool):
         logger.warning(f"{pr.player.name} attempted to set initiative active state")
         return
 
-    with db.atomic():
-        location_data, _ = Initiative.get_or_create(
-            location=pr.active_location, defaults={"round": 0, "turn": 0, "data": "[]"}
-        )
+    def update(location_data: Initiative, _: ServerInitiativePatch):
         location_data.is_active = is_active
-        location_data.save()
+
+    await update_initiative(pr, update, create=True)
 
     await sio.emit(
         "Initiative.Active.Set",
@@ -183,40 +301,61 @@ async def set_initiative_active(sid: str, is_active: bool):
     )
 
 
+def _create_effects(entry: InitiativeEntry, effects: List[ServerInitiativeEffect]):
+    InitiativeEffect.insert_many(
+        [
+            {
+                "entry": entry,
+                "index": i,
+                "name": effect["name"],
+                "turns": str(effect["turns"]),
+                "highlights_actor": effect.get("highlightsActor", False),
+            }
+            for i, effect in enumerate(effects)
+        ]
+    ).execute()
+
+
 @sio.on("Initiative.Add", namespace=GAME_NS)
 @auth.login_required(app, sio, "game")
 async def add_initiative(sid: str, data: ServerInitiativeData):
     pr = game_state.get(sid)
 
-    shape = Shape.get_or_none(uuid=data["shape"])
+    shape, owned = await db_executor.read(
+        get_shape_access, data["shape"], game_state.get_session(sid)
+    )
 
     if shape is None:
         logger.warning("Attempt to add initiative for unknown shape")
         return
 
-    if not has_ownership(shape, pr):
+    if not owned:
         logger.warning(
             f"{pr.player.name} attempted to add initiative to an asset it does not own"
         )
         return
 
-    with db.atomic():
-        location_data, _ = Initiative.get_or_create(
-            location=pr.active_location, defaults={"round": 0, "turn": 0, "data": "[]"}
-        )
-        json_data = json.loads(location_data.data)
-
-        for initiative in json_data:
-            if initiative["shape"] == data["shape"]:
-                initiative.update(**data)
-                break
+    def update(location_data: Initiative, patch: ServerInitiativePatch):
+        entry = get_entry(location_data, data["shape"])
+        if entry is None:
+            entry = InitiativeEntry(
+                initiative=location_data,
+                shape=data["shape"],
+                index=location_data.get_next_index(),
+            )
         else:
-            json_data.append(data)
-
-        location_data.data = json.dumps(json_data)
-        location_data.save()
+            InitiativeEffect.delete().where(InitiativeEffect.entry == entry).execute()
+        entry.value = data.get("initiative")
+        entry.is_visible = data["isVisible"]
+        entry.is_group = data["isGroup"]
+        entry.save()
+        if len(data["effects"]) > 0:
+            _create_effects(entry, data["effects"])
+        patch["entries"] = [entry.as_dict()]
 
-    await send_initiative(sio, location_data.as_dict(), pr)
+    patch = await update_initiative(pr, update, create=True)
+    if patch is not None:
+        await send_initiative_patch(sio, patch, pr)
 
 
 @sio.on("Initiative.Value.Set", namespace=GAME_NS)
@@ -224,39 +363,36 @@ async def add_initiative(sid: str, data: ServerInitiativeData):
 async def set_initiative_value(sid: str, data: ServerSetInitiativeValue):
     pr = game_state.get(sid)
 
-    shape = Shape.get_or_none(uuid=data["shape"])
+    shape, owned = await db_executor.read(
+        get_shape_access, data["shape"], game_state.get_session(sid)
+    )
 
     if shape is None:
         logger.warning("Attempt to update initiative value for unknown shape")
         return
 
-    if not has_ownership(shape, pr):
+    if not owned:
         logger.warning(
             f"{pr.player.name} attempted to remove initiative of an asset it does not own"
         )
         return
 
-    with db.atomic():
-        location_data: Initiative = Initiative.get(location=pr.active_location)
-        json_data = json.loads(location_data.data)
-
-        active_participant = json_data[location_data.turn]
-
-        for initiative in json_data:
-            if initiative["shape"] == data["shape"]:
-                initiative["initiative"] = data["value"]
+    def update(location_data: Initiative, patch: ServerInitiativePatch):
+        entries = location_data.get_entries()
+        for entry in entries:
+            if entry.shape_id == data["shape"]:
+                entry.value = data["value"]
+                entry.save(only=[InitiativeEntry.value])
                 break
+        else:
+            return False
 
-        json_data = sort_initiative(json_data, location_data.sort)
-
-        turn_order = get_turn_order(json_data, active_participant["shape"])
-        if location_data.turn != turn_order:
-            location_data.turn = turn_order
-
-        location_data.data = json.dumps(json_data)
-        location_data.save()
+        patch["entries"] = [{"shape": data["shape"], "initiative": data["value"]}]
+        apply_order(location_data, entries, entries, patch)
 
-    await send_initiative(sio, location_data.as_dict(), pr)
+    patch = await update_initiative(pr, update)
+    if patch is not None:
+        await send_initiative_patch(sio, patch, pr)
 
 
 @sio.on("Initiative.Clear", namespace=GAME_NS)
@@ -268,15 +404,12 @@ async def clear_initiatives(sid: str):
         logger.warning(f"{pr.player.name} attempted to clear all initiatives")
         return
 
-    with db.atomic():
-        location_data = Initiative.get(location=pr.active_location)
-        json_data = json.loads(location_data.data)
-
-        for initiative in json_data:
-            initiative["initiative"] = None
+    def update(location_data: Initiative, _: ServerInitiativePatch):
+        InitiativeEntry.update(value=None).where(
+            InitiativeEntry.initiative == location_data
+        ).execute()
 
-        location_data.data = json.dumps(json_data)
-        location_data.save()
+    await update_initiative(pr, update)
 
     await sio.emit(
         "Initiative.Clear",
@@ -285,41 +418,35 @@ async def clear_initiatives(sid: str):
     )
 
 
-async def remove_shape(pr: PlayerRoom, uuid: str, group: Optional[Group]):
-    location_data = Initiative.get_or_none(location=pr.active_location)
-    if location_data is None:
-        return
-    try:
-        json_data = json.loads(location_data.data)
-    except json.JSONDecodeError:
-        logger.warning(
-            "Invalid initiative data found during shape removal",
-            pr.room.id,
-            pr.active_location.id,
-        )
-        return
-
-    modified = False
-    new_json_data = []
-    for data in json_data:
-        if data["shape"] == uuid:
-            if group is not None and data["isGroup"]:
-                members = group.members.where(Shape.uuid != uuid)
-                if len(members) > 0:
-                    # change initiative member
-                    data["shape"] = members[0].uuid
-                    modified = True
-                    new_json_data.append(data)
-                    continue
-            # remove shape (either because not group OR last group member)
-            modified = True
-            continue
+async def remove_shape(pr: PlayerRoom, uuid: str, group_id: Optional[str]):
+    def update(location_data: Initiative, patch: ServerInitiativePatch):
+        entries = location_data.get_entries()
+        for entry in entries:
+            if entry.shape_id == uuid:
+                break
         else:
-            new_json_data.append(data)
-    if modified:
-        location_data.data = json.dumps(new_json_data)
-        location_data.save()
-        await send_initiative(sio, location_data.as_dict(), pr)
+            return False
+
+        patch["removed"] = [uuid]
+
+        if group_id is not None and entry.is_group:
+            members = Shape.select(Shape.uuid).where(
+                Shape.group == group_id, Shape.uuid != uuid
+            )
+            if len(members) > 0 and get_entry(location_data, members[0].uuid) is None:
+                # change initiative member
+                entry.shape = members[0].uuid
+                entry.save(only=[InitiativeEntry.shape])
+                patch["entries"] = [entry.as_dict()]
+                patch["order"] = [e.shape_id for e in entries]
+                return
+
+        # remove shape (either because not group OR last group member)
+        entry.delete_instance(recursive=True)
+
+    patch = await update_initiative(pr, update)
+    if patch is not None:
+        await send_initiative_patch(sio, patch, pr)
 
 
 @sio.on("Initiative.Remove", namespace=GAME_NS)
@@ -327,25 +454,27 @@ async def remove_shape(pr: PlayerRoom, uuid: str, group: Optional[Group]):
 async def remove_initiative(sid: str, data: str):
     pr = game_state.get(sid)
 
-    shape = Shape.get_or_none(uuid=data)
+    shape, owned = await db_executor.read(
+        get_shape_access, data, game_state.get_session(sid)
+    )
 
     if shape is None:
         logger.warning("Attempt to remove initiative for unknown shape")
         return
 
-    if not has_ownership(shape, pr):
+    if not owned:
         logger.warning(
             f"{pr.player.name} attempted to remove initiative of an asset it does not own"
         )
         return
 
-    with db.atomic():
-        location_data = Initiative.get(location=pr.active_location)
-        json_data = json.loads(location_data.data)
-        location_data.data = json.dumps(
-            [initiative for initiative in json_data if initiative["shape"] != data]
-        )
-        location_data.save()
+    def update(location_data: Initiative, _: ServerInitiativePatch):
+        InitiativeEntry.delete().where(
+            InitiativeEntry.initiative == location_data,
+            InitiativeEntry.shape == data,
+        ).execute()
+
+    await update_initiative(pr, update)
 
     await sio.emit(
         "Initiative.Remove",
@@ -361,7 +490,7 @@ async def remove_initiative(sid: str, data: str):
 async def change_initiative_order(sid: str, data: ServerInitiativeOrderChange):
     pr = game_state.get(sid)
 
-    if Shape.get_or_none(data["shape"]) is None:
+    if await db_executor.read(Shape.get_or_none, uuid=data["shape"]) is None:
         logger.warning("Attempt to change initiative order for unknown shape")
         return
 
@@ -372,71 +501,88 @@ async def change_initiative_order(sid: str, data: ServerInitiativeOrderChange):
     old_index = data["oldIndex"]
     new_index = data["newIndex"]
 
-    with db.atomic():
-        location_data = Initiative.get(location=pr.active_location)
-        json_data = json.loads(location_data.data)
+    def update(location_data: Initiative, patch: ServerInitiativePatch):
+        entries = location_data.get_entries()
+        if not (0 <= old_index < len(entries) and 0 <= new_index < len(entries)):
+            return False
+        if entries[old_index].shape_id != data["shape"]:
+            return False
 
-        if json_data[old_index]["shape"] != data["shape"]:
-            return
+        if entries[new_index].value != entries[old_index].value:
+            location_data.sort = 2
+            patch["sort"] = 2
 
-        active_participant = json_data[location_data.turn]
+        order = list(entries)
+        order.insert(new_index, order.pop(old_index))
+        apply_order(location_data, entries, order, patch)
 
-        if json_data[new_index].get("initiative", 0) != json_data[old_index].get(
-            "initiative", 0
-        ):
-            location_data.sort = 2
+    patch = await update_initiative(pr, update)
+    if patch is not None:
+        await send_initiative_patch(sio, patch, pr)
 
-        json_data.insert(new_index, json_data.pop(old_index))
 
-        json_data = sort_initiative(json_data, location_data.sort)
+def _can_update_turn(session: Session, location_data: Initiative, action: str) -> bool:
+    """Players can only change the turn/round when it is the turn of one of their shapes."""
+    if session.role == Role.DM:
+        return True
 
-        turn_order = get_turn_order(json_data, active_participant["shape"])
-        if location_data.turn != turn_order:
-            location_data.turn = turn_order
+    entries = location_data.get_entries()
+    shape, owned = None, False
+    if location_data.turn < len(entries):
+        shape, owned = get_shape_access(entries[location_data.turn].shape_id, session)
 
-        location_data.data = json.dumps(json_data)
-        location_data.save()
+    if shape is None:
+        logger.warning(
+            f"Attempt to modify the initiative {action} for an unknown shape"
+        )
+        return False
 
-    await send_initiative(sio, location_data.as_dict(), pr)
+    if not owned:
+        logger.warning(
+            f"{session.player_name} attempted to advance the initiative tracker"
+        )
+        return False
+
+    return True
 
 
 @sio.on("Initiative.Turn.Update", namespace=GAME_NS)
 @auth.login_required(app, sio, "game")
 async def update_initiative_turn(sid: str, turn: int):
     pr = game_state.get(sid)
+    session = game_state.get_session(sid)
 
-    location_data: Initiative = Initiative.get(location=pr.active_location)
-    json_data = json.loads(location_data.data)
-
-    shape = Shape.get_or_none(uuid=json_data[location_data.turn]["shape"])
-
-    if shape is None:
-        logger.warning("Attempt to modify the initiative turn for an unknown shape")
-
-    if shape is not None and pr.role != Role.DM and not has_ownership(shape, pr):
-        logger.warning(f"{pr.player.name} attempted to advance the initiative tracker")
-        return
+    def update(location_data: Initiative, _: ServerInitiativePatch):
+        if not _can_update_turn(session, location_data, "turn"):
+            return False
 
-    with db.atomic():
         next_turn = turn > location_data.turn
         location_data.turn = turn
 
-        for i, effect in enumerate(json_data[turn]["effects"][-1:]):
+        entries = location_data.get_entries()
+        if turn >= len(entries):
+            return
+
+        effects = entries[turn].get_effects()
+        removed = False
+        for effect in effects:
             try:
-                turns = int(effect["turns"])
-                if turns <= 0 and next_turn:
-                    json_data[turn]["effects"].pop(i)
-                elif turns > 0 and next_turn:
-                    effect["turns"] = str(turns - 1)
-                else:
-                    effect["turns"] = str(turns + 1)
+                turns = int(effect.turns)
             except ValueError:
                 # For non-number inputs do not update the effect
-                pass
-
-        location_data.data = json.dumps(json_data)
-
-        location_data.save()
+                continue
+            if turns <= 0 and next_turn:
+                effect.delete_instance()
+                removed = True
+            else:
+                effect.turns = str(turns - 1 if next_turn else turns + 1)
+                effect.save(only=[InitiativeEffect.turns])
+
+        if removed:
+            _reindex_effects(entries[turn])
+
+    if await update_initiative(pr, update) is None:
+        return
 
     await sio.emit(
         "Initiative.Turn.Update",
@@ -451,29 +597,16 @@ async def update_initiative_turn(sid: str, turn: int):
 @auth.login_required(app, sio, "game")
 async def update_initiative_round(sid: str, data: int):
     pr = game_state.get(sid)
+    session = game_state.get_session(sid)
 
-    location_data = Initiative.get(location=pr.active_location)
+    def update(location_data: Initiative, _: ServerInitiativePatch):
+        if not _can_update_turn(session, location_data, "round"):
+            return False
 
-    if pr.role != Role.DM:
-        json_data = json.loads(location_data.data)
-
-        shape = Shape.get_or_none(uuid=json_data[location_data.turn]["shape"])
-
-        if shape is None:
-            logger.warning(
-                "Attempt to modify the initiative round for an unknown shape"
-            )
-            return
-
-        if not has_ownership(shape, pr):
-            logger.warning(
-                f"{pr.player.name} attempted to advance the initiative tracker"
-            )
-            return
-
-    with db.atomic():
         location_data.round = data
-        location_data.save()
+
+    if await update_initiative(pr, update) is None:
+        return
 
     await sio.emit(
         "Initiative.Round.Update",
@@ -493,58 +626,66 @@ async def set_initiative_sort(sid: str, sort: int):
         logger.warning(f"{pr.player.name} attempted to change initiative sort")
         return
 
-    with db.atomic():
-        location_data = Initiative.get(location=pr.active_location)
+    def update(location_data: Initiative, patch: ServerInitiativePatch):
         location_data.sort = sort
-        json_data = json.loads(location_data.data)
 
-        active_participant = json_data[location_data.turn]
+        entries = location_data.get_entries()
+        apply_order(location_data, entries, entries, patch)
 
-        json_data = sort_initiative(json_data, location_data.sort)
-
-        turn_order = get_turn_order(json_data, active_participant["shape"])
-        if location_data.turn != turn_order:
-            location_data.turn = turn_order
-
-        location_data.data = json.dumps(json_data)
-        location_data.save()
+    patch = await update_initiative(pr, update)
+    if patch is None:
+        return
 
     await sio.emit(
         "Initiative.Sort.Set",
+        sort,
         room=pr.active_location.get_path(),
         namespace=GAME_NS,
     )
-    await send_initiative(sio, location_data.as_dict(), pr)
+    await send_initiative_patch(sio, patch, pr)
 
 
-@sio.on("Initiative.Effect.New", namespace=GAME_NS)
-@auth.login_required(app, sio, "game")
-async def new_initiative_effect(sid: str, data: ServerInitiativeEffectActor):
+def _reindex_effects(entry: InitiativeEntry) -> None:
+    for i, effect in enumerate(entry.get_effects()):
+        if effect.index != i:
+            effect.index = i
+            effect.save(only=[InitiativeEffect.index])
+
+
+async def update_actor_effects(
+    sid: str,
+    shape_uuid: str,
+    update: Callable[[InitiativeEntry], Any],
+    action: str,
+) -> bool:
+    """Applies update to the entry of the given actor, returns whether anything was saved."""
     pr = game_state.get(sid)
 
-    shape = Shape.get_or_none(uuid=data["actor"])
+    shape, owned = await db_executor.read(
+        get_shape_access, shape_uuid, game_state.get_session(sid)
+    )
 
     if shape is None:
-        logger.warning("Attempt to create initiative effect for an unknown shape")
-        return
+        logger.warning(f"Attempt to {action} initiative effect for an unknown shape")
+        return False
 
-    if not has_ownership(shape, pr):
-        logger.warning(f"{pr.player.name} attempted to create a new initiative effect")
-        return
+    if not owned:
+        logger.warning(f"{pr.player.name} attempted to {action} an initiative effect")
+        return False
 
-    location_data = Initiative.get(location=pr.active_location)
-    with db.atomic():
-        json_data = json.loads(location_data.data)
+    def update_effects(location_data: Initiative, _: ServerInitiativePatch):
+        entry = get_entry(location_data, shape_uuid)
+        if entry is None:
+            return False
+        update(entry)
 
-        for initiative in json_data:
-            if initiative["shape"] == data["actor"]:
-                initiative["effects"].append(data["effect"])
+    return await update_initiative(pr, update_effects) is not None
 
-        location_data.data = json.dumps(json_data)
-        location_data.save()
 
+async def send_effect_update(sid: str, event: str, data: Any):
+    pr = game_state.get(sid)
     await sio.emit(
-        "Initiative.Effect.New",
+        event,
         data,
         room=pr.active_location.get_path(),
         skip_sid=sid,
@@ -552,106 +693,59 @@ async def new_initiative_effect(sid: str, data: ServerInitiativeEffectActor):
     )
 
 
-@sio.on("Initiative.Effect.Rename", namespace=GAME_NS)
-@auth.login_required(app, sio, "game")
-async def rename_initiative_effect(sid: str, data: ServerRenameInitiativeEffect):
-    pr = game_state.get(sid)
+def _effect_query(entry: InitiativeEntry, index: int):
+    return (InitiativeEffect.entry == entry) & (InitiativeEffect.index == index)
 
-    shape = Shape.get_or_none(uuid=data["shape"])
 
-    if shape is None:
-        logger.warning("Attempt to rename initiative effect for an unknown shape")
-        return
-
-    if not has_ownership(shape, pr):
-        logger.warning(f"{pr.player.name} attempted to create a new initiative effect")
-        return
+@sio.on("Initiative.Effect.New", namespace=GAME_NS)
+@auth.login_required(app, sio, "game")
+async def new_initiative_effect(sid: str, data: ServerInitiativeEffectActor):
+    def update(entry: InitiativeEntry):
+        effect = data["effect"]
+        InitiativeEffect.create(
+            entry=entry,
+            index=entry.effects.count(),
+            name=effect["name"],
+            turns=str(effect["turns"]),
+            highlights_actor=effect.get("highlightsActor", False),
+        )
 
-    location_data = Initiative.get(location=pr.active_location)
-    with db.atomic():
-        json_data = json.loads(location_data.data)
+    if await update_actor_effects(sid, data["actor"], update, "create"):
+        await send_effect_update(sid, "Initiative.Effect.New", data)
 
-        for initiative in json_data:
-            if initiative["shape"] == data["shape"]:
-                initiative["effects"][data["index"]]["name"] = data["name"]
 
-        location_data.data = json.dumps(json_data)
-        location_data.save()
+@sio.on("Initiative.Effect.Rename", namespace=GAME_NS)
+@auth.login_required(app, sio, "game")
+async def rename_initiative_effect(sid: str, data: ServerRenameInitiativeEffect):
+    def update(entry: InitiativeEntry):
+        InitiativeEffect.update(name=data["name"]).where(
+            _effect_query(entry, data["index"])
+        ).execute()
 
-    await sio.emit(
-        "Initiative.Effect.Rename",
-        data,
-        room=pr.active_location.get_path(),
-        skip_sid=sid,
-        namespace=GAME_NS,
-    )
+    if await update_actor_effects(sid, data["shape"], update, "rename"):
+        await send_effect_update(sid, "Initiative.Effect.Rename", data)
 
 
 @sio.on("Initiative.Effect.Turns", namespace=GAME_NS)
 @auth.login_required(app, sio, "game")
 async def set_initiative_effect_tuns(sid: str, data: ServerInitiativeEffectTurns):
-    pr = game_state.get(sid)
-
-    shape = Shape.get_or_none(uuid=data["shape"])
-
-    if shape is None:
-        logger.warning("Attempt to modify initiative effect turns for an unknown shape")
-        return
+    def update(entry: InitiativeEntry):
+        InitiativeEffect.update(turns=str(data["turns"])).where(
+            _effect_query(entry, data["index"])
+        ).execute()
 
-    if not has_ownership(shape, pr):
-        logger.warning(f"{pr.player.name} attempted to create a new initiative effect")
-        return
-
-    location_data = Initiative.get(location=pr.active_location)
-    with db.atomic():
-        json_data = json.loads(location_data.data)
-
-        for initiative in json_data:
-            if initiative["shape"] == data["shape"]:
-                initiative["effects"][data["index"]]["turns"] = data["turns"]
-
-        location_data.data = json.dumps(json_data)
-        location_data.save()
-
-    await sio.emit(
-        "Initiative.Effect.Turns",
-        data,
-        room=pr.active_location.get_path(),
-        skip_sid=sid,
-        namespace=GAME_NS,
-    )
+    if await update_actor_effects(sid, data["shape"], update, "modify"):
+        await send_effect_update(sid, "Initiative.Effect.Turns", data)
 
 
 @sio.on("Initiative.Effect.Remove", namespace=GAME_NS)
 @auth.login_required(app, sio, "game")
 async def remove_initiative_effect(sid: str, data: ServerRemoveInitiativeEffectActor):
-    pr = game_state.get(sid)
-
-    shape = Shape.get_or_none(uuid=data["shape"])
-
-    if shape is None:
-        logger.warning("Attempt to remove initiative effect for an unknown shape")
-        return
-
-    if not has_ownership(shape, pr):
-        logger.warning(f"{pr.player.name} attempted to remove an initiative effect")
-        return
-
-    location_data = Initiative.get(location=pr.active_location)
-    with db.atomic():
-        json_data = json.loads(location_data.data)
-
-        for initiative in json_data:
-            if initiative["shape"] == data["shape"]:
-                initiative["effects"].pop(data["index"])
-
-        location_data.data = json.dumps(json_data)
-        location_data.save()
-
-    await sio.emit(
-        "Initiative.Effect.Remove",
-        data,
-        room=pr.active_location.get_path(),
-        skip_sid=sid,
-        namespace=GAME_NS,
-    )
+    def update(entry: InitiativeEntry):
+        InitiativeEffect.delete().where(_effect_query(entry, data["index"])).execute()
+        InitiativeEffect.update(index=InitiativeEffect.index - 1).where(
+            InitiativeEffect.entry == entry, InitiativeEffect.index > data["index"]
+        ).execute()
+
+    if await update_actor_effects(sid, data["shape"], update, "remove"):
+        await send_effect_update(sid, "Initiative.Effect.Remove", data)
@@ -6,6 +6,7 @@ from ...api.socket.constants import GAME_NS
 from ...app import app, sio
 from ...logs import logger
 from ...models import Label, LabelSelection, PlayerRoom, User
+from ...state.board import board_cache
 from ...state.game import game_state
 
 
@@ -55,6 +56,7 @@ async def delete(sid: str, data: Dict[str, Any]):
         return
 
     label.delete_instance(True)
+    board_cache.clear()
 
     await sio.emit(
         "Label.Delete",
@@ -82,6 +84,7 @@ async def set_visibility(sid: str, data: LabelVisibilityMessage):
 
     label.visible = data["visible"]
     label.save()
+    board_cache.clear()
 
     for psid in game_state.get_sids(skip_sid=sid, room=pr.room):
         if game_state.get_user(psid) == pr.player:
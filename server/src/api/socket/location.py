@@ -1,5 +1,7 @@
+import asyncio
 import json
-from typing import Dict, List, Union, cast
+import math
+from typing import Any, Dict, List, Optional, Tuple, Union, cast
 
 from playhouse.shortcuts import update_model_from_dict
 from typing_extensions import TypedDict
@@ -7,7 +9,9 @@ from typing_extensions import TypedDict
 from ... import auth
 from ...api.socket.constants import GAME_NS
 from ...app import app, sio
+from ...cluster import cluster
 from ...config import config
+from ...db_executor import db_executor
 from ...data_types.client import Viewport
 from ...models import (
     Floor,
@@ -21,11 +25,21 @@ from ...models import (
     PlayerRoom,
     Room,
     Shape,
+    User,
 )
-from ...models.asset import Asset
+from ...models.asset import Asset, AssetStructure
 from ...models.label import Label, LabelSelection
 from ...models.role import Role
+from ...serialization import serialization_pool
+from ...state.asset import asset_tree_cache
+from ...state.board import board_cache
+from ...state.changelog import (
+    VERSION_ROOM_PREFIX,
+    change_log,
+    get_version_room,
+)
 from ...state.game import game_state
+from ...state.positions import position_buffer
 from ...logs import logger
 
 
@@ -75,26 +89,265 @@ class LocationCloneData(TypedDict):
     room: str
 
 
+class LocationResyncData(TypedDict, total=False):
+    location: int
+    version: int
+    epoch: str
+    # sid of the previous connection, its own changes are not replayed
+    sid: str
+
+
+class LocationLoadData(TypedDict, total=False):
+    snapshot: bool
+    progressive: bool
+    viewport: Viewport
+    versions: bool
+    resync: LocationResyncData
+
+
+class ClientInfo(TypedDict, total=False):
+    sid: str
+    viewport: Viewport
+
+
+class ConnectionState(TypedDict):
+    """
+    The parts of the game state that a location load needs.
+
+    The game state is changed by the event loop at any time,
+    so it is copied on the event loop before the load moves to the serialization pool.
+    """
+
+    # The clients of every player in the room, only collected for DMs
+    clients: Dict[int, List[ClientInfo]]
+    gameboards: List[Dict[str, str]]
+    viewport: Viewport
+
+
+class StreamedShape(TypedDict):
+    # position of the shape in its layer once all shapes are loaded
+    index: int
+    shape: Dict[str, Any]
+
+
+# (min_x, min_y, max_x, max_y) in world coordinates
+Bounds = Tuple[float, float, float, float]
+
+# Number of shapes per Board.Shapes.Stream message
+STREAM_CHUNK_SIZE = 100
+# Used for progressive loads when the client did not report its viewport yet
+DEFAULT_VIEWPORT: Viewport = {
+    "width": 1920,
+    "height": 1080,
+    "offset_x": 0,
+    "offset_y": 0,
+}
+# Mirrors DEFAULT_GRID_SIZE in the client
+DEFAULT_GRID_SIZE = 50
+# Number of times a snapshot is rebuilt when the location changes while it is being built
+SNAPSHOT_ATTEMPTS = 3
+# Maximum number of clients that are loaded at the same time on a location change
+LOCATION_CHANGE_CONCURRENCY = 8
+
+
+# Bump this whenever the structure of LocationSnapshot changes
+SNAPSHOT_VERSION = 1
+
+
+class LocationSnapshot(TypedDict, total=False):
+    version: int
+    complete: bool
+    room: Dict[str, Any]
+    players: List[Dict[str, Any]]
+    playerOptions: Dict[str, Any]
+    location: Dict[str, Any]
+    locationSettings: Dict[str, Any]
+    locations: List[Dict[str, Any]]
+    floors: List[Dict[str, Any]]
+    initiative: Dict[str, Any]
+    labels: List[Dict[str, Any]]
+    labelFilters: List[str]
+    notes: List[Dict[str, Any]]
+    markers: List[str]
+    assets: AssetStructure
+    gameboards: List[Dict[str, str]]
+
+
 @sio.on("Location.Load", namespace=GAME_NS)
 @auth.login_required(app, sio, "game")
-async def _load_location(sid: str):
+async def _load_location(sid: str, data: Optional[LocationLoadData] = None):
     pr: PlayerRoom = game_state.get(sid)
 
+    # Older clients send no data and expect the individual event sequence
+    if data is not None:
+        if data.get("snapshot", False):
+            game_state.snapshot_clients.add(sid)
+        if data.get("progressive", False):
+            game_state.progressive_clients.add(sid)
+        if "viewport" in data:
+            game_state.client_viewports[sid] = data["viewport"]
+        if data.get("versions", False):
+            game_state.versioned_clients.add(sid)
+        if "resync" in data and await resync_location(sid, pr, data["resync"]):
+            return
+
     await load_location(sid, pr.active_location, complete=True)
 
 
+async def resync_location(sid: str, pr: PlayerRoom, data: LocationResyncData) -> bool:
+    """
+    Sends the changes that a reconnecting client missed since its last seen version.
+
+    Returns False if this is not possible and a full load is required instead.
+    """
+    location = pr.active_location
+    if data.get("location") != location.id or data.get("epoch") != change_log.epoch:
+        return False
+
+    events = change_log.get_changes(location, data.get("version", 0))
+    if events is None:
+        return False
+
+    change_log.track(location)
+    if sid in game_state.versioned_clients:
+        sio.enter_room(sid, get_version_room(location), namespace=GAME_NS)
+
+    await sio.emit(
+        "Location.Resync",
+        {
+            "location": location.id,
+            "version": change_log.get_version(location),
+            "epoch": change_log.epoch,
+            "events": [
+                [event, event_data]
+                for event, event_data, skip_sid in events
+                if skip_sid is None or skip_sid != data.get("sid")
+            ],
+        },
+        room=sid,
+        namespace=GAME_NS,
+    )
+    return True
+
+
 @auth.login_required(app, sio, "game")
 async def load_location(sid: str, location: Location, *, complete=False):
     pr: PlayerRoom = game_state.get(sid)
-    if pr.active_location != location:
-        pr.active_location = location
-        pr.save()
+    game_state.set_active_location(sid, location)
 
+    progressive = sid in game_state.progressive_clients
+    if progressive:
+        # A stream of a previous load is no longer relevant
+        game_state.cancel_stream(sid)
+
+    if complete:
+        # The snapshot is built with read-only connections, so the root folder has to exist already
+        Asset.get_root_folder(pr.player)
+
+    # The snapshot is built off the event loop, changes that are made in the meantime
+    # might be missing from it, in which case it is built again.
+    for _ in range(SNAPSHOT_ATTEMPTS):
+        version = change_log.get_version(location)
+        position_buffer.flush()
+        snapshot, streamed = await serialization_pool.run(
+            prepare_location_load,
+            sid,
+            pr,
+            location,
+            get_connection_state(sid, pr),
+            complete=complete,
+            progressive=progressive,
+        )
+        if change_log.get_version(location) == version:
+            break
+    change_log.track(location)
+
+    if sid in game_state.versioned_clients:
+        for room in sio.rooms(sid, namespace=GAME_NS):
+            if room.startswith(VERSION_ROOM_PREFIX):
+                sio.leave_room(sid, room, namespace=GAME_NS)
+        sio.enter_room(sid, get_version_room(location), namespace=GAME_NS)
+        # Sent before anything else, so that no later version can arrive first
+        await sio.emit(
+            "Location.Version.Set",
+            {
+                "location": location.id,
+                "version": version,
+                "epoch": change_log.epoch,
+            },
+            room=sid,
+            namespace=GAME_NS,
+        )
+
+    if sid in game_state.snapshot_clients:
+        await sio.emit("Location.Snapshot", snapshot, room=sid, namespace=GAME_NS)
+    else:
+        await send_location_snapshot(sid, snapshot)
+
+    if progressive:
+        game_state.client_streams[sid] = asyncio.create_task(
+            stream_shapes(sid, location.id, streamed)
+        )
+
+
+def get_connection_state(sid: str, pr: PlayerRoom) -> ConnectionState:
     IS_DM = pr.role == Role.DM
 
+    clients: Dict[int, List[ClientInfo]] = {}
+    if IS_DM:
+        for client, client_pr in game_state.get_t(room=pr.room):
+            client_info: ClientInfo = {"sid": client}
+            viewport = game_state.client_viewports.get(client)
+            if viewport is not None:
+                client_info["viewport"] = viewport
+            clients.setdefault(client_pr.player.id, []).append(client_info)
+
+    return {
+        "clients": clients,
+        "gameboards": [
+            {"client": psid, "boardId": game_state.client_gameboards[psid]}
+            for psid in game_state.get_sids(active_location=pr.active_location)
+            if psid in game_state.client_gameboards and (IS_DM or sid == psid)
+        ],
+        "viewport": game_state.client_viewports.get(sid, DEFAULT_VIEWPORT),
+    }
+
+
+def prepare_location_load(
+    sid: str,
+    pr: PlayerRoom,
+    location: Location,
+    state: ConnectionState,
+    *,
+    complete: bool,
+    progressive: bool,
+) -> Tuple[LocationSnapshot, List[StreamedShape]]:
+    snapshot = build_location_snapshot(sid, pr, location, state, complete=complete)
+    streamed: List[StreamedShape] = []
+    if progressive:
+        bounds = get_viewport_bounds(state["viewport"], pr, location)
+        snapshot["floors"], streamed = split_floors(snapshot["floors"], bounds)
+    return snapshot, streamed
+
+
+def build_location_snapshot(
+    sid: str,
+    pr: PlayerRoom,
+    location: Location,
+    state: ConnectionState,
+    *,
+    complete: bool,
+) -> LocationSnapshot:
+    IS_DM = pr.role == Role.DM
+
+    snapshot: LocationSnapshot = {
+        "version": SNAPSHOT_VERSION,
+        "complete": complete,
+    }
+
     player_data = []
     current_player_index = -1
-    for i, rp in enumerate(pr.room.players):
+    for i, rp in enumerate(get_room_players(pr.room)):
         if rp.player.id == pr.player.id:
             current_player_index = i
 
@@ -115,39 +368,20 @@ async def load_location(sid: str, location: Location, *, complete=False):
             )[0]
 
         if IS_DM:
-            client_data = []
-            for client in game_state.get_sids(player=rp.player, room=pr.room):
-                client_info: Dict[str, Union[str, Viewport]] = {"sid": client}
-                viewport = game_state.client_viewports.get(client)
-                if viewport is not None:
-                    client_info["viewport"] = viewport
-                client_data.append(client_info)
-            player_info["clients"] = client_data
+            player_info["clients"] = state["clients"].get(rp.player.id, [])
 
         player_data.append(player_info)
 
-    # 0. CLEAR
-
-    if complete:
-        await sio.emit("CLEAR", room=sid, namespace=GAME_NS)
-    else:
-        await sio.emit("PARTIAL-CLEAR", room=sid, namespace=GAME_NS)
-
     # 1. Load room info
 
     if complete:
-        await sio.emit(
-            "Room.Info.Set",
-            {
-                "name": pr.room.name,
-                "creator": pr.room.creator.name,
-                "invitationCode": str(pr.room.invitation_code),
-                "isLocked": pr.room.is_locked,
-                "publicName": config.get("General", "public_name", fallback=""),
-            },
-            room=sid,
-            namespace=GAME_NS,
-        )
+        snapshot["room"] = {
+            "name": pr.room.name,
+            "creator": pr.room.creator.name,
+            "invitationCode": str(pr.room.invitation_code),
+            "isLocked": pr.room.is_locked,
+            "publicName": config.get("General", "public_name", fallback=""),
+        }
 
     # 2. Load player info & options
 
@@ -159,53 +393,39 @@ async def load_location(sid: str, location: Location, *, complete=False):
     if pr.user_options:
         client_options["room_user_options"] = pr.user_options.as_dict()
 
-    await sio.emit("Players.Info.Set", player_data, room=sid, namespace=GAME_NS)
-    await sio.emit("Player.Options.Set", client_options, room=sid, namespace=GAME_NS)
+    snapshot["players"] = player_data
+    snapshot["playerOptions"] = client_options
 
     # 3. Load location
 
     location_data = location.as_dict()
-
-    await sio.emit("Location.Set", location_data, room=sid, namespace=GAME_NS)
+    snapshot["location"] = location_data
 
     # 4. Load location settings
 
     if complete and IS_DM:
-        await sio.emit(
-            "Locations.Settings.Set",
-            {
-                "default": pr.room.default_options.as_dict(),
-                "active": location_data["id"],
-                "locations": {
-                    loc.id: {} if loc.options is None else loc.options.as_dict()
-                    for loc in pr.room.locations
-                },
+        snapshot["locationSettings"] = {
+            "default": pr.room.default_options.as_dict(),
+            "active": location_data["id"],
+            "locations": {
+                loc.id: {} if loc.options is None else loc.options.as_dict()
+                for loc in pr.room.locations
             },
-            room=sid,
-            namespace=GAME_NS,
-        )
+        }
     elif not IS_DM:
         loc = pr.active_location
-        await sio.emit(
-            "Locations.Settings.Set",
-            {
-                "default": pr.room.default_options.as_dict(),
-                "active": location_data["id"],
-                "locations": {
-                    loc.id: {} if loc.options is None else loc.options.as_dict()
-                },
-            },
-            room=sid,
-            namespace=GAME_NS,
-        )
+        snapshot["locationSettings"] = {
+            "default": pr.room.default_options.as_dict(),
+            "active": location_data["id"],
+            "locations": {loc.id: {} if loc.options is None else loc.options.as_dict()},
+        }
 
     # 5. Load Board
 
-    locations = [
+    snapshot["locations"] = [
         {"id": loc.id, "name": loc.name, "archived": loc.archived}
         for loc in pr.room.locations.order_by(Location.index)
     ]
-    await sio.emit("Board.Locations.Set", locations, room=sid, namespace=GAME_NS)
 
     floors = [floor for floor in location.floors.order_by(Floor.index)]
 
@@ -219,21 +439,17 @@ async def load_location(sid: str, location: Location, *, complete=False):
         higher_floors = floors[index + 1 :] if index < len(floors) else []
         floors = [floors[index], *lower_floors, *higher_floors]
 
-    for floor in floors:
-        await sio.emit(
-            "Board.Floor.Set",
-            floor.as_dict(pr.player, cast(bool, IS_DM)),
-            room=sid,
-            namespace=GAME_NS,
-        )
+    visibility = board_cache.get_visibility_key(location, pr.player, IS_DM)
+    snapshot["floors"] = [
+        board_cache.get_floor(floor, pr.player, cast(bool, IS_DM), visibility)
+        for floor in floors
+    ]
 
     # 6. Load Initiative
 
     initiative_data = Initiative.get_or_none(location=location)
     if initiative_data:
-        await sio.emit(
-            "Initiative.Set", initiative_data.as_dict(), room=sid, namespace=GAME_NS
-        )
+        snapshot["initiative"] = initiative_data.as_dict()
 
     # 7. Load labels
 
@@ -245,72 +461,223 @@ async def load_location(sid: str, location: Location, *, complete=False):
             (LabelSelection.user == pr.player) & (LabelSelection.room == pr.room)
         )
 
-        await sio.emit(
-            "Labels.Set",
-            [label.as_dict() for label in labels],
-            room=sid,
-            namespace=GAME_NS,
-        )
-        await sio.emit(
-            "Labels.Filters.Set",
-            [label_filter.label.uuid for label_filter in label_filters],
-            room=sid,
-            namespace=GAME_NS,
-        )
+        snapshot["labels"] = [label.as_dict() for label in labels]
+        snapshot["labelFilters"] = [
+            label_filter.label.uuid for label_filter in label_filters
+        ]
 
     # 8. Load Notes
 
-    await sio.emit(
-        "Notes.Set",
-        [
-            note.as_dict()
-            for note in Note.select().where(
-                (Note.user == pr.player) & (Note.room == pr.room)
-            )
-        ],
-        room=sid,
-        namespace=GAME_NS,
-    )
+    snapshot["notes"] = [
+        note.as_dict()
+        for note in Note.select().where(
+            (Note.user == pr.player) & (Note.room == pr.room)
+        )
+    ]
 
     # 9. Load Markers
 
-    await sio.emit(
-        "Markers.Set",
-        [
-            marker.as_string()
-            for marker in Marker.select(Marker.shape_id).where(
-                (Marker.user == pr.player) & (Marker.location == location)
-            )
-        ],
-        room=sid,
-        namespace=GAME_NS,
-    )
+    snapshot["markers"] = [
+        marker.as_string()
+        for marker in Marker.select(Marker.shape_id).where(
+            (Marker.user == pr.player) & (Marker.location == location)
+        )
+    ]
 
     # 10. Load Assets
 
     if complete:
+        snapshot["assets"] = asset_tree_cache.get(pr.player)
+
+    # 11. Sync Gameboards
+
+    snapshot["gameboards"] = state["gameboards"]
+
+    return snapshot
+
+
+async def send_location_snapshot(sid: str, snapshot: LocationSnapshot):
+    """
+    Sends the contents of a location snapshot as the individual event sequence
+    that clients without Location.Snapshot support expect.
+    """
+
+    def emit(event: str, data=None):
+        return sio.emit(event, data, room=sid, namespace=GAME_NS)
+
+    await emit("CLEAR" if snapshot["complete"] else "PARTIAL-CLEAR")
+    if "room" in snapshot:
+        await emit("Room.Info.Set", snapshot["room"])
+    await emit("Players.Info.Set", snapshot["players"])
+    await emit("Player.Options.Set", snapshot["playerOptions"])
+    await emit("Location.Set", snapshot["location"])
+    if "locationSettings" in snapshot:
+        await emit("Locations.Settings.Set", snapshot["locationSettings"])
+    await emit("Board.Locations.Set", snapshot["locations"])
+    for floor in snapshot["floors"]:
+        await emit("Board.Floor.Set", floor)
+    if "initiative" in snapshot:
+        await emit("Initiative.Set", snapshot["initiative"])
+    if "labels" in snapshot:
+        await emit("Labels.Set", snapshot["labels"])
+        await emit("Labels.Filters.Set", snapshot["labelFilters"])
+    await emit("Notes.Set", snapshot["notes"])
+    await emit("Markers.Set", snapshot["markers"])
+    if "assets" in snapshot:
+        await emit("Asset.List.Set", snapshot["assets"])
+    for gameboard in snapshot["gameboards"]:
+        await emit("Client.Gameboard.Set", gameboard)
+
+
+def zoom_display_to_factor(zoom_display: float, grid_size: int) -> float:
+    # Mirrors zoomDisplayToFactor in the client
+    zoom_value = 1 / (-5 / 3 + (28 / 15) * math.exp(1.83 * zoom_display))
+    return zoom_value * grid_size / DEFAULT_GRID_SIZE
+
+
+def get_viewport_bounds(
+    viewport: Viewport, pr: PlayerRoom, location: Location
+) -> Bounds:
+    """
+    Returns the part of the world that the client will initially render,
+    padded with half a screen on every side.
+    """
+    position = LocationUserOption.get(user=pr.player, location=location)
+
+    grid_size = pr.player.default_options.grid_size or DEFAULT_GRID_SIZE
+    if pr.user_options and pr.user_options.grid_size is not None:
+        grid_size = pr.user_options.grid_size
+
+    zoom = zoom_display_to_factor(position.zoom_display, grid_size)
+    width = viewport["width"] / zoom
+    height = viewport["height"] / zoom
+    min_x = -position.pan_x
+    min_y = -position.pan_y
+    return (
+        min_x - width / 2,
+        min_y - height / 2,
+        min_x + 1.5 * width,
+        min_y + 1.5 * height,
+    )
+
+
+def get_shape_bounds(shape: Dict[str, Any]) -> Bounds:
+    x, y = shape["x"], shape["y"]
+    if "width" in shape:
+        x2, y2 = x + shape["width"], y + shape["height"]
+    elif "radius" in shape:
+        r = shape["radius"]
+        x, y, x2, y2 = x - r, y - r, x + r, y + r
+    elif "x2" in shape:
+        x2, y2 = shape["x2"], shape["y2"]
+    elif "vertices" in shape:
+        xs = [x, *(v[0] for v in shape["vertices"])]
+        ys = [y, *(v[1] for v in shape["vertices"])]
+        return (min(xs), min(ys), max(xs), max(ys))
+    else:
+        x2, y2 = x, y
+    return (min(x, x2), min(y, y2), max(x, x2), max(y, y2))
+
+
+def intersects(a: Bounds, b: Bounds) -> bool:
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+def split_floors(
+    floors: List[Dict[str, Any]], bounds: Bounds
+) -> Tuple[List[Dict[str, Any]], List[StreamedShape]]:
+    """
+    Splits the serialized floors into the part that is sent immediately
+    and the shapes that are streamed afterwards.
+
+    Only the shapes of the first (i.e. active) floor that intersect the bounds are kept,
+    toggle composites are always streamed.
+    The streamed shapes are ordered by floor and by their index in the layer,
+    which allows the client to insert each of them at its index.
+
+    The floor dicts can be shared with the board cache, so they are copied instead of modified.
+    """
+    initial_floors = []
+    streamed: List[StreamedShape] = []
+    for i, floor in enumerate(floors):
+        layers = []
+        for layer in floor["layers"]:
+            shapes = []
+            for index, shape in enumerate(layer["shapes"]):
+                if (
+                    i == 0
+                    and shape["type_"] != "togglecomposite"
+                    and intersects(get_shape_bounds(shape), bounds)
+                ):
+                    shapes.append(shape)
+                else:
+                    streamed.append({"index": index, "shape": shape})
+            layers.append({**layer, "shapes": shapes})
+        initial_floors.append({**floor, "layers": layers})
+    return initial_floors, streamed
+
+
+async def stream_shapes(sid: str, location_id: int, shapes: List[StreamedShape]):
+    try:
+        for i in range(0, len(shapes), STREAM_CHUNK_SIZE):
+            # Give other clients the opportunity to be served in between chunks
+            await asyncio.sleep(0)
+            await sio.emit(
+                "Board.Shapes.Stream",
+                {"location": location_id, "shapes": shapes[i : i + STREAM_CHUNK_SIZE]},
+                room=sid,
+                namespace=GAME_NS,
+            )
         await sio.emit(
-            "Asset.List.Set",
-            Asset.get_user_structure(pr.player),
-            room=sid,
-            namespace=GAME_NS,
+            "Board.Shapes.Stream.End", location_id, room=sid, namespace=GAME_NS
         )
+    finally:
+        if game_state.client_streams.get(sid) is asyncio.current_task():
+            del game_state.client_streams[sid]
+
+
+def get_room_players(room: Room) -> List[PlayerRoom]:
+    """Returns the players of the room with their user and active location already loaded."""
+    return list(
+        PlayerRoom.select(PlayerRoom, User, Location)
+        .join(User)
+        .switch(PlayerRoom)
+        .join(Location)
+        .where(PlayerRoom.room == room)
+        .order_by(PlayerRoom.id)
+    )
 
-    # 11. Sync Gameboards
 
-    for psid in game_state.get_sids(active_location=pr.active_location):
-        if psid in game_state.client_gameboards:
-            board_id = game_state.client_gameboards[psid]
-            if IS_DM or sid == psid:
-                await sio.emit(
-                    "Client.Gameboard.Set",
-                    {
-                        "client": psid,
-                        "boardId": board_id,
-                    },
-                    room=sid,
-                    namespace=GAME_NS,
-                )
+async def load_client_location(
+    sid: str, location: Location, *, position: Optional[PositionTuple] = None
+):
+    """
+    Moves the client to the given location and loads it.
+
+    Clients that are connected to another worker are moved by that worker.
+    """
+    if not game_state.is_local(sid):
+        cluster.publish("game.location.load", (sid, location.id, position))
+        return
+
+    old_path = game_state.get(sid).active_location.get_path()
+    sio.leave_room(sid, old_path, namespace=GAME_NS)
+    sio.enter_room(sid, location.get_path(), namespace=GAME_NS)
+    await load_location(sid, location)
+    if position is not None:
+        await sio.emit("Position.Set", data=position, room=sid, namespace=GAME_NS)
+
+
+@cluster.on("game.location.load")
+async def _load_remote_client_location(
+    message: Tuple[str, int, Optional[PositionTuple]]
+):
+    sid, location_id, position = message
+    if not game_state.is_local(sid):
+        return
+    location = Location.get_or_none(id=location_id)
+    if location is not None:
+        await load_client_location(sid, location, position=position)
 
 
 @sio.on("Location.Change", namespace=GAME_NS)
@@ -322,50 +689,52 @@ async def change_location(sid: str, data: LocationChangeData):
         logger.warning(f"{pr.player.name} attempted to change location")
         return
 
-    # Send an anouncement to show loading state
-    for room_player in pr.room.players:
-        if room_player.player.name not in data["users"]:
-            continue
+    moved_players = [
+        room_player
+        for room_player in get_room_players(pr.room)
+        if room_player.player.name in data["users"]
+    ]
 
+    # Send an anouncement to show loading state
+    for room_player in moved_players:
         for psid in game_state.get_sids(player=room_player.player, room=pr.room):
             await sio.emit("Location.Change.Start", room=psid, namespace=GAME_NS)
 
-    new_location = Location.get_by_id(data["location"])
+    new_location = await db_executor.read(Location.get_by_id, data["location"])
 
     # First update DB for _all_ affected players
-    for room_player in pr.room.players:
-        if room_player.player.name not in data["users"]:
-            continue
-
-        room_player.active_location = new_location
-        room_player.save()
+    await db_executor.write(
+        PlayerRoom.update(active_location=new_location.id)
+        .where(PlayerRoom.id << [room_player.id for room_player in moved_players])
+        .execute
+    )
+    change_log.touch_room(pr.room)
 
     # Then send out updates
-    for room_player in pr.room.players:
-        if room_player.player.name not in data["users"]:
-            continue
+    # The clients are loaded concurrently, the board cache makes sure that the new location
+    # is only serialized once for every visibility class (DM or a player's owned shapes).
+    semaphore = asyncio.Semaphore(LOCATION_CHANGE_CONCURRENCY)
 
-        for psid in game_state.get_sids(player=room_player.player, room=pr.room):
-            try:
-                sio.leave_room(
-                    psid, room_player.active_location.get_path(), namespace=GAME_NS
-                )
-                sio.enter_room(psid, new_location.get_path(), namespace=GAME_NS)
-            except KeyError:
-                await game_state.remove_sid(psid)
-                continue
-            await load_location(psid, new_location)
-            # We could send this to all users in the new location, BUT
+    async def move_client(psid: str):
+        async with semaphore:
+            # We could send the position to all users in the new location, BUT
             # loading times might vary and we don't want to snap people back when they already move around
             # And it's possible that there are already users on the new location
             # that don't want to be moved to this new position
-            if "position" in data:
-                await sio.emit(
-                    "Position.Set",
-                    data=data["position"],
-                    room=psid,
-                    namespace=GAME_NS,
+            try:
+                await load_client_location(
+                    psid, new_location, position=data.get("position")
                 )
+            except (KeyError, ValueError):
+                await game_state.remove_sid(psid)
+
+    await asyncio.gather(
+        *(
+            move_client(psid)
+            for room_player in moved_players
+            for psid in game_state.get_sids(player=room_player.player, room=pr.room)
+        )
+    )
 
 
 @sio.on("Location.Options.Set", namespace=GAME_NS)
@@ -377,17 +746,23 @@ async def set_location_options(sid: str, data: LocationOptionsData):
         logger.warning(f"{pr.player.name} attempted to set a room option")
         return
 
-    if data.get("location", None) is None:
-        options = pr.room.default_options
-    else:
-        loc = Location.get_by_id(data["location"])
-        if loc.options is None:
-            loc.options = LocationOptions.create_empty()
-            loc.save()
-        options = loc.options
+    default_options_id = pr.room.default_options_id
+
+    def update_options():
+        if data.get("location", None) is None:
+            options = LocationOptions.get_by_id(default_options_id)
+        else:
+            loc = Location.get_by_id(data["location"])
+            if loc.options is None:
+                loc.options = LocationOptions.create_empty()
+                loc.save()
+            options = loc.options
+
+        update_model_from_dict(options, data["options"])
+        options.save()
 
-    update_model_from_dict(options, data["options"])
-    options.save()
+    await db_executor.write(update_options)
+    change_log.touch_room(pr.room)
 
     if data.get("location", None) is None:
         for sid in game_state.get_sids(skip_sid=sid, room=pr.room):
@@ -411,12 +786,18 @@ async def reset_location_options(sid: str, data: LocationOptionsResetData):
         logger.warning(f"{pr.player.name} attempted to reset a room option")
         return
 
-    loc = Location.get_by_id(data["location"])
-    if loc.options is None:
+    def reset_option() -> bool:
+        loc = Location.get_by_id(data["location"])
+        if loc.options is None:
+            return False
+        options = loc.options
+        setattr(options, data["key"], None)
+        options.save()
+        return True
+
+    if not await db_executor.write(reset_option):
         return
-    options = loc.options
-    setattr(options, data["key"], None)
-    options.save()
+    change_log.touch_room(pr.room)
 
     await sio.emit(
         "Location.Options.Reset",
@@ -441,14 +822,10 @@ async def add_new_location(sid: str, location: str):
     )
     new_location.create_floor()
 
-    for psid in game_state.get_sids(
-        player=pr.player, active_location=pr.active_location
-    ):
-        sio.leave_room(psid, pr.active_location.get_path(), namespace=GAME_NS)
-        sio.enter_room(psid, new_location.get_path(), namespace=GAME_NS)
-        await load_location(psid, new_location)
-    pr.active_location = new_location
-    pr.save()
+    old_location = pr.active_location
+    for psid in game_state.get_sids(player=pr.player, active_location=old_location):
+        await load_client_location(psid, new_location)
+    game_state.set_active_location(sid, new_location)
 
 
 @sio.on("Location.Clone", namespace=GAME_NS)
@@ -512,14 +889,10 @@ async def clone_location(sid: str, data: LocationCloneData):
             LocationUserOption.create(**lduo)
 
     if room == pr.room:
-        for psid in game_state.get_sids(
-            player=pr.player, active_location=pr.active_location
-        ):
-            sio.leave_room(psid, pr.active_location.get_path(), namespace=GAME_NS)
-            sio.enter_room(psid, new_location.get_path(), namespace=GAME_NS)
-            await load_location(psid, new_location)
-        pr.active_location = new_location
-        pr.save()
+        old_location = pr.active_location
+        for psid in game_state.get_sids(player=pr.player, active_location=old_location):
+            await load_client_location(psid, new_location)
+        game_state.set_active_location(sid, new_location)
 
 
 @sio.on("Locations.Order.Set", namespace=GAME_NS)
@@ -581,6 +954,7 @@ async def delete_location(sid: str, location_id: int):
         return
 
     location.delete_instance(recursive=True)
+    board_cache.evict(location_id)
 
 
 @sio.on("Location.Archive", namespace=GAME_NS)
@@ -634,6 +1008,7 @@ async def get_location_spawn_info(sid: str, location_id: int):
 
     data = []
 
+    position_buffer.flush()
     try:
         location = Location.get_by_id(location_id)
         if location.options is not None:
@@ -13,14 +13,13 @@ from ...state.game import game_state
 async def request(sid: str, data: Dict):
     pr: PlayerRoom = game_state.get(sid)
 
-    for psid in game_state.get_sids(room=pr.room):
-        if game_state.get(psid).role == Role.DM:
-            await sio.emit(
-                "Logic.Request",
-                {**data, "requester": pr.player.name},
-                room=psid,
-                namespace=GAME_NS,
-            )
+    for psid in game_state.get_sids(room=pr.room, role=Role.DM):
+        await sio.emit(
+            "Logic.Request",
+            {**data, "requester": pr.player.name},
+            room=psid,
+            namespace=GAME_NS,
+        )
 
 
 @sio.on("Logic.Request.Decline", namespace=GAME_NS)
@@ -7,6 +7,7 @@ from ...logs import logger
 from ...models import PlayerRoom
 from ...models.role import Role
 from ...models.user import User
+from ...state.changelog import change_log
 from ...state.game import game_state
 
 
@@ -62,10 +63,12 @@ async def set_player_role(sid: str, data: PlayerRoleChange):
 
     player_pr.role = new_role
     player_pr.save()
+    change_log.touch_room(pr.room)
+    # The connections are dropped below, but they can still be handling events until then
+    game_state.reload_room_sessions(pr.room, player_pr.player)
 
     for sid in game_state.get_sids(player=player_pr.player, room=pr.room):
         await sio.disconnect(sid, namespace=GAME_NS)
 
-    for psid in game_state.get_sids(room=pr.room):
-        if game_state.get(psid).role == Role.DM:
-            await sio.emit("Player.Role.Set", data, room=psid, namespace=GAME_NS)
+    for psid in game_state.get_sids(room=pr.room, role=Role.DM):
+        await sio.emit("Player.Role.Set", data, room=psid, namespace=GAME_NS)
@@ -7,6 +7,7 @@ from ...logs import logger
 from ...models import PlayerRoom
 from ...models.role import Role
 from ...models.user import User
+from ...state.board import board_cache
 from ...state.game import game_state
 
 
@@ -72,6 +73,7 @@ async def delete_session(sid: str):
         return
 
     pr.room.delete_instance(True)
+    board_cache.clear()
 
 
 @sio.on("Room.Info.Set.Locked", namespace=GAME_NS)
@@ -85,6 +87,7 @@ async def set_locked_game_state(sid: str, is_locked: bool):
 
     pr.room.is_locked = is_locked
     pr.room.save()
+    game_state.reload_room_sessions(pr.room)
     for psid in game_state.get_sids(room=pr.room):
         if game_state.get(psid).role != Role.DM:
             await sio.disconnect(psid, namespace=GAME_NS)
@@ -1,11 +1,12 @@
+from collections import defaultdict
 from typing import Any, Dict, List, Optional, Tuple, Union, cast
 
-from peewee import Case
 from socketio import AsyncServer
 
 from .... import auth
 from ....api.helpers import _send_game
 from ....app import app, sio
+from ....db_executor import db_executor
 from ....logs import logger
 from ....models import (
     AssetRect,
@@ -23,24 +24,31 @@ from ....models import (
     User,
 )
 from ....models.campaign import Location
-from ....models.db import db
 from ....models.role import Role
-from ....models.shape.access import has_ownership
+from ....models.shape.access import has_ownership_many
+from ....models.shape.bulk import create_shapes, shapes_as_dict
+from ....models.shape.order import (
+    SHAPE_INDEX_GAP,
+    get_index_for_rank,
+    get_next_index,
+)
 from ....models.utils import get_table, reduce_data_to_model
+from ....state.board import VisibilityKey, board_cache
 from ....state.game import game_state
+from ....state.positions import position_buffer
 from ..constants import GAME_NS
 from ..groups import remove_group_if_empty
 from .. import initiative
 from .data_models import (
     AssetRectImageData,
     CircleSizeData,
-    OptionUpdate,
     OptionUpdateList,
-    PositionUpdate,
     PositionUpdateList,
     RectSizeData,
     ServerShapeLocationMove,
     ShapeAdd,
+    ShapeKeys,
+    ShapesAdd,
     ShapeFloorChange,
     ShapeOrder,
     TemporaryShapesList,
@@ -70,43 +78,14 @@ async def add_shape(sid: str, data: ShapeAdd):
     if data["temporary"]:
         game_state.add_temp(sid, data["shape"]["uuid"])
     else:
-        with db.atomic():
-            data["shape"]["layer"] = layer
-            data["shape"]["index"] = layer.shapes.count()
-            # Shape itself
-            shape = Shape.create(**reduce_data_to_model(Shape, data["shape"]))
-            # Subshape
-            type_table = get_table(shape.type_)
-            if type_table is None:
-                logger.error("UNKNOWN SHAPE TYPE DETECTED")
-                return
-
-            subshape = type_table.create(
-                shape=shape,
-                **type_table.pre_create(
-                    **reduce_data_to_model(type_table, data["shape"])
-                ),
-            )
-            type_table.post_create(subshape, **data["shape"])
-            # Owners
-            for owner in data["shape"]["owners"]:
-                ShapeOwner.create(
-                    shape=shape,
-                    user=User.by_name(owner["user"]),
-                    edit_access=owner["edit_access"],
-                    movement_access=owner["movement_access"],
-                    vision_access=owner["vision_access"],
-                )
-            # Trackers
-            for tracker in data["shape"]["trackers"]:
-                # do not shortline this to **reduce_data_to_model(...), shape=shape
-                # if shape exists in the model it crashes
-                tracker_model = reduce_data_to_model(Tracker, tracker)
-                tracker_model.update(shape=shape)
-                Tracker.create(**tracker_model)
-            # Auras
-            for aura in data["shape"]["auras"]:
-                Aura.create(**reduce_data_to_model(Aura, aura))
+        type_table = get_table(data["shape"]["type_"])
+        if type_table is None:
+            logger.error("UNKNOWN SHAPE TYPE DETECTED")
+            return
+        shape = await db_executor.write(
+            _create_shape, layer.id, type_table, data["shape"]
+        )
+        board_cache.bump(pr.active_location)
 
     for room_player in pr.room.players:
         is_dm = cast(bool, room_player.role == Role.DM)
@@ -122,40 +101,165 @@ async def add_shape(sid: str, data: ShapeAdd):
             await sio.emit("Shape.Add", data["shape"], room=psid, namespace=GAME_NS)
 
 
-@sio.on("Shapes.Position.Update", namespace=GAME_NS)
+def _create_shape(layer_id: int, type_table, data: Dict[str, Any]) -> Shape:
+    data["layer"] = layer_id
+    data["index"] = get_next_index(layer_id)
+    data["options"] = Shape.parse_options(data.get("options"))
+    # Shape itself
+    shape = Shape.create(**reduce_data_to_model(Shape, data))
+    # Subshape
+    subshape = type_table.create(
+        shape=shape,
+        **type_table.pre_create(**reduce_data_to_model(type_table, data)),
+    )
+    type_table.post_create(subshape, **data)
+    # Owners
+    for owner in data["owners"]:
+        ShapeOwner.create(
+            shape=shape,
+            user=User.by_name(owner["user"]),
+            edit_access=owner["edit_access"],
+            movement_access=owner["movement_access"],
+            vision_access=owner["vision_access"],
+        )
+    # Trackers
+    for tracker in data["trackers"]:
+        # do not shortline this to **reduce_data_to_model(...), shape=shape
+        # if shape exists in the model it crashes
+        tracker_model = reduce_data_to_model(Tracker, tracker)
+        tracker_model.update(shape=shape)
+        Tracker.create(**tracker_model)
+    # Auras
+    for aura in data["auras"]:
+        Aura.create(**reduce_data_to_model(Aura, aura))
+    return shape
+
+
+@sio.on("Shapes.Add", namespace=GAME_NS)
 @auth.login_required(app, sio, "game")
-async def update_shape_positions(sid: str, data: PositionUpdateList):
+async def add_shapes(sid: str, data: ShapesAdd):
     pr: PlayerRoom = game_state.get(sid)
 
-    shapes: List[Tuple[Shape, PositionUpdate]] = []
+    if "temporary" not in data:
+        data["temporary"] = False
 
-    for sh in data["shapes"]:
-        shape = Shape.get_or_none(Shape.uuid == sh["uuid"])
-        if shape is not None and not has_ownership(shape, pr, movement=True):
-            logger.warning(
-                f"User {pr.player.name} attempted to move a shape it does not own."
-            )
+    layers: Dict[Tuple[str, str], Layer] = await db_executor.read(
+        _get_location_layers, pr.active_location.id
+    )
+
+    shapes: List[Tuple[Layer, ShapeKeys]] = []
+    for shape_data in data["shapes"]:
+        layer = layers.get((shape_data["floor"], shape_data["layer"]))
+        if layer is None:
+            return
+        if pr.role != Role.DM and not layer.player_editable:
+            logger.warning(f"{pr.player.name} attempted to add a shape to a dm layer")
+            return
+        if get_table(shape_data["type_"]) is None:
+            logger.error("UNKNOWN SHAPE TYPE DETECTED")
             return
-        shapes.append((shape, sh))
+        shapes.append((layer, shape_data))
+
+    if len(shapes) == 0:
+        return
+
+    db_shapes: List[Shape] = []
+    if data["temporary"]:
+        for _, shape_data in shapes:
+            game_state.add_temp(sid, shape_data["uuid"])
+    else:
+        db_shapes = await db_executor.write(
+            create_shapes, [(layer.id, shape_data) for layer, shape_data in shapes]
+        )
+        board_cache.bump(pr.active_location)
+
+    # Every group of clients that would receive the same data gets a single serialization
+    visibility_classes: Dict[VisibilityKey, List[str]] = defaultdict(list)
+    users: Dict[VisibilityKey, User] = {}
+    for room_player in pr.room.players:
+        is_dm = room_player.role == Role.DM
+        if is_dm:
+            key: VisibilityKey = "dm"
+        else:
+            key = frozenset(
+                shape_data["uuid"]
+                for _, shape_data in shapes
+                if any(
+                    o["user"] == room_player.player.name for o in shape_data["owners"]
+                )
+            )
+        for psid in game_state.get_sids(
+            player=room_player.player, active_location=pr.active_location
+        ):
+            if psid == sid:
+                continue
+            visibility_classes[key].append(psid)
+            users[key] = room_player.player
+
+    for key, sids in visibility_classes.items():
+        is_dm = key == "dm"
+        if data["temporary"]:
+            shapes_data = [
+                shape_data
+                for layer, shape_data in shapes
+                if is_dm or layer.player_visible
+            ]
+        else:
+            shapes_data = shapes_as_dict(
+                [
+                    db_shape
+                    for db_shape, (layer, _) in zip(db_shapes, shapes)
+                    if is_dm or layer.player_visible
+                ],
+                users[key],
+                is_dm,
+            )
+        if len(shapes_data) == 0:
+            continue
+        for psid in sids:
+            await sio.emit("Shapes.Add", shapes_data, room=psid, namespace=GAME_NS)
+
+
+def _get_location_layers(location_id: int) -> Dict[Tuple[str, str], Layer]:
+    return {
+        (layer.floor.name, layer.name): layer
+        for layer in Layer.select(Layer, Floor)
+        .join(Floor)
+        .where(Floor.location == location_id)
+    }
+
+
+@sio.on("Shapes.Position.Update", namespace=GAME_NS)
+@auth.login_required(app, sio, "game")
+async def update_shape_positions(sid: str, data: PositionUpdateList):
+    session = game_state.get_session(sid)
+
+    owned, shapes = await db_executor.read(
+        has_ownership_many, [sh["uuid"] for sh in data["shapes"]], session, True
+    )
+    if not owned:
+        logger.warning(
+            f"User {session.player_name} attempted to move a shape it does not own."
+        )
+        return
 
     if not data["temporary"]:
-        with db.atomic():
-            for db_shape, data_shape in shapes:
-                points = data_shape["position"]["points"]
-                db_shape.x = points[0][0]
-                db_shape.y = points[0][1]
-                db_shape.angle = data_shape["position"]["angle"]
-                db_shape.save()
-
-                if len(points) > 1:
-                    # Subshape
-                    type_instance = db_shape.subtype
-                    type_instance.set_location(points[1:])
+        # Persisted by the position buffer within the configured flush interval
+        for data_shape in data["shapes"]:
+            db_shape = shapes.get(data_shape["uuid"])
+            if db_shape is None:
+                continue
+            position_buffer.add(
+                db_shape,
+                data_shape["position"]["points"],
+                data_shape["position"]["angle"],
+            )
+        board_cache.bump(session.location)
 
     await sio.emit(
         "Shapes.Position.Update",
         data["shapes"],
-        room=pr.active_location.get_path(),
+        room=session.location_path,
         skip_sid=sid,
         namespace=GAME_NS,
     )
@@ -171,6 +275,7 @@ async def send_remove_shapes(
 @auth.login_required(app, sio, "game")
 async def remove_shapes(sid: str, data: TemporaryShapesList):
     pr: PlayerRoom = game_state.get(sid)
+    session = game_state.get_session(sid)
 
     if data["temporary"]:
         # This stuff is not stored so we cannot do any server side validation /shrug
@@ -178,40 +283,54 @@ async def remove_shapes(sid: str, data: TemporaryShapesList):
             game_state.remove_temp(sid, shape)
     else:
         # Use the server version of the shapes.
-        try:
-            shapes: List[Shape] = [
-                s for s in Shape.select().where(Shape.uuid << data["uuids"])  # type: ignore
-            ]
-        except Shape.DoesNotExist:
-            logger.warning(f"Attempt to remove unknown shape by {pr.player.name}")
+        owned, db_shapes = await db_executor.read(
+            has_ownership_many, data["uuids"], session
+        )
+        if not owned:
+            logger.warning(
+                f"User {session.player_name} tried to remove a shape it does not own."
+            )
             return
 
-        layer = shapes[0].layer
+        shapes = list(db_shapes.values())
+        if len(shapes) == 0:
+            logger.warning(f"Attempt to remove unknown shape by {session.player_name}")
+            return
 
         group_ids = set()
 
         for shape in shapes:
-            if not has_ownership(shape, pr):
-                logger.warning(
-                    f"User {pr.player.name} tried to remove a shape it does not own."
-                )
-                return
-
-            await initiative.remove_shape(pr, shape.uuid, shape.group)
+            await initiative.remove_shape(pr, shape.uuid, shape.group_id)
 
-            if shape.group:
-                group_ids.add(shape.group)
+            if shape.group_id:
+                group_ids.add(shape.group_id)
 
-            old_index = shape.index
-            shape.delete_instance(True)
-            Shape.update(index=Shape.index - 1).where(
-                (Shape.layer == layer) & (Shape.index >= old_index)
-            ).execute()
+        await db_executor.write(_delete_shapes, [shape.uuid for shape in shapes])
 
         for group_id in group_ids:
             await remove_group_if_empty(group_id)
+        board_cache.bump(session.location)
+
+    await send_remove_shapes(sio, data["uuids"], session.location_path, sid)
+
+
+def _delete_shapes(uuids: List[str]) -> None:
+    for shape in Shape.select().where(Shape.uuid << uuids):
+        shape.delete_instance(True)
 
-    await send_remove_shapes(sio, data["uuids"], pr.active_location.get_path(), sid)
+
+def _move_to_layer(uuids: List[str], layer_id: int) -> List[Shape]:
+    """
+    Puts the shapes on top of the other shapes in the layer, in the given order.
+
+    Returns the moved shapes.
+    """
+    index = get_next_index(layer_id)
+    for uuid in uuids:
+        Shape.update(layer=layer_id, index=index).where(Shape.uuid == uuid).execute()
+        index += SHAPE_INDEX_GAP
+    shapes = {shape.uuid: shape for shape in Shape.select().where(Shape.uuid << uuids)}
+    return [shapes[uuid] for uuid in uuids if uuid in shapes]
 
 
 @sio.on("Shapes.Floor.Change", namespace=GAME_NS)
@@ -226,17 +345,9 @@ async def change_shape_floor(sid: str, data: ShapeFloorChange):
     floor: Floor = Floor.get(location=pr.active_location, name=data["floor"])
     shapes: List[Shape] = [s for s in Shape.select().where(Shape.uuid << data["uuids"])]  # type: ignore
     layer: Layer = Layer.get(floor=floor, name=shapes[0].layer.name)
-    old_layer = shapes[0].layer
-
-    for shape in shapes:
-        old_index = shape.index
-        shape.layer = layer
-        shape.index = layer.shapes.count()
-        shape.save()
 
-        Shape.update(index=Shape.index - 1).where(
-            (Shape.layer == old_layer) & (Shape.index >= old_index)
-        ).execute()
+    await db_executor.write(_move_to_layer, [s.uuid for s in shapes], layer.id)
+    board_cache.bump(pr.active_location)
 
     await sio.emit(
         "Shapes.Floor.Change",
@@ -256,6 +367,9 @@ async def change_shape_layer(sid: str, data: Dict[str, Any]):
         logger.warning(f"{pr.player.name} attempted to move the layer of a shape")
         return
 
+    # The shapes are sent to players that did not have them yet
+    position_buffer.flush()
+
     floor = Floor.get(location=pr.active_location, name=data["floor"])
     shapes: List[Shape] = [s for s in Shape.select().where(Shape.uuid << data["uuids"])]
     layer = Layer.get(floor=floor, name=data["layer"])
@@ -272,15 +386,8 @@ async def change_shape_layer(sid: str, data: Dict[str, Any]):
             ):
                 await send_remove_shapes(sio, data["uuids"], psid)
 
-    for shape in shapes:
-        old_index = shape.index
-
-        shape.layer = layer
-        shape.index = layer.shapes.count()
-        shape.save()
-        Shape.update(index=Shape.index - 1).where(
-            (Shape.layer == old_layer) & (Shape.index >= old_index)
-        ).execute()
+    shapes = await db_executor.write(_move_to_layer, [s.uuid for s in shapes], layer.id)
+    board_cache.bump(pr.active_location)
 
     if old_layer.player_visible and layer.player_visible:
         await sio.emit(
@@ -309,7 +416,7 @@ async def change_shape_layer(sid: str, data: Dict[str, Any]):
                 elif layer.player_visible:
                     await sio.emit(
                         "Shapes.Add",
-                        [shape.as_dict(room_player.player, False) for shape in shapes],
+                        shapes_as_dict(shapes, room_player.player, False),
                         room=psid,
                         namespace=GAME_NS,
                     )
@@ -331,20 +438,8 @@ async def move_shape_order(sid: str, data: ShapeOrder):
             )
             return
 
-        target = data["index"]
-        sign = 1 if target < shape.index else -1
-        case = Case(
-            None,
-            (
-                (Shape.index == shape.index, target),
-                (
-                    (sign * Shape.index) < (sign * shape.index),
-                    (Shape.index + (sign * 1)),
-                ),
-            ),
-            Shape.index,
-        )
-        Shape.update(index=case).where(Shape.layer == layer).execute()
+        await db_executor.write(_set_rank, shape.uuid, layer.id, data["index"])
+        board_cache.bump(pr.active_location)
 
     await sio.emit(
         "Shape.Order.Set",
@@ -355,6 +450,11 @@ async def move_shape_order(sid: str, data: ShapeOrder):
     )
 
 
+def _set_rank(uuid: str, layer_id: int, rank: int) -> None:
+    index = get_index_for_rank(layer_id, rank, Shape.get_by_id(uuid))
+    Shape.update(index=index).where(Shape.uuid == uuid).execute()
+
+
 @sio.on("Shapes.Location.Move", namespace=GAME_NS)
 @auth.login_required(app, sio, "game")
 async def move_shapes(sid: str, data: ServerShapeLocationMove):
@@ -369,26 +469,41 @@ async def move_shapes(sid: str, data: ServerShapeLocationMove):
     x = data["target"]["x"]
     y = data["target"]["y"]
 
+    position_buffer.flush()
     shapes = [Shape.get_by_id(sh) for sh in data["shapes"]]
 
     await send_remove_shapes(
         sio, [sh.uuid for sh in shapes], pr.active_location.get_path()
     )
 
-    for shape in shapes:
-        shape.layer = floor.layers.where(Layer.name == shape.layer.name)[0]
-        shape.center_at(x, y)
-        shape.save()
+    shapes = await db_executor.write(
+        _move_to_floor, [sh.uuid for sh in shapes], floor.id, x, y
+    )
+    board_cache.bump(pr.active_location)
+    board_cache.bump(location)
 
     for psid, player in game_state.get_users(active_location=location):
         await sio.emit(
             "Shapes.Add",
-            [sh.as_dict(player, game_state.get(psid).role == Role.DM) for sh in shapes],
+            shapes_as_dict(shapes, player, game_state.get(psid).role == Role.DM),
             room=psid,
             namespace=GAME_NS,
         )
 
 
+def _move_to_floor(uuids: List[str], floor_id: int, x: int, y: int) -> List[Shape]:
+    """Moves the shapes to the same layers of the floor, centered at (x, y). Returns the moved shapes."""
+    layers = {
+        layer.name: layer for layer in Layer.select().where(Layer.floor == floor_id)
+    }
+    shapes = [Shape.get_by_id(uuid) for uuid in uuids]
+    for shape in shapes:
+        shape.layer = layers[shape.layer.name]
+        shape.center_at(x, y)
+        shape.save()
+    return shapes
+
+
 @sio.on("Shape.CircularToken.Value.Set", namespace=GAME_NS)
 @auth.login_required(app, sio, "game")
 async def set_circular_token_value(sid: str, data: TextUpdateData):
@@ -398,6 +513,7 @@ async def set_circular_token_value(sid: str, data: TextUpdateData):
         shape: CircularToken = CircularToken.get_by_id(data["uuid"])
         shape.text = data["text"]
         shape.save()
+        board_cache.bump(pr.active_location)
 
     await sio.emit(
         "Shape.CircularToken.Value.Set",
@@ -417,6 +533,7 @@ async def set_text_value(sid: str, data: TextUpdateData):
         shape: Text = Text.get_by_id(data["uuid"])
         shape.text = data["text"]
         shape.save()
+        board_cache.bump(pr.active_location)
 
     await sio.emit(
         "Shape.Text.Value.Set",
@@ -441,6 +558,7 @@ async def update_rect_size(sid: str, data: RectSizeData):
         shape.width = data["w"]
         shape.height = data["h"]
         shape.save()
+        board_cache.bump(pr.active_location)
 
     await sio.emit(
         "Shape.Rect.Size.Update",
@@ -464,6 +582,7 @@ async def update_circle_size(sid: str, data: CircleSizeData):
             shape = Circle.get_by_id(data["uuid"])
         shape.radius = data["r"]
         shape.save()
+        board_cache.bump(pr.active_location)
 
     await sio.emit(
         "Shape.Circle.Size.Update",
@@ -484,6 +603,7 @@ async def update_text_size(sid: str, data: TextSizeData):
 
         shape.font_size = data["font_size"]
         shape.save()
+        board_cache.bump(pr.active_location)
 
     await sio.emit(
         "Shape.Text.Size.Update",
@@ -503,6 +623,7 @@ async def change_asset_image(sid: str, data: AssetRectImageData):
 
     shape.src = data["src"]
     shape.save()
+    board_cache.bump(pr.active_location)
 
     await sio.emit(
         "Shape.Asset.Image.Set",
@@ -516,39 +637,50 @@ async def change_asset_image(sid: str, data: AssetRectImageData):
 @sio.on("Shapes.Options.Update", namespace=GAME_NS)
 @auth.login_required(app, sio, "game")
 async def update_shape_options(sid: str, data: OptionUpdateList):
-    pr: PlayerRoom = game_state.get(sid)
-
-    shapes: List[Tuple[Shape, OptionUpdate]] = []
+    session = game_state.get_session(sid)
 
-    for sh in data["options"]:
-        shape = Shape.get_or_none(Shape.uuid == sh["uuid"])
-        if shape is not None and not has_ownership(shape, pr, movement=True):
-            logger.warning(
-                f"User {pr.player.name} attempted to change options for a shape it does not own."
-            )
-            return
-        shapes.append((shape, sh))
+    owned, shapes = await db_executor.read(
+        has_ownership_many, [sh["uuid"] for sh in data["options"]], session, True
+    )
+    if not owned:
+        logger.warning(
+            f"User {session.player_name} attempted to change options for a shape it does not own."
+        )
+        return
 
     if not data["temporary"]:
-        with db.atomic():
-            for db_shape, data_shape in shapes:
-                db_shape.options = data_shape["option"]
-                db_shape.save()
+
+        await db_executor.write(
+            _save_options,
+            {
+                data_shape["uuid"]: Shape.parse_options(data_shape["option"])
+                for data_shape in data["options"]
+                if data_shape["uuid"] in shapes
+            },
+        )
+        board_cache.bump(session.location)
 
     await sio.emit(
         "Shapes.Options.Update",
         data["options"],
-        room=pr.active_location.get_path(),
+        room=session.location_path,
         skip_sid=sid,
         namespace=GAME_NS,
     )
 
 
+def _save_options(shape_options: Dict[str, Optional[str]]) -> None:
+    # Only the options are written, the position of a shape can have changed in the meantime
+    for uuid, value in shape_options.items():
+        Shape.update(options=value).where(Shape.uuid == uuid).execute()
+
+
 @sio.on("Shape.Info.Get", namespace=GAME_NS)
 @auth.login_required(app, sio, "game")
 async def get_shape_info(sid: str, shape_id: str):
     pr: PlayerRoom = game_state.get(sid)
 
+    position_buffer.flush()
     shape: Shape = Shape.get_by_id(shape_id)
     location = shape.layer.floor.location.id
 
@@ -6,7 +6,9 @@ from ....logs import logger
 from ....models import PlayerRoom, Shape, ShapeOwner, User
 from ....models.role import Role
 from ....models.shape.access import has_ownership
+from ....state.board import board_cache
 from ....state.game import game_state
+from ....state.positions import position_buffer
 from ..constants import GAME_NS
 from .data_models import ServerShapeDefaultOwner, ServerShapeOwner
 
@@ -16,6 +18,8 @@ from .data_models import ServerShapeDefaultOwner, ServerShapeOwner
 async def add_shape_owner(sid: str, data: ServerShapeOwner):
     pr: PlayerRoom = game_state.get(sid)
 
+    # The full shape is sent to the players that gain access
+    position_buffer.flush()
     try:
         shape = Shape.get(uuid=data["shape"])
     except Shape.DoesNotExist as exc:
@@ -49,6 +53,7 @@ async def add_shape_owner(sid: str, data: ServerShapeOwner):
             movement_access=data["movement_access"],
             vision_access=data["vision_access"],
         )
+    board_cache.bump(pr.active_location)
     await sio.emit(
         "Shape.Owner.Add",
         data,
@@ -108,6 +113,7 @@ async def update_shape_owner(sid: str, data: ServerShapeOwner):
     so.movement_access = data["movement_access"]
     so.vision_access = data["vision_access"]
     so.save()
+    board_cache.bump(pr.active_location)
 
     await sio.emit(
         "Shape.Owner.Update",
@@ -150,6 +156,7 @@ async def delete_shape_owner(sid: str, data: ServerShapeOwner):
         ).execute()
     except Exception:
         logger.warning(f"Could not delete shape-owner relation by {pr.player.name}")
+    board_cache.bump(pr.active_location)
 
     await sio.emit(
         "Shape.Owner.Delete",
@@ -165,6 +172,8 @@ async def delete_shape_owner(sid: str, data: ServerShapeOwner):
 async def update_default_shape_owner(sid: str, data: ServerShapeDefaultOwner):
     pr: PlayerRoom = game_state.get(sid)
 
+    # The full shape is sent to the players that gain access
+    position_buffer.flush()
     try:
         shape: Shape = Shape.get(uuid=data["shape"])
     except Shape.DoesNotExist as exc:
@@ -189,6 +198,7 @@ async def update_default_shape_owner(sid: str, data: ServerShapeDefaultOwner):
         shape.default_movement_access = data["movement_access"]
 
     shape.save()
+    board_cache.bump(pr.active_location)
 
     # We need to send each player their new view of the shape which includes the default access fields,
     # so there is no use in sending those separately
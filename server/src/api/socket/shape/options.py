@@ -1,5 +1,4 @@
-import json
-from typing import Any, List, Optional, cast
+from typing import Optional, cast
 from typing_extensions import TypedDict
 
 from playhouse.shortcuts import update_model_from_dict
@@ -11,6 +10,7 @@ from ....app import app, sio
 from ....models import Aura, PlayerRoom, ShapeLabel, Tracker
 from ....models.shape import Shape
 from ....models.utils import reduce_data_to_model
+from ....state.board import board_cache
 from ....state.game import game_state
 from ..constants import GAME_NS
 from .utils import get_owner_sids, get_shape_or_none
@@ -114,6 +114,7 @@ async def set_invisible(sid: str, data: ShapeSetBooleanValue):
 
     shape.is_invisible = data["value"]
     shape.save()
+    board_cache.bump(pr.active_location)
 
     await sio.emit(
         "Shape.Options.Invisible.Set",
@@ -135,6 +136,7 @@ async def set_defeated(sid: str, data: ShapeSetBooleanValue):
 
     shape.is_defeated = data["value"]
     shape.save()
+    board_cache.bump(pr.active_location)
 
     await sio.emit(
         "Shape.Options.Defeated.Set",
@@ -156,6 +158,7 @@ async def set_locked(sid: str, data: ShapeSetBooleanValue):
 
     shape.is_locked = data["value"]
     shape.save()
+    board_cache.bump(pr.active_location)
 
     await sio.emit(
         "Shape.Options.Locked.Set",
@@ -177,6 +180,7 @@ async def set_token(sid: str, data: ShapeSetBooleanValue):
 
     shape.is_token = data["value"]
     shape.save()
+    board_cache.bump(pr.active_location)
 
     await sio.emit(
         "Shape.Options.Token.Set",
@@ -198,6 +202,7 @@ async def set_movement_block(sid: str, data: ShapeSetBooleanValue):
 
     shape.movement_obstruction = data["value"]
     shape.save()
+    board_cache.bump(pr.active_location)
 
     await sio.emit(
         "Shape.Options.MovementBlock.Set",
@@ -219,6 +224,7 @@ async def set_vision_block(sid: str, data: ShapeSetBooleanValue):
 
     shape.vision_obstruction = data["value"]
     shape.save()
+    board_cache.bump(pr.active_location)
 
     await sio.emit(
         "Shape.Options.VisionBlock.Set",
@@ -240,6 +246,7 @@ async def set_annotation(sid: str, data: ShapeSetStringValue):
 
     shape.annotation = data["value"]
     shape.save()
+    board_cache.bump(pr.active_location)
 
     if shape.annotation_visible:
         await send_annotation(sio, data, pr.active_location.get_path(), sid)
@@ -259,6 +266,7 @@ async def set_annotation_visible(sid: str, data: ShapeSetBooleanValue):
 
     shape.annotation_visible = data["value"]
     shape.save()
+    board_cache.bump(pr.active_location)
 
     owners = [*get_owner_sids(pr, shape, skip_sid=sid)]
 
@@ -294,6 +302,7 @@ async def remove_tracker(sid: str, data: ShapeSetStringValue):
 
     tracker: Tracker = Tracker.get_by_id(data["value"])
     tracker.delete_instance(True)
+    board_cache.bump(pr.active_location)
 
     await sio.emit(
         "Shape.Options.Tracker.Remove",
@@ -315,6 +324,7 @@ async def remove_aura(sid: str, data: ShapeSetStringValue):
 
     aura = Aura.get_by_id(data["value"])
     aura.delete_instance(True)
+    board_cache.bump(pr.active_location)
 
     await sio.emit(
         "Shape.Options.Aura.Remove",
@@ -335,6 +345,7 @@ async def add_label(sid: str, data: ShapeSetStringValue):
         return
 
     ShapeLabel.create(shape=shape, label=data["value"])
+    board_cache.bump(pr.active_location)
 
     await sio.emit(
         "Shape.Options.Label.Add",
@@ -352,6 +363,7 @@ async def remove_label(sid: str, data: ShapeSetStringValue):
 
     label = ShapeLabel.get(shape=data["shape"], label=data["value"])
     label.delete_instance(True)
+    board_cache.bump(pr.active_location)
 
     await sio.emit(
         "Shape.Options.Label.Remove",
@@ -373,6 +385,7 @@ async def set_name(sid: str, data: ShapeSetStringValue):
 
     shape.name = data["value"]
     shape.save()
+    board_cache.bump(pr.active_location)
 
     if shape.name_visible:
         await send_name(sio, data, pr.active_location.get_path(), sid)
@@ -392,6 +405,7 @@ async def set_name_visible(sid: str, data: ShapeSetBooleanValue):
 
     shape.name_visible = data["value"]
     shape.save()
+    board_cache.bump(pr.active_location)
 
     owners = [*get_owner_sids(pr, shape, skip_sid=sid)]
 
@@ -424,6 +438,7 @@ async def set_show_badge(sid: str, data: ShapeSetBooleanValue):
 
     shape.show_badge = data["value"]
     shape.save()
+    board_cache.bump(pr.active_location)
 
     await sio.emit(
         "Shape.Options.ShowBadge.Set",
@@ -445,6 +460,7 @@ async def set_stroke_colour(sid: str, data: ShapeSetStringValue):
 
     shape.stroke_colour = data["value"]
     shape.save()
+    board_cache.bump(pr.active_location)
 
     await sio.emit(
         "Shape.Options.StrokeColour.Set",
@@ -466,6 +482,7 @@ async def set_fill_colour(sid: str, data: ShapeSetStringValue):
 
     shape.fill_colour = data["value"]
     shape.save()
+    board_cache.bump(pr.active_location)
 
     await sio.emit(
         "Shape.Options.FillColour.Set",
@@ -488,6 +505,7 @@ async def create_tracker(sid: str, data: TrackerDelta):
     model = reduce_data_to_model(Tracker, data)
     tracker = Tracker.create(**model)
     tracker.save()
+    board_cache.bump(pr.active_location)
 
     owners = [*get_owner_sids(pr, shape, skip_sid=sid)]
     for psid in owners:
@@ -514,6 +532,7 @@ async def update_tracker(sid: str, data: TrackerDelta):
     changed_visible = tracker.visible != data.get("visible", tracker.visible)
     update_model_from_dict(tracker, data)
     tracker.save()
+    board_cache.bump(pr.active_location)
 
     owners = [*get_owner_sids(pr, shape, skip_sid=sid)]
     for psid in owners:
@@ -558,6 +577,7 @@ async def move_tracker(sid: str, data: TrackerMove):
     tracker = Tracker.get_by_id(data["tracker"])
     tracker.shape = new_shape
     tracker.save()
+    board_cache.bump(pr.active_location)
 
     await sio.emit(
         "Shape.Options.Tracker.Move",
@@ -580,6 +600,7 @@ async def create_aura(sid: str, data: AuraDelta):
     model = reduce_data_to_model(Aura, data)
     aura = Aura.create(**model)
     aura.save()
+    board_cache.bump(pr.active_location)
 
     owners = [*get_owner_sids(pr, shape, skip_sid=sid)]
     for psid in owners:
@@ -606,6 +627,7 @@ async def update_aura(sid: str, data: AuraDelta):
     changed_visible = aura.visible != data.get("visible", aura.visible)
     update_model_from_dict(aura, data)
     aura.save()
+    board_cache.bump(pr.active_location)
 
     owners = [*get_owner_sids(pr, shape, skip_sid=sid)]
     for psid in owners:
@@ -650,6 +672,7 @@ async def move_aura(sid: str, data: AuraMove):
     aura = Aura.get_by_id(data["aura"])
     aura.shape = new_shape
     aura.save()
+    board_cache.bump(pr.active_location)
 
     await sio.emit(
         "Shape.Options.Aura.Move",
@@ -671,6 +694,7 @@ async def set_is_door(sid: str, data: ShapeSetBooleanValue):
 
     shape.is_door = data["value"]
     shape.save()
+    board_cache.bump(pr.active_location)
 
     await sio.emit(
         "Shape.Options.IsDoor.Set",
@@ -682,28 +706,11 @@ async def set_is_door(sid: str, data: ShapeSetBooleanValue):
 
 
 def set_options(shape: Shape, key: str, value):
-    options = json.loads(shape.options)
-    for option in options:
-        if option[0] == key:
-            option[1] = value
-            break
-    else:
-        options.append([key, value])
-    shape.options = json.dumps(options)
-    shape.save()
+    Shape.set_option(shape.uuid, [key], value)
 
 
 def set_options_deep(shape: Shape, key: str, subkey: str, value):
-    options: List[Any] = json.loads(shape.options)
-    for option in options:
-        if option[0] == key:
-            option[1][subkey] = value
-            break
-    else:
-        options.append([key, {subkey: value}])
-
-    shape.options = json.dumps(options)
-    shape.save()
+    Shape.set_option(shape.uuid, [key, subkey], value)
 
 
 @sio.on("Shape.Options.Door.Permissions.Set", namespace=GAME_NS)
@@ -716,6 +723,7 @@ async def set_door_permissions(sid: str, data):
         return
 
     set_options_deep(shape, "door", "permissions", data["value"])
+    board_cache.bump(pr.active_location)
 
     await sio.emit(
         "Shape.Options.Door.Permissions.Set",
@@ -736,6 +744,7 @@ async def set_door_toggle_mode(sid: str, data: ShapeSetStringValue):
         return
 
     set_options_deep(shape, "door", "toggleMode", data["value"])
+    board_cache.bump(pr.active_location)
 
     await sio.emit(
         "Shape.Options.Door.ToggleMode.Set",
@@ -757,6 +766,7 @@ async def set_is_teleport_zone(sid: str, data: ShapeSetBooleanValue):
 
     shape.is_teleport_zone = data["value"]
     shape.save()
+    board_cache.bump(pr.active_location)
 
     await sio.emit(
         "Shape.Options.IsTeleportZone.Set",
@@ -777,6 +787,7 @@ async def set_is_immediate_teleport_zone(sid: str, data: ShapeSetBooleanValue):
         return
 
     set_options_deep(shape, "teleport", "immediate", data["value"])
+    board_cache.bump(pr.active_location)
 
     await sio.emit(
         "Shape.Options.IsImmediateTeleportZone.Set",
@@ -797,6 +808,7 @@ async def set_tp_permissions(sid: str, data):
         return
 
     set_options_deep(shape, "teleport", "permissions", data["value"])
+    board_cache.bump(pr.active_location)
 
     await sio.emit(
         "Shape.Options.TeleportZonePermissions.Set",
@@ -817,6 +829,7 @@ async def set_tp_target(sid: str, data):
         return
 
     set_options_deep(shape, "teleport", "location", data["value"])
+    board_cache.bump(pr.active_location)
 
     await sio.emit(
         "Shape.Options.TeleportZoneTarget.Set",
@@ -837,6 +850,7 @@ async def set_skip_draw(sid: str, data: ShapeSetBooleanValue):
         return
 
     set_options(shape, "skipDraw", data["value"])
+    board_cache.bump(pr.active_location)
 
     await sio.emit(
         "Shape.Options.SkipDraw.Set",
@@ -856,25 +870,13 @@ async def set_svg_asset(sid: str, data: ShapeSetStringValue):
     if shape is None:
         return
 
-    options: List[Any] = json.loads(shape.options)
-
-    for i, option in enumerate(options[::-1]):
-        if data["value"] is None and option[0] in [
-            "svgAsset",
-            "svgPaths",
-            "svgWidth",
-            "svgHeight",
-        ]:
-            options.pop(i)
-            break
-        elif option[0] == "svgAsset":
-            option[1] = data["value"]
-            break
+    if data["value"] is None:
+        Shape.remove_options(
+            shape.uuid, ["svgAsset", "svgPaths", "svgWidth", "svgHeight"]
+        )
     else:
-        options.append(["svgAsset", data["value"]])
-
-    shape.options = json.dumps(options)
-    shape.save()
+        set_options(shape, "svgAsset", data["value"])
+    board_cache.bump(pr.active_location)
 
     await sio.emit(
         "Shape.Options.SvgAsset.Set",
@@ -8,6 +8,7 @@ from ....api.helpers import _send_game
 from ....app import app, sio
 from ....models import PlayerRoom
 from ....models.shape import CompositeShapeAssociation, ToggleComposite
+from ....state.board import board_cache
 from ....state.game import game_state
 from ..constants import GAME_NS
 from .utils import get_shape_or_none
@@ -44,6 +45,7 @@ async def set_toggle_composite_active_variant(sid: str, data: VariantMessage):
 
     composite.active_variant = data["variant"]
     composite.save()
+    board_cache.bump(pr.active_location)
 
     await sio.emit(
         "ToggleComposite.Variants.Active.Set",
@@ -65,6 +67,7 @@ async def add_toggle_composite_variant(sid: str, data: NewVariantMessage):
         return
 
     CompositeShapeAssociation.create(parent=parent, variant=variant, name=data["name"])
+    board_cache.bump(pr.active_location)
 
     await send_new_variant(sio, data, pr.active_location.get_path(), sid)
 
@@ -79,6 +82,7 @@ async def rename_toggle_composite_variant(sid: str, data: NewVariantMessage):
     )
     composite.name = data["name"]
     composite.save()
+    board_cache.bump(pr.active_location)
 
     await sio.emit(
         "ToggleComposite.Variants.Rename",
@@ -98,6 +102,7 @@ async def remove_toggle_composite_variant(sid: str, data: VariantMessage):
         parent=data["shape"], variant=data["variant"]
     )
     composite.delete_instance(True)
+    board_cache.bump(pr.active_location)
 
     await sio.emit(
         "ToggleComposite.Variants.Remove",
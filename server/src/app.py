@@ -8,6 +8,8 @@ from aiohttp_security import SessionIdentityPolicy
 from aiohttp_session.cookie_storage import EncryptedCookieStorage
 
 from . import auth
+from .cluster import cluster
+from .cluster.manager import BrokerManager, ClientManager
 from .config import config
 from .logs import handle_async_exception
 from .typed import TypedAsyncServer
@@ -38,8 +40,13 @@ async def setup_runner(app: web.Application, site: Type[web.BaseSite], **kwargs)
 # MAIN APP
 
 sio = TypedAsyncServer(
-    cors_allowed_origins=config.get("Webserver", "cors_allowed_origins", fallback=None)
+    cors_allowed_origins=config.get("Webserver", "cors_allowed_origins", fallback=None),
+    client_manager=BrokerManager() if cluster.enabled else ClientManager(),
 )
+if cluster.enabled:
+    # The router uses the prefix to send all requests of a client to the same worker
+    _generate_id = sio.eio.generate_id
+    sio.eio.generate_id = lambda: f"w{cluster.worker_id}.{_generate_id()}"
 app = setup_app()
 basepath = os.environ.get("PA_BASEPATH", "/")[1:]
 socketio_path = basepath + "socket.io"
@@ -0,0 +1,171 @@
+import asyncio
+import os
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .config import SAVE_FILE, config
+from .logs import logger
+from .utils import FILE_DIR
+
+BACKUP_DIR = FILE_DIR / "save_backups"
+
+# Number of pages that are copied per backup step, the database is not locked in between steps
+BACKUP_STEP_PAGES = 256
+# Pause between backup steps in seconds
+BACKUP_STEP_SLEEP = 0.01
+# A write by another connection restarts the copy from the first page.
+# After this many restarts the remaining pages are copied in a single step instead,
+# with WAL this only holds a read transaction and does not block the writers.
+MAX_BACKUP_RESTARTS = 3
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+class BackupInProgress(Exception):
+    pass
+
+
+def copy_database(
+    source: Path, target: Path, *, pages: int = BACKUP_STEP_PAGES
+) -> None:
+    """
+    Copies a consistent snapshot of a (live) database with the sqlite backup API.
+
+    The copy is written next to the target and moved in place once it is complete.
+    """
+    partial_target = target.with_name(f"{target.name}.partial")
+    connection = sqlite3.connect(source)
+    try:
+        try:
+            _backup(connection, partial_target, pages)
+        except _TooManyRestarts:
+            logger.info(f"Backup of {source} restarted too often, copying at once")
+            _backup(connection, partial_target, -1)
+    finally:
+        connection.close()
+    os.replace(partial_target, target)
+
+
+def _backup(source: sqlite3.Connection, target: Path, pages: int) -> None:
+    if target.exists():
+        target.unlink()
+
+    restarts = 0
+    last_remaining: Optional[int] = None
+
+    def progress(_status: int, remaining: int, _total: int) -> None:
+        nonlocal restarts, last_remaining
+        if last_remaining is not None and remaining > last_remaining:
+            restarts += 1
+            if restarts > MAX_BACKUP_RESTARTS:
+                raise _TooManyRestarts()
+        last_remaining = remaining
+
+    connection = sqlite3.connect(target)
+    try:
+        source.backup(
+            connection, pages=pages, progress=progress, sleep=BACKUP_STEP_SLEEP
+        )
+    finally:
+        connection.close()
+
+
+class BackupManager:
+    """
+    Periodic snapshots of the save file in the save_backups folder.
+
+    Snapshots are named `<save file>.<timestamp>`, only the most recent `keep` snapshots are kept.
+    The backups that are made before a save upgrade (`<save file>.<version>`) are not touched.
+
+    The copy runs on a separate thread in small steps (see copy_database), so that live play is not stalled.
+    """
+
+    def __init__(self, directory: Path, interval: float, keep: int) -> None:
+        self.directory = directory
+        self.interval = interval
+        self.keep = keep
+        self.running = False
+        self.last_backup: Optional[Path] = None
+        self.last_time: Optional[float] = None
+        self.last_duration: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._task: Optional["asyncio.Task[None]"] = None
+
+    def start(self) -> None:
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._schedule())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _schedule(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.backup()
+            except Exception:
+                logger.exception("Scheduled backup failed")
+
+    async def backup(self) -> Path:
+        if self.running:
+            raise BackupInProgress()
+
+        self.running = True
+        start = time.perf_counter()
+        target = self.directory / f"{SAVE_FILE.name}.{datetime.now():%Y%m%d-%H%M%S}"
+        try:
+            self.directory.mkdir(exist_ok=True)
+            await asyncio.get_running_loop().run_in_executor(
+                None, copy_database, SAVE_FILE, target
+            )
+        except Exception as e:
+            self.last_error = str(e)
+            raise
+        finally:
+            self.running = False
+
+        self.last_backup = target
+        self.last_time = time.time()
+        self.last_duration = time.perf_counter() - start
+        self.last_error = None
+        logger.info(f"Backed up save to {target} in {self.last_duration:.2f}s")
+        self.rotate()
+        return target
+
+    def get_backups(self) -> List[Path]:
+        """The snapshots, oldest first."""
+        if not self.directory.is_dir():
+            return []
+        return sorted(self.directory.glob(f"{SAVE_FILE.name}.????????-??????"))
+
+    def rotate(self) -> None:
+        backups = self.get_backups()
+        for backup in backups[: max(len(backups) - self.keep, 0)]:
+            backup.unlink()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "interval": self.interval,
+            "keep": self.keep,
+            "running": self.running,
+            "lastBackup": None if self.last_backup is None else self.last_backup.name,
+            "lastTime": self.last_time,
+            "lastDurationMs": None
+            if self.last_duration is None
+            else round(self.last_duration * 1000, 3),
+            "lastError": self.last_error,
+        }
+
+
+backup_manager = BackupManager(
+    BACKUP_DIR,
+    config.getint("General", "backup_interval_in_minutes", fallback=60) * 60,
+    config.getint("General", "backup_count", fallback=5),
+)
@@ -0,0 +1,155 @@
+"""
+Support for running the server as multiple worker processes.
+
+In that mode the main process runs a broker (see broker.py) and a router (see router.py)
+and starts the workers. Every worker connects to the broker, which relays:
+
+- the socket.io messages of all workers (see manager.py)
+- cluster messages that keep the in-memory state of the workers in sync (e.g. which sids exist)
+
+When the server runs as a single process, `cluster.enabled` is False and publishing is a no-op.
+"""
+
+import asyncio
+import os
+import pickle
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, TypeVar
+
+from ..logs import logger
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+ClusterHandler = Callable[[Any], Awaitable[None]]
+
+# Channel on which the socket.io messages are relayed
+SOCKETIO_CHANNEL = "socketio"
+# Channel on which a (re)started worker asks the others to publish their state
+SYNC_CHANNEL = "cluster.sync"
+
+WORKER_ID_ENV = "PA_WORKER_ID"
+BROKER_SOCKET_ENV = "PA_BROKER_SOCKET"
+WORKER_SOCKET_ENV = "PA_WORKER_SOCKET"
+
+
+async def read_frame(reader: asyncio.StreamReader) -> bytes:
+    header = await reader.readexactly(4)
+    return await reader.readexactly(int.from_bytes(header, "big"))
+
+
+def write_frame(writer: asyncio.StreamWriter, frame: bytes) -> None:
+    writer.write(len(frame).to_bytes(4, "big") + frame)
+
+
+class ClusterClient:
+    def __init__(self) -> None:
+        worker_id = os.environ.get(WORKER_ID_ENV)
+        self.worker_id: Optional[int] = None if worker_id is None else int(worker_id)
+        self.socketio_messages: Optional["asyncio.Queue[Any]"] = None
+        self._handlers: Dict[str, List[ClusterHandler]] = defaultdict(list)
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._pending: List[bytes] = []
+        self._reader_task: Optional["asyncio.Task[None]"] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.worker_id is not None
+
+    def on(self, channel: str) -> Callable[[ClusterHandler], ClusterHandler]:
+        """Registers a handler for the messages that other workers publish on the channel."""
+
+        def decorator(handler: ClusterHandler) -> ClusterHandler:
+            self._handlers[channel].append(handler)
+            return handler
+
+        return decorator
+
+    async def connect(self) -> None:
+        self.socketio_messages = asyncio.Queue()
+        reader, self._writer = await asyncio.open_unix_connection(
+            os.environ[BROKER_SOCKET_ENV]
+        )
+        for frame in self._pending:
+            write_frame(self._writer, frame)
+        self._pending.clear()
+        self._reader_task = asyncio.create_task(self._read(reader))
+        self.publish(SYNC_CHANNEL, None)
+
+    def publish(self, channel: str, payload: Any) -> None:
+        if not self.enabled:
+            return
+
+        frame = pickle.dumps((channel, self.worker_id, payload))
+        if self._writer is None:
+            self._pending.append(frame)
+        else:
+            write_frame(self._writer, frame)
+
+    async def _read(self, reader: asyncio.StreamReader) -> None:
+        while True:
+            try:
+                frame = await read_frame(reader)
+            except (asyncio.IncompleteReadError, ConnectionError):
+                logger.critical("Lost the connection to the cluster broker")
+                return
+
+            channel, sender, payload = pickle.loads(frame)
+            if channel == SOCKETIO_CHANNEL:
+                # The socket.io manager also handles its own messages
+                assert self.socketio_messages is not None
+                self.socketio_messages.put_nowait(payload)
+                continue
+            if sender == self.worker_id:
+                continue
+            for handler in self._handlers[channel]:
+                try:
+                    await handler(payload)
+                except Exception:
+                    logger.exception(f"Failed to handle cluster message on {channel}")
+
+
+cluster = ClusterClient()
+
+
+class ReplicatedDict(Dict[K, V]):
+    """
+    A dict of which every worker has a full copy.
+
+    Only item assignment and deletion are replicated, values must be picklable.
+    """
+
+    def __init__(self, name: str) -> None:
+        super().__init__()
+        self._channel = f"dict.{name}"
+        # The keys that were set by this worker, these are republished when another worker starts
+        self._local_keys: Set[K] = set()
+        cluster.on(self._channel)(self._on_message)
+        cluster.on(SYNC_CHANNEL)(self._on_sync)
+
+    def __setitem__(self, key: K, value: V) -> None:
+        super().__setitem__(key, value)
+        self._local_keys.add(key)
+        cluster.publish(self._channel, ("set", key, value))
+
+    def __delitem__(self, key: K) -> None:
+        super().__delitem__(key)
+        self._local_keys.discard(key)
+        cluster.publish(self._channel, ("del", key, None))
+
+    def pop(self, key: K, *args: Any) -> Any:
+        if key in self:
+            self._local_keys.discard(key)
+            cluster.publish(self._channel, ("del", key, None))
+        return super().pop(key, *args)
+
+    async def _on_message(self, message: Any) -> None:
+        op, key, value = message
+        if op == "set":
+            super().__setitem__(key, value)
+        else:
+            super().pop(key, None)
+
+    async def _on_sync(self, _: Any) -> None:
+        for key in self._local_keys:
+            cluster.publish(self._channel, ("set", key, self[key]))
@@ -0,0 +1,49 @@
+import asyncio
+from typing import Optional, Set
+
+from ..logs import logger
+from . import read_frame, write_frame
+
+
+class Broker:
+    """
+    Minimal pub/sub daemon on a unix socket.
+
+    Every frame that is received from a worker is relayed to all workers, including the sender.
+    The frames are opaque to the broker (see ClusterClient for their content).
+    """
+
+    def __init__(self) -> None:
+        self._writers: Set[asyncio.StreamWriter] = set()
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, path: str) -> None:
+        self._server = await asyncio.start_unix_server(self._handle, path=path)
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for writer in self._writers:
+            writer.close()
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        self._writers.add(writer)
+        try:
+            while True:
+                frame = await read_frame(reader)
+                for subscriber in list(self._writers):
+                    write_frame(subscriber, frame)
+                await asyncio.gather(
+                    *(subscriber.drain() for subscriber in list(self._writers)),
+                    return_exceptions=True,
+                )
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception:
+            logger.exception("Cluster broker failed to relay a message")
+        finally:
+            self._writers.discard(writer)
+            writer.close()
@@ -0,0 +1,97 @@
+import asyncio
+from typing import Any, AsyncGenerator
+
+from socketio.asyncio_manager import AsyncManager
+from socketio.asyncio_pubsub_manager import AsyncPubSubManager
+
+from . import SOCKETIO_CHANNEL, cluster
+
+
+class ClientManager(AsyncManager):
+    """
+    socket.io client manager of a single worker.
+
+    python-socketio 5.5 passes coroutines to asyncio.wait when emitting to a room,
+    which Python 3.11 no longer accepts, so the emits are gathered instead.
+    """
+
+    async def emit(
+        self, event, data, namespace, room=None, skip_sid=None, callback=None, **kwargs
+    ):
+        if namespace not in self.rooms or room not in self.rooms[namespace]:
+            return
+        if not isinstance(skip_sid, list):
+            skip_sid = [skip_sid]
+        emits = []
+        for sid, eio_sid in self.get_participants(namespace, room):
+            if sid in skip_sid:
+                continue
+            id = None if callback is None else self._generate_ack_id(sid, callback)
+            emits.append(
+                self.server._emit_internal(eio_sid, event, data, namespace, id)
+            )
+        await asyncio.gather(*emits)
+
+
+class BrokerManager(AsyncPubSubManager, ClientManager):
+    """
+    socket.io client manager that shares events between the workers through the cluster broker.
+
+    Next to the messages of AsyncPubSubManager,
+    this also relays entering/leaving rooms for clients that are connected to another worker.
+    """
+
+    name = "planarally"
+
+    async def _publish(self, data: Any) -> None:
+        cluster.publish(SOCKETIO_CHANNEL, data)
+
+    async def _listen(self) -> AsyncGenerator[Any, None]:
+        assert cluster.socketio_messages is not None
+        while True:
+            message = await cluster.socketio_messages.get()
+            method = message.get("method")
+            if method == "enter_room":
+                if self._is_local(message["sid"], message["namespace"]):
+                    super().enter_room(
+                        message["sid"], message["namespace"], message["room"]
+                    )
+            elif method == "leave_room":
+                if self._is_local(message["sid"], message["namespace"]):
+                    super().leave_room(
+                        message["sid"], message["namespace"], message["room"]
+                    )
+            else:
+                yield message
+
+    def enter_room(self, sid, namespace, room, eio_sid=None):
+        if eio_sid is None and not self._is_local(sid, namespace):
+            cluster.publish(
+                SOCKETIO_CHANNEL,
+                {
+                    "method": "enter_room",
+                    "sid": sid,
+                    "namespace": namespace,
+                    "room": room,
+                },
+            )
+            return
+        super().enter_room(sid, namespace, room, eio_sid=eio_sid)
+
+    def leave_room(self, sid, namespace, room):
+        if not self._is_local(sid, namespace):
+            cluster.publish(
+                SOCKETIO_CHANNEL,
+                {
+                    "method": "leave_room",
+                    "sid": sid,
+                    "namespace": namespace,
+                    "room": room,
+                },
+            )
+            return
+        super().leave_room(sid, namespace, room)
+
+    def _is_local(self, sid, namespace) -> bool:
+        # Unlike is_connected, this is also true while the client is being disconnected
+        return sid in self.rooms.get(namespace, {}).get(None, {})
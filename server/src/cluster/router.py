@@ -0,0 +1,299 @@
+import asyncio
+import hashlib
+import os
+import sys
+import tempfile
+import zlib
+from bisect import bisect
+from itertools import count
+from typing import List, Optional, Tuple
+
+import aiohttp
+from aiohttp import web
+
+from ..logs import logger
+from . import BROKER_SOCKET_ENV, WORKER_ID_ENV, WORKER_SOCKET_ENV
+from .broker import Broker
+
+# Headers that only apply to a single connection and should not be proxied
+HOP_BY_HOP_HEADERS = {
+    "connection",
+    "keep-alive",
+    "proxy-authenticate",
+    "proxy-authorization",
+    "te",
+    "trailers",
+    "transfer-encoding",
+    "upgrade",
+    "host",
+}
+
+
+# The number of points every worker gets on the hash ring
+RING_REPLICAS = 160
+
+
+class HashRing:
+    """
+    Consistent hashing of keys onto workers.
+
+    Changing the number of workers only moves the keys of the added/removed workers.
+    """
+
+    def __init__(self, workers: int) -> None:
+        self._ring: List[Tuple[int, int]] = sorted(
+            (self._hash(f"{worker}:{replica}"), worker)
+            for worker in range(workers)
+            for replica in range(RING_REPLICAS)
+        )
+        self._hashes = [h for h, _ in self._ring]
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+    def get(self, key: str) -> int:
+        index = bisect(self._hashes, self._hash(key)) % len(self._ring)
+        return self._ring[index][1]
+
+
+class Router:
+    """
+    Reverse proxy in front of the workers.
+
+    Every room is pinned to a worker, so that a heavy room (e.g. loading a huge map or an export)
+    only slows down the rooms that share its worker.
+    Game connections are routed by the user/room of their socket.io handshake,
+    the HTTP routes of a room by the room in their path.
+
+    All requests of a socket.io client have to reach the worker that holds its connection.
+    The socket.io (engine.io) sids that a worker generates are prefixed with its id (see app.py),
+    which is used to route requests that carry a sid. Resumable asset uploads use the same prefix in their id.
+    Campaign imports are kept in memory by the worker that received the first request,
+    these are routed by import name. All other requests are distributed round robin.
+    """
+
+    def __init__(self, sockets: List[str]) -> None:
+        self.sockets = sockets
+        self.ring = HashRing(len(sockets))
+        self._round_robin = count()
+        self._sessions: List[aiohttp.ClientSession] = []
+        self.app = web.Application()
+        self.app.router.add_route("*", "/{path:.*}", self.handle)
+        self.app.on_cleanup.append(self._close_sessions)
+
+    def pick_worker(self, request: web.Request) -> int:
+        worker = self.get_id_worker(request.query.get("sid", ""))
+        if worker is None and "/api/assets/upload/" in request.path:
+            upload = request.path.split("/api/assets/upload/", 1)[1]
+            worker = self.get_id_worker(upload)
+        if worker is not None:
+            return worker
+
+        room = get_room_key(request)
+        if room is not None:
+            return self.ring.get(room)
+
+        if "/api/rooms/import/" in request.path:
+            name = request.path.split("/api/rooms/import/", 1)[1].split("/", 1)[0]
+            return zlib.crc32(name.encode()) % len(self.sockets)
+
+        return next(self._round_robin) % len(self.sockets)
+
+    def get_id_worker(self, id_: str) -> Optional[int]:
+        """The worker that generated an id (socket.io sessions, uploads), if it is prefixed with it."""
+        if id_.startswith("w") and "." in id_:
+            try:
+                worker = int(id_[1 : id_.index(".")])
+            except ValueError:
+                return None
+            if 0 <= worker < len(self.sockets):
+                return worker
+        return None
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        worker = self.pick_worker(request)
+        try:
+            if request.headers.get("Upgrade", "").lower() == "websocket":
+                return await self._proxy_websocket(request, worker)
+            return await self._proxy_http(request, worker)
+        except aiohttp.ClientConnectionError:
+            logger.error(f"Worker {worker} is not reachable")
+            raise web.HTTPBadGateway()
+
+    def _session(self, worker: int) -> aiohttp.ClientSession:
+        while len(self._sessions) <= worker:
+            self._sessions.append(
+                aiohttp.ClientSession(
+                    connector=aiohttp.UnixConnector(
+                        path=self.sockets[len(self._sessions)]
+                    ),
+                    auto_decompress=False,
+                    cookie_jar=aiohttp.DummyCookieJar(),
+                    timeout=aiohttp.ClientTimeout(total=None),
+                )
+            )
+        return self._sessions[worker]
+
+    def _forwarded_headers(self, request: web.Request):
+        headers = {
+            k: v
+            for k, v in request.headers.items()
+            if k.lower() not in HOP_BY_HOP_HEADERS
+        }
+        headers["Host"] = request.host
+        if request.remote is not None:
+            headers["X-Forwarded-For"] = request.remote
+        return headers
+
+    async def _proxy_http(
+        self, request: web.Request, worker: int
+    ) -> web.StreamResponse:
+        async with self._session(worker).request(
+            request.method,
+            f"http://worker{request.rel_url}",
+            headers=self._forwarded_headers(request),
+            data=request.content if request.body_exists else None,
+            allow_redirects=False,
+        ) as upstream:
+            response = web.StreamResponse(
+                status=upstream.status, reason=upstream.reason
+            )
+            for key, value in upstream.headers.items():
+                if key.lower() not in HOP_BY_HOP_HEADERS:
+                    response.headers.add(key, value)
+            try:
+                await response.prepare(request)
+                async for data in upstream.content.iter_any():
+                    await response.write(data)
+                await response.write_eof()
+            except ConnectionResetError:
+                # The client went away
+                pass
+            return response
+
+    async def _proxy_websocket(
+        self, request: web.Request, worker: int
+    ) -> web.StreamResponse:
+        client = web.WebSocketResponse()
+        await client.prepare(request)
+
+        async with self._session(worker).ws_connect(
+            f"http://worker{request.rel_url}",
+            headers={
+                k: v
+                for k, v in self._forwarded_headers(request).items()
+                if not k.lower().startswith("sec-websocket-")
+            },
+            autoping=False,
+        ) as upstream:
+
+            async def relay(source, target) -> None:
+                async for message in source:
+                    if message.type == aiohttp.WSMsgType.TEXT:
+                        await target.send_str(message.data)
+                    elif message.type == aiohttp.WSMsgType.BINARY:
+                        await target.send_bytes(message.data)
+                    elif message.type == aiohttp.WSMsgType.PING:
+                        await target.ping(message.data)
+                    elif message.type == aiohttp.WSMsgType.PONG:
+                        await target.pong(message.data)
+                    else:
+                        break
+                await target.close()
+
+            await asyncio.gather(
+                relay(client, upstream), relay(upstream, client), return_exceptions=True
+            )
+
+        return client
+
+    async def _close_sessions(self, _) -> None:
+        for session in self._sessions:
+            await session.close()
+
+
+def get_room_key(request: web.Request) -> Optional[str]:
+    """The room a request belongs to, as `creator/name`."""
+    # The game socket.io connection passes the room in its query (see api/socket/connection.py)
+    if "user" in request.query and "room" in request.query:
+        return f"{request.query['user']}/{request.query['room']}"
+
+    if "/api/rooms/" in request.path:
+        parts = request.path.split("/api/rooms/", 1)[1].split("/")
+        if len(parts) >= 2 and parts[0] != "import" and parts[1] != "export":
+            return f"{parts[0]}/{parts[1]}"
+
+    return None
+
+
+class WorkerPool:
+    """Starts the worker processes and restarts them when they exit unexpectedly."""
+
+    def __init__(self, workers: int, broker_socket: str, directory: str) -> None:
+        self.broker_socket = broker_socket
+        self.sockets = [
+            os.path.join(directory, f"worker-{i}.sock") for i in range(workers)
+        ]
+        self._processes: List[Optional[asyncio.subprocess.Process]] = [None] * workers
+        self._tasks: List["asyncio.Task[None]"] = []
+        self._stopping = False
+
+    async def start(self) -> None:
+        for worker in range(len(self.sockets)):
+            self._tasks.append(asyncio.create_task(self._supervise(worker)))
+        while not all(os.path.exists(socket) for socket in self.sockets):
+            await asyncio.sleep(0.1)
+
+    async def stop(self) -> None:
+        self._stopping = True
+        for process in self._processes:
+            if process is not None and process.returncode is None:
+                process.terminate()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _supervise(self, worker: int) -> None:
+        env = {
+            **os.environ,
+            WORKER_ID_ENV: str(worker),
+            BROKER_SOCKET_ENV: self.broker_socket,
+            WORKER_SOCKET_ENV: self.sockets[worker],
+        }
+        while not self._stopping:
+            if os.path.exists(self.sockets[worker]):
+                os.remove(self.sockets[worker])
+            # A frozen (pyinstaller) build is its own interpreter
+            args = sys.argv[1:] if getattr(sys, "frozen", False) else sys.argv
+            process = await asyncio.create_subprocess_exec(
+                sys.executable, *args, env=env
+            )
+            self._processes[worker] = process
+            returncode = await process.wait()
+            if not self._stopping:
+                logger.error(f"Worker {worker} exited with {returncode}, restarting")
+                await asyncio.sleep(1)
+
+
+async def start_cluster(workers: int) -> web.Application:
+    """
+    Starts the broker and the workers and returns the router app that should be served.
+
+    Everything is stopped when the returned app shuts down.
+    """
+    directory = tempfile.mkdtemp(prefix="planarally-")
+    broker_socket = os.path.join(directory, "broker.sock")
+
+    broker = Broker()
+    await broker.start(broker_socket)
+
+    pool = WorkerPool(workers, broker_socket, directory)
+    await pool.start()
+
+    router = Router(pool.sockets)
+
+    async def stop(_) -> None:
+        await pool.stop()
+        await broker.close()
+
+    router.app.on_shutdown.append(stop)
+    return router.app
@@ -0,0 +1,101 @@
+import threading
+from typing import Any, Callable, Dict, TypeVar
+
+from peewee import Model
+
+from .config import config
+from .logs import logger
+from .models.db import db
+from .serialization import SerializationPool
+
+T = TypeVar("T")
+
+
+class DatabaseExecutor:
+    """
+    Runs database work off the event loop.
+
+    Writes go to a single writer thread. Every write runs in its own (immediate) transaction
+    and writes are executed in the order in which they were submitted,
+    so read-modify-write work (e.g. on the initiative of a location) can not interleave.
+    Writes that are still made on the event loop wait for the lock that a running write holds,
+    so handlers should pass their writes (and the reads they depend on) here.
+
+    Reads go to a pool of reader threads with query_only connections, with WAL these do not block the writer.
+    A read that is submitted after a write has been awaited sees the result of that write.
+
+    The work that is passed must only touch the database and the given arguments.
+    In-memory state (game_state, board_cache, change_log, ...) is updated by the caller after awaiting.
+
+    Model instances belong to the thread that loaded them.
+    The arguments are ids and plain data (or a Session, whose models are only used for their ids),
+    the work loads what it changes itself and writes with update queries or fresh instances,
+    so that it never saves a row that was read earlier on another thread.
+    Instances that the work returns belong to the event loop from then on.
+    Passing a model instance (or a bound method of one) raises a TypeError.
+
+    Both are a SerializationPool, a size of 0 runs everything directly on the event loop.
+    """
+
+    def __init__(self, readers: int) -> None:
+        self.readers = readers
+        self._reader = SerializationPool(readers, "db-reader")
+        self._writer = SerializationPool(min(readers, 1), "db-writer", _init_writer)
+
+    async def read(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        _check_ownership(fn, args, kwargs)
+        return await self._reader.run(fn, *args, **kwargs)
+
+    async def write(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        _check_ownership(fn, args, kwargs)
+        return await self._writer.run(_atomic, fn, *args, **kwargs)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "readers": self.readers,
+            "read": self._reader.metrics.as_dict(),
+            "write": self._writer.metrics.as_dict(),
+        }
+
+    def shutdown(self) -> None:
+        self._reader.shutdown()
+        self._writer.shutdown()
+
+
+def _atomic(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    # The write lock is taken when the transaction starts instead of on its first write.
+    # A deferred transaction that reads before it writes fails
+    # when a write on the event loop was committed in between, an immediate one waits for it instead.
+    with db.atomic(lock_type="IMMEDIATE"):
+        return fn(*args, **kwargs)
+
+
+def _check_ownership(fn: Callable, args: Any, kwargs: Dict[str, Any]) -> None:
+    if isinstance(getattr(fn, "__self__", None), Model):
+        raise TypeError(f"{fn.__qualname__} is bound to a model instance")
+    for arg in (*args, *kwargs.values()):
+        if _contains_model(arg, 2):
+            raise TypeError(f"{fn.__qualname__} was passed a model instance")
+
+
+def _contains_model(value: Any, depth: int) -> bool:
+    if isinstance(value, Model):
+        return True
+    if depth == 0:
+        return False
+    # Only plain containers, a Session (a NamedTuple) only uses its models for their ids
+    if type(value) in (list, tuple, set, frozenset):
+        return any(_contains_model(v, depth - 1) for v in value)
+    if type(value) is dict:
+        return any(_contains_model(v, depth - 1) for v in value.values())
+    return False
+
+
+def _init_writer() -> None:
+    db.connect(reuse_if_open=True)
+    logger.debug(f"Started database writer {threading.current_thread().name}")
+
+
+db_executor = DatabaseExecutor(
+    config.getint("General", "db_reader_threads", fallback=2)
+)
@@ -1,7 +1,6 @@
 import asyncio
 import os
 import secrets
-import shutil
 import tarfile
 import uuid
 from functools import partial
@@ -14,6 +13,7 @@ from playhouse.sqlite_ext import SqliteExtDatabase
 
 from ..api.socket.constants import DASHBOARD_NS
 from ..app import sio
+from ..backup import copy_database
 from ..config import SAVE_FILE
 from ..logs import logger
 from ..models import ALL_MODELS
@@ -31,7 +31,7 @@ from ..models.campaign import (
 from ..models.db import db as ACTIVE_DB, open_db
 from ..models.general import Constants
 from ..models.groups import Group
-from ..models.initiative import Initiative
+from ..models.initiative import Initiative, InitiativeEffect, InitiativeEntry
 from ..models.label import LabelSelection
 from ..models.marker import Marker
 from ..models.shape import (
@@ -54,7 +54,9 @@ from ..models.shape import (
 from ..models.typed import SelectSequence
 from ..models.user import User, UserOptions
 from ..save import SAVE_VERSION, upgrade_save
+from ..state.asset import asset_tree_cache
 from ..state.dashboard import dashboard_state
+from ..state.positions import position_buffer
 from ..utils import ASSETS_DIR, TEMP_DIR
 
 
@@ -65,6 +67,7 @@ async def export_campaign(
     sid: Optional[str] = None,
     export_all_assets=False,
 ):
+    position_buffer.flush()
     loop = asyncio.get_running_loop()
     task = loop.run_in_executor(
         None,
@@ -89,6 +92,7 @@ async def import_campaign(
     )
     await asyncio.wait([task])
     result = task.result()
+    asset_tree_cache.invalidate(user.id)
     for _sid in dashboard_state.get_sids(id=user.id):
         await sio.emit(
             "Campaign.Import.Done",
@@ -198,7 +202,7 @@ class CampaignExporter:
         self.db = open_db(self.sqlite_path)
         self.db.foreign_keys = False
 
-        shutil.copyfile(SAVE_FILE, self.copy_name)
+        copy_database(SAVE_FILE, self.copy_name)
 
         # Base model creation
         with self.db.bind_ctx(ALL_MODELS):
@@ -770,13 +774,34 @@ class CampaignMigrator:
                     ToggleComposite.create(**togglecomposite_data)
 
     def migrate_initiative(self, location_id: int, initiative: Initiative):
-        with self.from_db.bind_ctx([Initiative]):
+        with self.from_db.bind_ctx([Initiative, InitiativeEntry, InitiativeEffect]):
             initiative_data = model_to_dict(initiative, recurse=False)
             del initiative_data["id"]
             initiative_data["location"] = location_id
 
             with self.to_db.bind_ctx([Initiative]):
-                Initiative.create(**initiative_data)
+                new_initiative = Initiative.create(**initiative_data)
+
+            for entry in initiative.entries:
+                entry_data = model_to_dict(entry, recurse=False)
+                del entry_data["id"]
+                entry_data["initiative"] = new_initiative.id
+                shape = self.shape_mapping.get(entry_data["shape"])
+                # The shape can have moved to another location
+                if shape is None:
+                    continue
+                entry_data["shape"] = shape
+
+                with self.to_db.bind_ctx([InitiativeEntry]):
+                    new_entry = InitiativeEntry.create(**entry_data)
+
+                for effect in entry.effects:
+                    effect_data = model_to_dict(effect, recurse=False)
+                    del effect_data["id"]
+                    effect_data["entry"] = new_entry.id
+
+                    with self.to_db.bind_ctx([InitiativeEffect]):
+                        InitiativeEffect.create(**effect_data)
 
     def migrate_location_user_options(
         self, new_location_id: int, user_options: List[LocationUserOption]
@@ -1,5 +1,6 @@
 import json
-from typing import Any, Dict, List, Optional, Union, cast
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple, Union, cast
 from typing_extensions import Self, TypedDict
 
 from peewee import ForeignKeyField, TextField
@@ -24,6 +25,15 @@ class FileStructureElement(TypedDict):
 AssetStructure = Union[FileStructure, Dict[str, "AssetStructure"]]
 
 
+class AssetStructurePatch(TypedDict, total=False):
+    # Folder names from the root folder
+    path: List[str]
+    # New files of the folder at path
+    files: List[FileStructureElement]
+    # New contents of the folder at path, None if the folder was removed
+    folder: Optional[AssetStructure]
+
+
 class Asset(BaseModel):
     id: int
 
@@ -36,6 +46,9 @@ class Asset(BaseModel):
     file_hash = cast(Optional[str], TextField(null=True))
     options = cast(Optional[str], TextField(null=True))
 
+    class Meta:
+        indexes = ((("owner", "parent"), False), (("file_hash",), False))
+
     def __repr__(self):
         return f"<Asset {self.owner.name} - {self.name}>"
 
@@ -70,18 +83,52 @@ class Asset(BaseModel):
         return root
 
     @classmethod
-    def get_user_structure(cls, user, parent=None):
+    def get_user_structure(cls, user, parent=None) -> AssetStructure:
         if parent is None:
             parent = cls.get_root_folder(user)
-        # ideally we change this to a single query to get all assets and process them as such
-        data: AssetStructure = {"__files": []}
-        for asset in Asset.select().where(
-            (Asset.owner == user) & (Asset.parent == parent)
+
+        # All assets of the user are fetched at once and grouped by folder
+        children: Dict[int, List[Tuple[int, str, Optional[str]]]] = defaultdict(list)
+        for asset_id, parent_id, name, file_hash in (
+            Asset.select(Asset.id, Asset.parent, Asset.name, Asset.file_hash)
+            .where((Asset.owner == user) & Asset.parent.is_null(False))
+            .order_by(Asset.id)
+            .tuples()
         ):
-            if asset.file_hash:
-                data["__files"].append(
-                    {"id": asset.id, "name": asset.name, "hash": asset.file_hash}
-                )
-            else:
-                data[asset.name] = cls.get_user_structure(user, asset)
-        return data
+            children[parent_id].append((asset_id, name, file_hash))
+
+        def build(folder_id: int) -> AssetStructure:
+            data: AssetStructure = {"__files": []}
+            for asset_id, name, file_hash in children[folder_id]:
+                if file_hash:
+                    data["__files"].append(
+                        {"id": asset_id, "name": name, "hash": file_hash}
+                    )
+                else:
+                    data[name] = build(asset_id)
+            return data
+
+        return build(parent.id)
+
+
+def get_structure_patch(
+    old: AssetStructure, new: AssetStructure, path: Optional[List[str]] = None
+) -> List[AssetStructurePatch]:
+    """The changes that turn the `old` structure into the `new` structure."""
+    if path is None:
+        path = []
+
+    patch: List[AssetStructurePatch] = []
+    if old["__files"] != new["__files"]:
+        patch.append({"path": path, "files": new["__files"]})
+    for name, folder in old.items():
+        if name != "__files" and name not in new:
+            patch.append({"path": [*path, name], "folder": None})
+    for name, folder in new.items():
+        if name == "__files":
+            continue
+        if name not in old:
+            patch.append({"path": [*path, name], "folder": folder})
+        else:
+            patch.extend(get_structure_patch(old[name], folder, [*path, name]))
+    return patch
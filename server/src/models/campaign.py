@@ -1,6 +1,7 @@
 import uuid
+from collections import defaultdict
 from datetime import date
-from typing import List, Optional, Set, TYPE_CHECKING, cast
+from typing import Dict, List, Optional, Set, TYPE_CHECKING, Tuple, cast
 
 from peewee import (
     DateField,
@@ -14,6 +15,7 @@ from peewee import (
 from playhouse.shortcuts import model_to_dict
 
 if TYPE_CHECKING:
+    from ..api.socket.shape.data_models import ShapeKeys
     from .initiative import Initiative
     from .marker import Marker
     from .shape import Shape
@@ -266,9 +268,13 @@ class Note(BaseModel):
             self, recurse=False, exclude=[Note.room, Note.location, Note.user]
         )
 
+    class Meta:
+        indexes = ((("user", "room"), False),)
+
 
 class Floor(BaseModel):
     id: int
+    location_id: int
     layers: SelectSequence["Layer"]
 
     location = ForeignKeyField(Location, backref="floors", on_delete="CASCADE")
@@ -282,18 +288,22 @@ class Floor(BaseModel):
         return f"<Floor {self.name} {[self.index]}>"
 
     def as_dict(self, user: User, dm: bool):
+        from .shape import Shape
+        from .shape.bulk import shapes_as_dict
+
         data = model_to_dict(self, recurse=False, exclude=[Floor.id, Floor.location])
-        if dm:
-            data["layers"] = [
-                layer.as_dict(user, True) for layer in self.layers.order_by(Layer.index)
-            ]
-        else:
-            data["layers"] = [
-                layer.as_dict(user, False)
-                for layer in self.layers.order_by(Layer.index).where(
-                    Layer.player_visible
-                )
-            ]
+        layer_query = self.layers.order_by(Layer.index)
+        if not dm:
+            layer_query = layer_query.where(Layer.player_visible)
+        layers = list(layer_query)
+
+        # All shapes of the floor are serialized in one go to prevent a query storm
+        shapes = list(Shape.select().where(Shape.layer << layers).order_by(Shape.index))
+        layer_shapes: Dict[int, List[Tuple["Shape", "ShapeKeys"]]] = defaultdict(list)
+        for shape, shape_data in zip(shapes, shapes_as_dict(shapes, user, dm)):
+            layer_shapes[shape.layer_id].append((shape, shape_data))
+
+        data["layers"] = [layer._as_dict(layer_shapes[layer.id]) for layer in layers]
         return data
 
 
@@ -318,20 +328,32 @@ class Layer(BaseModel):
 
     def as_dict(self, user: User, dm: bool):
         from .shape import Shape
+        from .shape.bulk import shapes_as_dict
+
+        shapes = list(self.shapes.order_by(Shape.index))
+        return self._as_dict(list(zip(shapes, shapes_as_dict(shapes, user, dm))))
 
+    def _as_dict(self, shapes: List[Tuple["Shape", "ShapeKeys"]]):
         data = model_to_dict(
             self,
             recurse=False,
             backrefs=False,
             exclude=[Layer.id, Layer.player_visible],
         )
+        group_ids = {shape.group_id for shape, _ in shapes if shape.group_id}
+        groups = {}
+        if group_ids:
+            groups = {
+                group.uuid: group
+                for group in Group.select().where(Group.uuid << group_ids)
+            }
         groups_added: Set[Group] = set()
         data["groups"] = []
         data["shapes"] = []
-        for shape in self.shapes.order_by(Shape.index):
-            data["shapes"].append(shape.as_dict(user, dm))
-            if shape.group and shape.group.uuid not in groups_added:
-                data["groups"].append(model_to_dict(shape.group))
+        for shape, shape_data in shapes:
+            data["shapes"].append(shape_data)
+            if shape.group_id and shape.group_id not in groups_added:
+                data["groups"].append(model_to_dict(groups[shape.group_id]))
         return data
 
     class Meta:
@@ -5,10 +5,11 @@ from playhouse.sqlite_ext import SqliteExtDatabase
 from ..config import SAVE_FILE
 
 
+PRAGMAS = {"foreign_keys": 1, "journal_mode": "wal", "synchronous": 0}
+
+
 def open_db(path: Path) -> SqliteExtDatabase:
-    return SqliteExtDatabase(
-        path, pragmas={"foreign_keys": 1, "journal_mode": "wal", "synchronous": 0}
-    )
+    return SqliteExtDatabase(path, pragmas=PRAGMAS)
 
 
 db = open_db(SAVE_FILE)
@@ -1,30 +1,189 @@
-import json
-from typing import cast
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence, cast
 
 from peewee import BooleanField, ForeignKeyField, IntegerField, TextField
 from playhouse.shortcuts import model_to_dict
 
 from . import Location
 from .base import BaseModel
+from .shape import Shape
+from .typed import SelectSequence
 
 
-__all__ = ["Initiative"]
+__all__ = ["Initiative", "InitiativeEffect", "InitiativeEntry"]
+
+# InitiativeEntry.index is a sparse ordering key, like Shape.index (see shape/order.py):
+# consecutive entries are GAP apart, so that an entry can be moved by only updating that entry.
+INITIATIVE_INDEX_GAP = 1024
 
 
 class Initiative(BaseModel):
     id: int
+    entries: SelectSequence["InitiativeEntry"]
 
     location = ForeignKeyField(Location, backref="initiative", on_delete="CASCADE")
     round = IntegerField()
+    # position of the active entry in the (ordered) entries
     turn = cast(int, IntegerField())
     sort = cast(int, IntegerField(default=0))
-    data = cast(str, TextField())
     is_active = cast(bool, BooleanField(default=False))
 
+    def get_entries(self) -> List["InitiativeEntry"]:
+        return list(
+            InitiativeEntry.select()
+            .where(InitiativeEntry.initiative == self)
+            .order_by(InitiativeEntry.index)
+        )
+
+    def get_next_index(self) -> int:
+        entry = (
+            InitiativeEntry.select(InitiativeEntry.index)
+            .where(InitiativeEntry.initiative == self)
+            .order_by(InitiativeEntry.index.desc())
+            .first()
+        )
+        return 0 if entry is None else entry.index + INITIATIVE_INDEX_GAP
+
     def as_dict(self):
         initiative = model_to_dict(
             self, recurse=False, exclude=[Initiative.id, Initiative.is_active]
         )
-        initiative["data"] = json.loads(initiative["data"])
+        effects: Dict[int, List[InitiativeEffect]] = defaultdict(list)
+        for effect in (
+            InitiativeEffect.select()
+            .join(InitiativeEntry)
+            .where(InitiativeEntry.initiative == self)
+            .order_by(InitiativeEffect.index)
+        ):
+            effects[effect.entry_id].append(effect)
+        initiative["data"] = [
+            entry.as_dict(effects[entry.id]) for entry in self.get_entries()
+        ]
         initiative["isActive"] = self.is_active
         return initiative
+
+
+class InitiativeEntry(BaseModel):
+    id: int
+    initiative_id: int
+    shape_id: str
+    effects: SelectSequence["InitiativeEffect"]
+
+    initiative = ForeignKeyField(Initiative, backref="entries", on_delete="CASCADE")
+    shape = ForeignKeyField(Shape, backref="initiative_entries", on_delete="CASCADE")
+    # ordering key within the initiative, only the relative order matters
+    index = cast(int, IntegerField())
+    value = cast(Optional[int], IntegerField(null=True))
+    is_visible = cast(bool, BooleanField(default=False))
+    is_group = cast(bool, BooleanField(default=False))
+
+    class Meta:
+        indexes = (
+            (("initiative", "index"), False),
+            (("initiative", "shape"), True),
+        )
+
+    def get_effects(self) -> List["InitiativeEffect"]:
+        return list(self.effects.order_by(InitiativeEffect.index))
+
+    def as_dict(self, effects: Optional[List["InitiativeEffect"]] = None):
+        if effects is None:
+            effects = self.get_effects()
+        return {
+            "shape": self.shape_id,
+            "initiative": self.value,
+            "isVisible": self.is_visible,
+            "isGroup": self.is_group,
+            "effects": [effect.as_dict() for effect in effects],
+        }
+
+
+def store_entry_order(order: Sequence[InitiativeEntry]) -> None:
+    """
+    Stores `order` as the order of the entries (which are all entries of an initiative).
+
+    The entries that are already in this relative order keep their ordering key,
+    the others get a key between their new neighbours.
+    Moving a single entry thus only updates that entry.
+    If there is no room left between the neighbours, all entries are spread GAP apart again.
+    """
+    keep = _longest_increasing_keys(order)
+    indices: List[int] = []
+    start = 0
+    for end in [*keep, len(order)]:
+        # Entries start..end-1 moved, they are put between the entries that stay
+        lower = order[start - 1].index if start > 0 else None
+        upper = order[end].index if end < len(order) else None
+        count = end - start
+        if lower is None and upper is None:
+            indices.extend(i * INITIATIVE_INDEX_GAP for i in range(count))
+        elif lower is None:
+            indices.extend(
+                cast(int, upper) - (count - i) * INITIATIVE_INDEX_GAP
+                for i in range(count)
+            )
+        elif upper is None:
+            indices.extend(lower + (i + 1) * INITIATIVE_INDEX_GAP for i in range(count))
+        else:
+            step = (upper - lower) // (count + 1)
+            if step == 0:
+                indices = [i * INITIATIVE_INDEX_GAP for i in range(len(order))]
+                break
+            indices.extend(lower + (i + 1) * step for i in range(count))
+        if end < len(order):
+            indices.append(order[end].index)
+        start = end + 1
+
+    for entry, index in zip(order, indices):
+        if entry.index != index:
+            entry.index = index
+            InitiativeEntry.update(index=index).where(
+                InitiativeEntry.id == entry.id
+            ).execute()
+
+
+def _longest_increasing_keys(order: Sequence[InitiativeEntry]) -> List[int]:
+    """Positions of a longest subsequence of `order` with increasing ordering keys."""
+    # tails[k] is the position of the smallest key that ends an increasing subsequence of length k + 1
+    tails: List[int] = []
+    tail_keys: List[int] = []
+    previous: List[Optional[int]] = []
+    for position, entry in enumerate(order):
+        k = bisect_left(tail_keys, entry.index)
+        previous.append(tails[k - 1] if k > 0 else None)
+        if k == len(tails):
+            tails.append(position)
+            tail_keys.append(entry.index)
+        else:
+            tails[k] = position
+            tail_keys[k] = entry.index
+
+    positions: List[int] = []
+    current = tails[-1] if tails else None
+    while current is not None:
+        positions.append(current)
+        current = previous[current]
+    return positions[::-1]
+
+
+class InitiativeEffect(BaseModel):
+    id: int
+    entry_id: int
+
+    entry = ForeignKeyField(InitiativeEntry, backref="effects", on_delete="CASCADE")
+    # position in the effects of the entry, clients refer to effects by this position
+    index = cast(int, IntegerField())
+    name = cast(str, TextField())
+    turns = cast(str, TextField())
+    highlights_actor = cast(bool, BooleanField(default=False))
+
+    class Meta:
+        indexes = ((("entry", "index"), False),)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "turns": self.turns,
+            "highlightsActor": self.highlights_actor,
+        }
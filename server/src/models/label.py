@@ -35,6 +35,9 @@ class Label(BaseModel):
             visible=self.visible,
         )
 
+    class Meta:
+        indexes = ((("visible",), False),)
+
 
 class LabelSelection(BaseModel):
     label = ForeignKeyField(Label, on_delete="CASCADE")
@@ -23,3 +23,6 @@ class Marker(BaseModel):
 
     def as_string(self):
         return f"{self.shape_id}"
+
+    class Meta:
+        indexes = ((("user", "location"), False),)
@@ -3,7 +3,14 @@ import json
 from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple, cast
 from uuid import uuid4
 
-from peewee import BooleanField, FloatField, ForeignKeyField, IntegerField, TextField
+from peewee import (
+    BooleanField,
+    FloatField,
+    ForeignKeyField,
+    IntegerField,
+    TextField,
+    fn,
+)
 from playhouse.shortcuts import model_to_dict, update_model_from_dict
 
 if TYPE_CHECKING:
@@ -50,6 +57,8 @@ class Shape(BaseModel):
     togglecomposite_set: SelectSequence["ToggleComposite"]
     composite_parent: SelectSequence["CompositeShapeAssociation"]
     shape_variants: SelectSequence["CompositeShapeAssociation"]
+    layer_id: int
+    group_id: Optional[str]
 
     uuid = cast(str, TextField(primary_key=True))
     layer = cast(Layer, ForeignKeyField(Layer, backref="shapes", on_delete="CASCADE"))
@@ -66,6 +75,7 @@ class Shape(BaseModel):
     annotation = cast(str, TextField(default=""))
     draw_operator = TextField(default="source-over")
     index = cast(int, IntegerField())
+    # json object, changes to single options are done in place (see set_option)
     options = cast(Optional[str], TextField(null=True))
     badge = cast(int, IntegerField(default=1))
     show_badge = cast(bool, BooleanField(default=False))
@@ -89,6 +99,9 @@ class Shape(BaseModel):
     is_door = cast(bool, BooleanField(default=False))
     is_teleport_zone = cast(bool, BooleanField(default=False))
 
+    class Meta:
+        indexes = ((("layer", "index"), False),)
+
     def __repr__(self):
         return f"<Shape {self.get_path()}>"
 
@@ -99,10 +112,48 @@ class Shape(BaseModel):
             return self.name
 
     def get_options(self) -> Dict[str, Any]:
-        return dict(json.loads(self.options))
+        if self.options is None:
+            return {}
+        return json.loads(self.options)
 
     def set_options(self, options: Dict[str, Any]) -> None:
-        self.options = json.dumps([[k, v] for k, v in options.items()])
+        self.options = json.dumps(options)
+
+    @staticmethod
+    def parse_options(options: Optional[str]) -> Optional[str]:
+        """
+        Converts options received from a client to the stored format.
+
+        Older clients and asset templates send the options as a list of [key, value] pairs.
+        """
+        if options is None:
+            return None
+        data = json.loads(options)
+        if isinstance(data, list):
+            return json.dumps(dict(data))
+        return options
+
+    @classmethod
+    def set_option(cls, uuid: str, keys: List[str], value: Any) -> None:
+        """
+        Sets a (nested) option of a shape in a single UPDATE, without loading the shape.
+
+        Missing parent options are created as empty objects.
+        Keys containing a quote or a backslash raise a ValueError.
+        """
+        cls.update(
+            options=_json_set_option(
+                fn.coalesce(cls.options, "{}"), keys, fn.json(json.dumps(value))
+            )
+        ).where(cls.uuid == uuid).execute()
+
+    @classmethod
+    def remove_options(cls, uuid: str, keys: List[str]) -> None:
+        cls.update(
+            options=fn.json_remove(
+                fn.coalesce(cls.options, "{}"), *(_option_path([key]) for key in keys)
+            )
+        ).where(cls.uuid == uuid).execute()
 
     # todo: Change this API to accept a PlayerRoom instead
     def as_dict(self, user: User, dm: bool) -> "ShapeKeys":
@@ -206,6 +257,24 @@ class Shape(BaseModel):
         return new_shape
 
 
+def _option_path(keys: List[str]) -> str:
+    # Quoted labels in a SQLite json path have no escapes,
+    # a quote ends the label and a backslash is kept as is
+    for key in keys:
+        if '"' in key or "\\" in key:
+            raise ValueError(f"Invalid shape option key {key!r}")
+    return "$" + "".join(f'."{key}"' for key in keys)
+
+
+def _json_set_option(options, keys: List[str], value):
+    path = _option_path(keys[:1])
+    if len(keys) == 1:
+        return fn.json_set(options, path, value)
+    # json_set does not create missing parents
+    parent = fn.coalesce(fn.json_extract(options, path), "{}")
+    return fn.json_set(options, path, _json_set_option(parent, keys[1:], value))
+
+
 class ShapeLabel(BaseModel):
     shape = ForeignKeyField(Shape, backref="labels", on_delete="CASCADE")
     label = ForeignKeyField(Label, backref="shapes", on_delete="CASCADE")
@@ -276,6 +345,9 @@ class ShapeOwner(BaseModel):
     def __repr__(self):
         return f"<ShapeOwner {self.user.name} {self.shape.get_path()}>"
 
+    class Meta:
+        indexes = ((("shape", "user"), False),)
+
     def as_dict(self) -> "ServerShapeOwner":
         return cast(
             "ServerShapeOwner",
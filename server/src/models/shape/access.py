@@ -1,3 +1,8 @@
+from typing import TYPE_CHECKING, Dict, Iterable, Tuple
+
+if TYPE_CHECKING:
+    from ...state.game import Session
+
 from ..campaign import PlayerRoom
 from ..role import Role
 from . import Shape, ShapeOwner
@@ -20,3 +25,44 @@ def has_ownership(shape: Shape, pr: PlayerRoom, movement=False) -> bool:
         return True
 
     return ShapeOwner.get_or_none(shape=shape, user=pr.player) is not None
+
+
+def has_ownership_many(
+    uuids: Iterable[str], session: "Session", movement=False
+) -> Tuple[bool, Dict[str, Shape]]:
+    """
+    Bulk version of has_ownership.
+
+    Returns whether the player has access to all of the given shapes
+    together with the shapes that exist (by uuid). Unknown uuids are ignored.
+
+    The layer flags are taken from the session,
+    so this uses at most two queries regardless of the number of shapes.
+    """
+    shapes: Dict[str, Shape] = {
+        shape.uuid: shape for shape in Shape.select().where(Shape.uuid << list(uuids))
+    }
+
+    if session.role == Role.DM:
+        return True, shapes
+
+    unchecked = []
+    for shape in shapes.values():
+        if shape.layer_id not in session.editable_layers:
+            return False, shapes
+        if shape.default_edit_access:
+            continue
+        if movement and shape.default_movement_access:
+            continue
+        unchecked.append(shape.uuid)
+
+    if len(unchecked) == 0:
+        return True, shapes
+
+    owned = {
+        owner.shape_id
+        for owner in ShapeOwner.select(ShapeOwner.shape).where(
+            (ShapeOwner.shape << unchecked) & (ShapeOwner.user == session.player)
+        )
+    }
+    return len(owned) == len(unchecked), shapes
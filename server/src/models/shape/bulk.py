@@ -0,0 +1,249 @@
+from collections import defaultdict
+from typing import TYPE_CHECKING, Any, Dict, List, Sequence, Tuple, Type
+
+from peewee import chunked, fn
+from playhouse.shortcuts import model_to_dict
+
+if TYPE_CHECKING:
+    from ...api.socket.shape.data_models import ShapeKeys
+
+from ...logs import logger
+from ..base import BaseModel
+from ..campaign import Floor, Layer
+from ..db import db
+from ..label import Label
+from ..user import User
+from ..utils import get_table, reduce_data_to_model
+from . import (
+    Aura,
+    CompositeShapeAssociation,
+    Shape,
+    ShapeLabel,
+    ShapeOwner,
+    ShapeType,
+    ToggleComposite,
+    Tracker,
+)
+from .order import SHAPE_INDEX_GAP, get_next_index
+
+
+def shapes_as_dict(shapes: Sequence[Shape], user: User, dm: bool) -> List["ShapeKeys"]:
+    """
+    Bulk version of Shape.as_dict.
+
+    Instead of lazily resolving the relations of every shape on its own,
+    each related table is queried once for the entire set of shapes.
+    The output is identical to calling `shape.as_dict(user, dm)` for every shape.
+    """
+    if len(shapes) == 0:
+        return []
+
+    uuids = [shape.uuid for shape in shapes]
+
+    layers: Dict[int, Tuple[str, str]] = {
+        layer.id: (layer.name, layer.floor.name)
+        for layer in Layer.select(Layer, Floor)
+        .join(Floor)
+        .where(Layer.id << {shape.layer_id for shape in shapes})
+    }
+
+    owners: Dict[str, List[ShapeOwner]] = defaultdict(list)
+    for owner in (
+        ShapeOwner.select(ShapeOwner, User).join(User).where(ShapeOwner.shape << uuids)
+    ):
+        owners[owner.shape_id].append(owner)
+
+    trackers: Dict[str, List[Tracker]] = defaultdict(list)
+    for tracker in Tracker.select().where(Tracker.shape << uuids):
+        trackers[tracker.shape_id].append(tracker)
+
+    auras: Dict[str, List[Aura]] = defaultdict(list)
+    for aura in Aura.select().where(Aura.shape << uuids):
+        auras[aura.shape_id].append(aura)
+
+    labels: Dict[str, List[Label]] = defaultdict(list)
+    for shape_label in (
+        ShapeLabel.select(ShapeLabel, Label, User)
+        .join(Label)
+        .join(User)
+        .where(ShapeLabel.shape << uuids)
+    ):
+        labels[shape_label.shape_id].append(shape_label.label)
+
+    subtypes = _get_subtypes(shapes)
+
+    data: List["ShapeKeys"] = []
+    for shape in shapes:
+        shape_data: "ShapeKeys" = {
+            k: v
+            for k, v in model_to_dict(
+                shape, recurse=False, exclude=[Shape.layer, Shape.index]
+            ).items()
+            if v is not None
+        }  # type: ignore
+        shape_data["owners"] = [
+            {
+                "shape": owner.shape_id,
+                "user": owner.user.name,
+                "edit_access": owner.edit_access,
+                "movement_access": owner.movement_access,
+                "vision_access": owner.vision_access,
+            }
+            for owner in owners[shape.uuid]
+        ]
+        shape_data["layer"], shape_data["floor"] = layers[shape.layer_id]
+        owned = (
+            dm
+            or shape.default_edit_access
+            or shape.default_vision_access
+            or any(user.name == o["user"] for o in shape_data["owners"])
+        )
+        shape_trackers = trackers[shape.uuid]
+        shape_auras = auras[shape.uuid]
+        shape_labels = labels[shape.uuid]
+        if not owned:
+            if not shape.annotation_visible:
+                shape_data["annotation"] = ""
+            shape_trackers = [t for t in shape_trackers if t.visible]
+            shape_auras = [a for a in shape_auras if a.visible]
+            shape_labels = [label for label in shape_labels if label.visible]
+            if not shape.name_visible:
+                shape_data["name"] = "?"
+        shape_data["trackers"] = [t.as_dict() for t in shape_trackers]
+        shape_data["auras"] = [a.as_dict() for a in shape_auras]
+        shape_data["labels"] = [label.as_dict() for label in shape_labels]
+        shape_data.update(**subtypes[shape.uuid])
+        data.append(shape_data)
+    return data
+
+
+def _get_subtypes(shapes: Sequence[Shape]) -> Dict[str, Dict]:
+    uuids_by_type: Dict[str, List[str]] = defaultdict(list)
+    for shape in shapes:
+        uuids_by_type[shape.type_].append(shape.uuid)
+
+    subtypes: Dict[str, Dict] = {}
+    for type_, uuids in uuids_by_type.items():
+        table = get_table(type_)
+        if table is ToggleComposite:
+            subtypes.update(_get_toggle_composites(uuids))
+            continue
+        for subtype in table.select().where(table.shape << uuids):
+            subtypes[subtype.shape_id] = subtype.as_dict(exclude=[table.shape])
+    return subtypes
+
+
+def _get_toggle_composites(uuids: List[str]) -> Dict[str, Dict]:
+    variants: Dict[str, List[Dict[str, str]]] = defaultdict(list)
+    for sv in CompositeShapeAssociation.select().where(
+        CompositeShapeAssociation.parent << uuids
+    ):
+        variants[sv.parent_id].append({"uuid": sv.variant_id, "name": sv.name})
+
+    composites: Dict[str, Dict] = {}
+    for composite in ToggleComposite.select().where(ToggleComposite.shape << uuids):
+        # ToggleComposite.as_dict resolves its variants lazily, so build the dict here
+        composite_data = model_to_dict(composite, exclude=[ToggleComposite.shape])
+        composite_data["variants"] = variants[composite.shape_id]
+        composites[composite.shape_id] = composite_data
+    return composites
+
+
+def create_shapes(shapes: Sequence[Tuple[int, "ShapeKeys"]]) -> List[Shape]:
+    """
+    Bulk version of creating a shape with its subtype, owners, trackers and auras.
+
+    Every table is written with batched inserts in a single transaction.
+    The shapes (given with the id of their layer) are put on top of their layer in the given order.
+    Returns the created shapes in that same order.
+    """
+    if len(shapes) == 0:
+        return []
+
+    indices: Dict[int, int] = {}
+    shape_rows: List[Dict[str, Any]] = []
+    subtype_rows: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    owner_rows: List[Dict[str, Any]] = []
+    tracker_rows: List[Dict[str, Any]] = []
+    aura_rows: List[Dict[str, Any]] = []
+
+    users = {
+        user.name.lower(): user
+        for user in User.select().where(
+            fn.Lower(User.name)
+            << {owner["user"].lower() for _, data in shapes for owner in data["owners"]}
+        )
+    }
+
+    for layer_id, data in shapes:
+        uuid = data["uuid"]
+        if layer_id not in indices:
+            indices[layer_id] = get_next_index(layer_id)
+        shape_rows.append(
+            {
+                **reduce_data_to_model(Shape, data),
+                "options": Shape.parse_options(data.get("options")),
+                "layer": layer_id,
+                "index": indices[layer_id],
+            }
+        )
+        indices[layer_id] += SHAPE_INDEX_GAP
+
+        type_table = get_table(data["type_"])
+        subtype_rows[data["type_"]].append(
+            {
+                **type_table.pre_create(**reduce_data_to_model(type_table, data)),
+                "shape": uuid,
+            }
+        )
+
+        for owner in data["owners"]:
+            user = users.get(owner["user"].lower())
+            if user is None:
+                logger.warning(f"Unknown owner {owner['user']} for new shape {uuid}")
+                continue
+            owner_rows.append(
+                {
+                    "shape": uuid,
+                    "user": user.id,
+                    "edit_access": owner["edit_access"],
+                    "movement_access": owner["movement_access"],
+                    "vision_access": owner["vision_access"],
+                }
+            )
+        for tracker in data["trackers"]:
+            tracker_rows.append(
+                {**reduce_data_to_model(Tracker, tracker), "shape": uuid}
+            )
+        for aura in data["auras"]:
+            aura_rows.append({**reduce_data_to_model(Aura, aura), "shape": uuid})
+
+    uuids = [data["uuid"] for _, data in shapes]
+    with db.atomic():
+        _insert_many(Shape, shape_rows)
+        for type_, rows in subtype_rows.items():
+            type_table = get_table(type_)
+            _insert_many(type_table, rows)
+            if type_table.post_create is not ShapeType.post_create:
+                shape_data = {data["uuid"]: data for _, data in shapes}
+                for subshape in type_table.select().where(
+                    type_table.shape << [row["shape"] for row in rows]
+                ):
+                    type_table.post_create(subshape, **shape_data[subshape.shape_id])
+        _insert_many(ShapeOwner, owner_rows)
+        _insert_many(Tracker, tracker_rows)
+        _insert_many(Aura, aura_rows)
+
+    created = {shape.uuid: shape for shape in Shape.select().where(Shape.uuid << uuids)}
+    return [created[uuid] for uuid in uuids]
+
+
+def _insert_many(model: Type[BaseModel], rows: List[Dict[str, Any]]) -> None:
+    # insert_many takes its columns from the first row,
+    # so rows that provide a different set of fields are inserted separately
+    rows_by_fields: Dict[Tuple[str, ...], List[Dict[str, Any]]] = defaultdict(list)
+    for row in rows:
+        rows_by_fields[tuple(sorted(row))].append(row)
+    for same_rows in rows_by_fields.values():
+        for batch in chunked(same_rows, 100):
+            model.insert_many(batch).execute()
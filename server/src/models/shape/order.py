@@ -0,0 +1,81 @@
+from typing import Optional, Union, cast
+
+from peewee import fn
+
+from ..campaign import Layer
+from ..db import db
+from . import Shape
+
+# Shape.index is a sparse ordering key: consecutive shapes in a layer are GAP apart,
+# so that a shape can be put in between two others without renumbering the layer.
+# Clients only ever see the rank of a shape within its layer.
+SHAPE_INDEX_GAP = 1024
+
+
+def get_next_index(layer: Union[Layer, int]) -> int:
+    """Returns an index that puts a shape on top of all other shapes in the layer."""
+    top = Shape.select(fn.MAX(Shape.index)).where(Shape.layer == layer).scalar()
+    return 0 if top is None else top + SHAPE_INDEX_GAP
+
+
+def get_index_for_rank(
+    layer: Union[Layer, int], rank: int, shape: Optional[Shape] = None
+) -> int:
+    """
+    Returns an index that puts a shape at the given rank in the layer.
+
+    The shape itself (if it is already part of the layer) is not taken into account,
+    so that moving a shape only requires updating that single shape.
+    If there is no room left between the neighbouring shapes, the layer is rebalanced first.
+    """
+    index = _find_index_for_rank(layer, rank, shape)
+    if index is None:
+        rebalance_layer(layer)
+        # The neighbours are SHAPE_INDEX_GAP apart now
+        index = cast(int, _find_index_for_rank(layer, rank, shape))
+    return index
+
+
+def _find_index_for_rank(
+    layer: Union[Layer, int], rank: int, shape: Optional[Shape]
+) -> Optional[int]:
+    """Returns an index between the neighbours at the rank, or None if they are adjacent."""
+    others = Shape.select(Shape.index).where(Shape.layer == layer)
+    if shape is not None:
+        others = others.where(Shape.uuid != shape.uuid)
+    neighbours = [
+        s.index
+        for s in others.order_by(Shape.index)
+        .offset(max(rank - 1, 0))
+        .limit(1 if rank <= 0 else 2)
+    ]
+
+    if rank <= 0:
+        lower, upper = None, neighbours[0] if neighbours else None
+    elif len(neighbours) == 0:
+        # The rank is past the end of the layer
+        top = others.select(fn.MAX(Shape.index)).scalar()
+        return 0 if top is None else top + SHAPE_INDEX_GAP
+    else:
+        lower = neighbours[0]
+        upper = neighbours[1] if len(neighbours) > 1 else None
+
+    if lower is None and upper is None:
+        return 0
+    if lower is None:
+        return upper - SHAPE_INDEX_GAP
+    if upper is None:
+        return lower + SHAPE_INDEX_GAP
+    if upper - lower >= 2:
+        return (lower + upper) // 2
+    return None
+
+
+def rebalance_layer(layer: Union[Layer, int]) -> None:
+    """Spreads the indices of all shapes in the layer SHAPE_INDEX_GAP apart again."""
+    shapes = Shape.select(Shape.uuid).where(Shape.layer == layer).order_by(Shape.index)
+    with db.atomic():
+        for i, shape in enumerate(list(shapes)):
+            Shape.update(index=i * SHAPE_INDEX_GAP).where(
+                Shape.uuid == shape.uuid
+            ).execute()
@@ -121,3 +121,7 @@ class User(BaseModel):
     @classmethod
     def by_name(cls, name: str) -> "User":
         return cls.get_or_none(fn.Lower(cls.name) == name.lower())
+
+
+# by_name compares case insensitively
+User.add_index(User.index(fn.Lower(User.name), name="user_name_lower"))
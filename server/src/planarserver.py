@@ -25,14 +25,20 @@ from .api import http  # noqa: F401, E402
 from . import routes  # noqa: F401, E402
 from .state.asset import asset_state  # noqa: E402
 from .state.game import game_state  # noqa: E402
+from .state.positions import position_buffer  # noqa: E402
 
 # Force loading of socketio routes
 from .api.socket import load_socket_commands  # noqa: E402
 from .api.socket.constants import GAME_NS  # noqa: E402
 from .app import admin_app, app as main_app, runners, setup_runner, sio  # noqa: E402
+from .backup import backup_manager  # noqa: E402
+from .cluster import WORKER_SOCKET_ENV, cluster  # noqa: E402
+from .cluster.router import start_cluster  # noqa: E402
 from .config import config  # noqa: E402
+from .db_executor import db_executor  # noqa: E402
 from .logs import logger  # noqa: E402
 from .models import User, Room  # noqa: E402
+from .serialization import serialization_pool  # noqa: E402
 
 load_socket_commands()
 
@@ -50,6 +56,10 @@ if sys.platform.startswith("win"):
 async def on_shutdown(_):
     for sid in [*game_state._sid_map.keys(), *asset_state._sid_map.keys()]:
         await sio.disconnect(sid, namespace=GAME_NS)
+    backup_manager.stop()
+    position_buffer.flush()
+    serialization_pool.shutdown()
+    db_executor.shutdown()
 
 
 async def start_http(app: web.Application, host, port):
@@ -84,9 +94,8 @@ async def start_socket(app: web.Application, sock):
     await setup_runner(app, web.UnixSite, path=sock)
 
 
-async def start_server(server_section: str):
+async def start_server(server_section: str, app: web.Application = main_app):
     socket = config.get(server_section, "socket", fallback=None)
-    app = main_app
     method = "unknown"
     if server_section == "APIserver":
         app = admin_app
@@ -119,11 +128,38 @@ async def start_server(server_section: str):
     print(f"======== Starting {server_section} on {method} ========")
 
 
+async def start_worker():
+    await cluster.connect()
+    # The manager relays the events of the other workers, this should not wait for a first client
+    if not sio.manager_initialized:
+        sio.manager_initialized = True
+        sio.manager.initialize()
+    await start_socket(main_app, os.environ[WORKER_SOCKET_ENV])
+
+    # Only a single worker has to serve the admin API and make the backups
+    if cluster.worker_id == 0:
+        backup_manager.start()
+        if config.getboolean("APIserver", "enabled"):
+            await start_server("APIserver")
+
+
 async def start_servers():
+    if cluster.enabled:
+        await start_worker()
+        return
+
     print()
-    await start_server("Webserver")
+    workers = config.getint("Webserver", "workers", fallback=1)
+    if workers > 1:
+        await start_server("Webserver", await start_cluster(workers))
+        print(f"Running {workers} workers")
+    else:
+        await start_server("Webserver")
+        backup_manager.start()
     print()
-    if config.getboolean("APIserver", "enabled"):
+    if workers > 1:
+        print("API Server is started by the first worker")
+    elif config.getboolean("APIserver", "enabled"):
         await start_server("APIserver")
     else:
         print("API Server disabled")
@@ -6,8 +6,11 @@ import aiohttp
 from aiohttp import web
 
 from .api import http
+from .api.http.admin import backups
 from .api.http.admin import campaigns
+from .api.http.admin import stats
 from .api.http.admin import users as admin_users
+from .api.http import assets
 from .api.http import auth
 from .api.http import notifications
 from .api.http import rooms
@@ -16,7 +19,7 @@ from .api.http import users
 from .api.http import version
 from .app import admin_app, api_app, app as main_app
 from .config import config
-from .utils import ASSETS_DIR, FILE_DIR, STATIC_DIR
+from .utils import FILE_DIR, STATIC_DIR
 
 
 subpath = os.environ.get("PA_BASEPATH", "/")
@@ -56,7 +59,7 @@ async def root_dev(request, admin_api=False):
 
 # MAIN ROUTES
 
-main_app.router.add_static(f"{subpath}/static/assets", ASSETS_DIR)
+main_app.router.add_get(f"{subpath}/static/assets/{{file_hash}}", assets.get_file)
 main_app.router.add_static(f"{subpath}/static", STATIC_DIR)
 main_app.router.add_get(f"{subpath}/api/auth", auth.is_authed)
 main_app.router.add_post(f"{subpath}/api/users/email", users.set_email)
@@ -83,6 +86,10 @@ main_app.router.add_post(f"{subpath}/api/rooms/import/{{name}}", rooms.import_in
 main_app.router.add_post(
     f"{subpath}/api/rooms/import/{{name}}/{{chunk}}", rooms.import_chunk
 )
+main_app.router.add_post(f"{subpath}/api/assets/upload", assets.create)
+main_app.router.add_head(f"{subpath}/api/assets/upload/{{id}}", assets.get_offset)
+main_app.router.add_patch(f"{subpath}/api/assets/upload/{{id}}", assets.append)
+main_app.router.add_delete(f"{subpath}/api/assets/upload/{{id}}", assets.cancel)
 main_app.router.add_post(f"{subpath}/api/invite", http.claim_invite)
 main_app.router.add_get(f"{subpath}/api/version", version.get_version)
 main_app.router.add_get(f"{subpath}/api/changelog", version.get_changelog)
@@ -97,6 +104,9 @@ api_app.router.add_get(f"{subpath}/users", admin_users.collect)
 api_app.router.add_post(f"{subpath}/users/reset", admin_users.reset)
 api_app.router.add_post(f"{subpath}/users/remove", admin_users.remove)
 api_app.router.add_get(f"{subpath}/campaigns", campaigns.collect)
+api_app.router.add_get(f"{subpath}/stats", stats.collect)
+api_app.router.add_get(f"{subpath}/backups", backups.collect)
+api_app.router.add_post(f"{subpath}/backups", backups.create)
 
 admin_app.router.add_static(f"{subpath}/static", STATIC_DIR)
 admin_app.add_subapp("/api/", api_app)
@@ -14,22 +14,22 @@ When writing migrations make sure that these things are respected:
     - e.g. a column added to Circle also needs to be added to CircularToken
 """
 
-SAVE_VERSION = 85
+SAVE_VERSION = 89
 
 import json
 import logging
 import secrets
-import shutil
 import sys
 from pathlib import Path
-from typing import Any, List, Optional
+from typing import Any, Dict, List, Optional
 
 from playhouse.sqlite_ext import SqliteExtDatabase
 
+from .backup import BACKUP_DIR, copy_database
 from .config import SAVE_FILE
 from .models import ALL_MODELS, Constants
 from .models.db import db as ACTIVE_DB
-from .utils import FILE_DIR, OldVersionException, UnknownVersionException
+from .utils import OldVersionException, UnknownVersionException
 
 logger: logging.Logger = logging.getLogger("PlanarAllyServer")
 logger.setLevel(logging.INFO)
@@ -386,6 +386,140 @@ def upgrade(db: SqliteExtDatabase, version: int):
             db.execute_sql(
                 "UPDATE location_options SET limit_movement_during_initiative = NULL WHERE id NOT IN (SELECT default_options_id FROM room)"
             )
+    elif version == 85:
+        # Change Shape.index to a sparse ordering key (rank * 1024 within its layer)
+        with db.atomic():
+            data = db.execute_sql(
+                'SELECT uuid, layer_id FROM shape ORDER BY layer_id, "index", uuid'
+            )
+            ranks: Dict[int, int] = {}
+            updates = []
+            for uuid, layer_id in data.fetchall():
+                rank = ranks.get(layer_id, 0)
+                ranks[layer_id] = rank + 1
+                updates.append((rank * 1024, uuid))
+            db.cursor().executemany(
+                'UPDATE shape SET "index" = ? WHERE uuid = ?', updates
+            )
+    elif version == 86:
+        # Add indexes for frequent lookups
+        with db.atomic():
+            for statement in (
+                'CREATE INDEX IF NOT EXISTS "shape_layer_id_index" ON "shape" ("layer_id", "index")',
+                'CREATE INDEX IF NOT EXISTS "shape_owner_shape_id_user_id" ON "shape_owner" ("shape_id", "user_id")',
+                'CREATE INDEX IF NOT EXISTS "tracker_shape_id" ON "tracker" ("shape_id")',
+                'CREATE INDEX IF NOT EXISTS "aura_shape_id" ON "aura" ("shape_id")',
+                'CREATE INDEX IF NOT EXISTS "shape_label_shape_id" ON "shape_label" ("shape_id")',
+                'CREATE INDEX IF NOT EXISTS "marker_user_id_location_id" ON "marker" ("user_id", "location_id")',
+                'CREATE INDEX IF NOT EXISTS "note_user_id_room_id" ON "note" ("user_id", "room_id")',
+                'CREATE INDEX IF NOT EXISTS "asset_owner_id_parent_id" ON "asset" ("owner_id", "parent_id")',
+                'CREATE INDEX IF NOT EXISTS "asset_file_hash" ON "asset" ("file_hash")',
+                'CREATE INDEX IF NOT EXISTS "initiative_location_id" ON "initiative" ("location_id")',
+                'CREATE INDEX IF NOT EXISTS "label_visible" ON "label" ("visible")',
+                'CREATE INDEX IF NOT EXISTS "user_name_lower" ON "user" (lower("name"))',
+            ):
+                db.execute_sql(statement)
+    elif version == 87:
+        # Store Shape.options as a json object instead of a list of [key, value] pairs
+        with db.atomic():
+            data = db.execute_sql(
+                "SELECT uuid, options FROM shape WHERE options IS NOT NULL"
+            )
+            updates = []
+            for uuid, options in data.fetchall():
+                pairs = json.loads(options)
+                if isinstance(pairs, list):
+                    updates.append((json.dumps(dict(pairs)), uuid))
+            db.cursor().executemany("UPDATE shape SET options=? WHERE uuid=?", updates)
+    elif version == 88:
+        # Move Initiative.data to the InitiativeEntry and InitiativeEffect tables
+        with db.atomic():
+            db.execute_sql(
+                "CREATE TEMPORARY TABLE _initiative_88 AS SELECT * FROM initiative"
+            )
+            db.execute_sql("DROP TABLE initiative")
+            db.execute_sql(
+                'CREATE TABLE IF NOT EXISTS "initiative" ("id" INTEGER NOT NULL PRIMARY KEY, "location_id" INTEGER NOT NULL, "round" INTEGER NOT NULL, "turn" INTEGER NOT NULL, "sort" INTEGER NOT NULL, "is_active" INTEGER NOT NULL, FOREIGN KEY ("location_id") REFERENCES "location" ("id") ON DELETE CASCADE)'
+            )
+            db.execute_sql(
+                'CREATE INDEX IF NOT EXISTS "initiative_location_id" ON "initiative" ("location_id")'
+            )
+            db.execute_sql(
+                'INSERT INTO "initiative" ("id", "location_id", "round", "turn", "sort", "is_active") SELECT "id", "location_id", "round", "turn", "sort", "is_active" FROM _initiative_88'
+            )
+            db.execute_sql(
+                'CREATE TABLE IF NOT EXISTS "initiative_entry" ("id" INTEGER NOT NULL PRIMARY KEY, "initiative_id" INTEGER NOT NULL, "shape_id" TEXT NOT NULL, "index" INTEGER NOT NULL, "value" INTEGER, "is_visible" INTEGER NOT NULL, "is_group" INTEGER NOT NULL, FOREIGN KEY ("initiative_id") REFERENCES "initiative" ("id") ON DELETE CASCADE, FOREIGN KEY ("shape_id") REFERENCES "shape" ("uuid") ON DELETE CASCADE)'
+            )
+            db.execute_sql(
+                'CREATE INDEX IF NOT EXISTS "initiative_entry_initiative_id" ON "initiative_entry" ("initiative_id")'
+            )
+            db.execute_sql(
+                'CREATE INDEX IF NOT EXISTS "initiative_entry_shape_id" ON "initiative_entry" ("shape_id")'
+            )
+            db.execute_sql(
+                'CREATE INDEX IF NOT EXISTS "initiative_entry_initiative_id_index" ON "initiative_entry" ("initiative_id", "index")'
+            )
+            db.execute_sql(
+                'CREATE UNIQUE INDEX IF NOT EXISTS "initiative_entry_initiative_id_shape_id" ON "initiative_entry" ("initiative_id", "shape_id")'
+            )
+            db.execute_sql(
+                'CREATE TABLE IF NOT EXISTS "initiative_effect" ("id" INTEGER NOT NULL PRIMARY KEY, "entry_id" INTEGER NOT NULL, "index" INTEGER NOT NULL, "name" TEXT NOT NULL, "turns" TEXT NOT NULL, "highlights_actor" INTEGER NOT NULL, FOREIGN KEY ("entry_id") REFERENCES "initiative_entry" ("id") ON DELETE CASCADE)'
+            )
+            db.execute_sql(
+                'CREATE INDEX IF NOT EXISTS "initiative_effect_entry_id" ON "initiative_effect" ("entry_id")'
+            )
+            db.execute_sql(
+                'CREATE INDEX IF NOT EXISTS "initiative_effect_entry_id_index" ON "initiative_effect" ("entry_id", "index")'
+            )
+
+            shapes = {
+                row[0] for row in db.execute_sql("SELECT uuid FROM shape").fetchall()
+            }
+            data = db.execute_sql("SELECT id, data, turn FROM _initiative_88")
+            for initiative_id, raw_data, turn in data.fetchall():
+                seen = set()
+                kept_before_turn = 0
+                for position, info in enumerate(json.loads(raw_data)):
+                    # Entries of removed shapes and duplicates were ignored by clients
+                    if info["shape"] not in shapes or info["shape"] in seen:
+                        continue
+                    if position < turn:
+                        kept_before_turn += 1
+                    # The index is a sparse ordering key (rank * 1024 within the initiative)
+                    index = len(seen) * 1024
+                    seen.add(info["shape"])
+                    entry_id = db.execute_sql(
+                        'INSERT INTO "initiative_entry" ("initiative_id", "shape_id", "index", "value", "is_visible", "is_group") VALUES (?, ?, ?, ?, ?, ?)',
+                        (
+                            initiative_id,
+                            info["shape"],
+                            index,
+                            info.get("initiative"),
+                            info.get("isVisible", False),
+                            info.get("isGroup", False),
+                        ),
+                    ).lastrowid
+                    db.cursor().executemany(
+                        'INSERT INTO "initiative_effect" ("entry_id", "index", "name", "turns", "highlights_actor") VALUES (?, ?, ?, ?, ?)',
+                        [
+                            (
+                                entry_id,
+                                effect_index,
+                                effect["name"],
+                                str(effect["turns"]),
+                                effect.get("highlightsActor", False),
+                            )
+                            for effect_index, effect in enumerate(
+                                info.get("effects", [])
+                            )
+                        ],
+                    )
+                # The turn is the position of the active entry, which moves up when skipping entries
+                db.execute_sql(
+                    'UPDATE "initiative" SET "turn" = ? WHERE "id" = ?',
+                    (kept_before_turn, initiative_id),
+                )
+            db.execute_sql("DROP TABLE _initiative_88")
     else:
         raise UnknownVersionException(
             f"No upgrade code for save format {version} was found."
@@ -442,9 +576,8 @@ def upgrade_save(db: Optional[SqliteExtDatabase] = None, *, is_import=False):
 
 
 def backup_save(version: int):
-    save_backups = FILE_DIR / "save_backups"
-    if not save_backups.is_dir():
-        save_backups.mkdir()
-    backup_path = save_backups.resolve() / f"{Path(SAVE_FILE).name}.{version}"
+    if not BACKUP_DIR.is_dir():
+        BACKUP_DIR.mkdir()
+    backup_path = BACKUP_DIR.resolve() / f"{Path(SAVE_FILE).name}.{version}"
     logger.warning(f"Backing up old save as {backup_path}")
-    shutil.copyfile(SAVE_FILE, backup_path)
+    copy_database(SAVE_FILE, backup_path)
@@ -0,0 +1,128 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from .config import config
+from .logs import logger
+from .models.db import db
+
+T = TypeVar("T")
+
+
+def init_reader() -> None:
+    db.connect(reuse_if_open=True)
+    db.execute_sql("PRAGMA query_only = ON")
+    logger.debug(f"Started read-only database thread {threading.current_thread().name}")
+
+
+class PoolMetrics:
+    """
+    Counters for the work of a SerializationPool.
+
+    The wait time is the time between submitting and starting the work,
+    a wait time that grows compared to the execution time means that the threads can not keep up.
+    """
+
+    def __init__(self) -> None:
+        self.completed = 0
+        self.queued = 0
+        self.active = 0
+        self.max_queued = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+        self.execution_time = 0.0
+        self.max_execution_time = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        completed = max(self.completed, 1)
+        return {
+            "completed": self.completed,
+            "queued": self.queued,
+            "active": self.active,
+            "maxQueued": self.max_queued,
+            "avgWaitMs": round(self.wait_time / completed * 1000, 3),
+            "maxWaitMs": round(self.max_wait_time * 1000, 3),
+            "avgExecutionMs": round(self.execution_time / completed * 1000, 3),
+            "maxExecutionMs": round(self.max_execution_time * 1000, 3),
+        }
+
+
+class SerializationPool:
+    """
+    Runs expensive read-only work (e.g. serializing a location) in a dedicated thread pool,
+    so that loading a big board does not block the event loop for every other room.
+
+    Every worker thread uses its own sqlite connection (peewee connections are thread local)
+    that is switched to query_only mode. With WAL enabled these readers do not block the writer.
+    The database executor (see db_executor.py) uses the same pool with a different initializer for its writer.
+
+    A size of 0 disables the pool and runs everything directly on the event loop.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        name: str = "serializer",
+        initializer: Callable[[], None] = init_reader,
+    ) -> None:
+        self.size = size
+        self.metrics = PoolMetrics()
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        if size > 0:
+            self._executor = ThreadPoolExecutor(
+                max_workers=size,
+                thread_name_prefix=name,
+                initializer=initializer,
+            )
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        if self._executor is None:
+            return fn(*args, **kwargs)
+
+        with self._lock:
+            self.metrics.queued += 1
+            self.metrics.max_queued = max(self.metrics.max_queued, self.metrics.queued)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor,
+            partial(self._work, time.perf_counter(), fn, *args, **kwargs),
+        )
+
+    def _work(
+        self, submitted: float, fn: Callable[..., T], *args: Any, **kwargs: Any
+    ) -> T:
+        metrics = self.metrics
+        started = time.perf_counter()
+        with self._lock:
+            metrics.queued -= 1
+            metrics.active += 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            finished = time.perf_counter()
+            with self._lock:
+                metrics.active -= 1
+                metrics.completed += 1
+                metrics.wait_time += started - submitted
+                metrics.max_wait_time = max(metrics.max_wait_time, started - submitted)
+                metrics.execution_time += finished - started
+                metrics.max_execution_time = max(
+                    metrics.max_execution_time, finished - started
+                )
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"size": self.size, **self.metrics.as_dict()}
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+
+serialization_pool = SerializationPool(
+    config.getint("General", "serialization_pool_size", fallback=2)
+)
@@ -1,6 +1,9 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Generator, Generic, Tuple, TypeVar
+from typing import Any, Dict, Generator, Generic, Optional, Set, Tuple, TypeVar
 
+from peewee import Model
+
+from ..cluster import SYNC_CHANNEL, cluster
 from ..models import User
 
 
@@ -8,32 +11,153 @@ T = TypeVar("T")
 
 
 class State(ABC, Generic[T]):
+    """
+    The connected sids of a namespace and their state.
+
+    When running multiple workers, the sids (and their index keys) of the other workers are known as well.
+    `get` and `get_sids` include these remote sids, `has_sid` only considers local sids.
+    """
+
+    # Used as cluster channel
+    name = ""
+
     def __init__(self) -> None:
         self._sid_map: Dict[str, T] = {}
+        # option -> key -> sids, see get_index_keys
+        self._indices: Dict[str, Dict[Any, Set[str]]] = {}
+        # The keys under which every sid is currently indexed
+        self._index_keys: Dict[str, Dict[str, Any]] = {}
+        # sid -> reference (see get_remote_ref) for the sids of other workers
+        self._remote: Dict[str, Any] = {}
+        self._remote_values: Dict[str, T] = {}
+        cluster.on(self._channel)(self._on_cluster_message)
+        cluster.on(SYNC_CHANNEL)(self._on_cluster_sync)
+
+    @property
+    def _channel(self) -> str:
+        return f"state.{self.name}"
 
     async def add_sid(self, sid: str, value: T) -> None:
+        self._unindex(sid)
         self._sid_map[sid] = value
+        self._index(sid, self.get_index_keys(value))
+        self._publish_sid(sid)
 
     async def remove_sid(self, sid: str) -> None:
+        self._unindex(sid)
         del self._sid_map[sid]
+        cluster.publish(self._channel, ("remove", sid, None, None))
 
     def has_sid(self, sid: str) -> bool:
         return sid in self._sid_map
 
+    def is_local(self, sid: str) -> bool:
+        return sid in self._sid_map
+
     def get(self, sid: str) -> T:
-        return self._sid_map[sid]
+        value = self._get_or_none(sid)
+        if value is None:
+            raise KeyError(sid)
+        return value
 
     @abstractmethod
     def get_user(self, sid: str) -> User:
         pass
 
+    def get_index_keys(self, value: T) -> Dict[str, Any]:
+        """
+        The get_sids options that are indexed, with the key of the given value for each of them.
+
+        Keys of model instances are their id, so that these can be looked up without queries.
+        Whenever one of these changes for a connected sid, `reindex` has to be called.
+        """
+        return {}
+
+    def get_remote_ref(self, value: T) -> Any:
+        """A picklable reference to the value, with which other workers can load it."""
+        return None
+
+    def load_remote(self, ref: Any) -> Optional[T]:
+        return None
+
+    def reindex(self, sid: str) -> None:
+        self._unindex(sid)
+        self._index(sid, self.get_index_keys(self._sid_map[sid]))
+        self._publish_sid(sid)
+
+    def _index(self, sid: str, keys: Dict[str, Any]) -> None:
+        self._index_keys[sid] = keys
+        for option, key in keys.items():
+            self._indices.setdefault(option, {}).setdefault(key, set()).add(sid)
+
+    def _unindex(self, sid: str) -> None:
+        for option, key in self._index_keys.pop(sid, {}).items():
+            sids = self._indices[option][key]
+            sids.discard(sid)
+            if len(sids) == 0:
+                del self._indices[option][key]
+
+    def _get_or_none(self, sid: str) -> Optional[T]:
+        value = self._sid_map.get(sid)
+        if value is not None or sid not in self._remote:
+            return value
+
+        value = self._remote_values.get(sid)
+        if value is None:
+            value = self.load_remote(self._remote[sid])
+            if value is not None:
+                self._remote_values[sid] = value
+        return value
+
+    def _publish_sid(self, sid: str) -> None:
+        cluster.publish(
+            self._channel,
+            (
+                "set",
+                sid,
+                self.get_remote_ref(self._sid_map[sid]),
+                self._index_keys[sid],
+            ),
+        )
+
+    async def _on_cluster_message(self, message: Any) -> None:
+        op, sid, ref, keys = message
+        self._unindex(sid)
+        self._remote_values.pop(sid, None)
+        if op == "set":
+            self._remote[sid] = ref
+            self._index(sid, keys)
+        else:
+            self._remote.pop(sid, None)
+
+    async def _on_cluster_sync(self, _: Any) -> None:
+        for sid in self._sid_map:
+            self._publish_sid(sid)
+
     def get_sids(self, skip_sid=None, **options) -> Generator[str, None, None]:
-        for sid, value in dict(self._sid_map).items():
+        # Start from the smallest matching index bucket, or all sids if no option is indexed
+        candidates = None
+        for option, value in options.items():
+            index = self._indices.get(option)
+            if index is None:
+                continue
+            bucket = index.get(_get_index_key(value), set())
+            if candidates is None or len(bucket) < len(candidates):
+                candidates = bucket
+        if candidates is None:
+            candidates = {*self._sid_map, *self._remote}
+
+        for sid in list(candidates):
             if skip_sid == sid:
                 continue
 
+            # The sid might have been removed while the caller was handling a previous one
+            state = self._get_or_none(sid)
+            if state is None:
+                continue
+
             if all(
-                getattr(self.get(sid), option, None) == value
+                getattr(state, option, None) == value
                 for option, value in options.items()
             ):
                 yield sid
@@ -45,3 +169,9 @@ class State(ABC, Generic[T]):
     def get_users(self, **options) -> Generator[Tuple[str, User], None, None]:
         for sid in self.get_sids(**options):
             yield sid, self.get_user(sid)
+
+
+def _get_index_key(value: Any) -> Any:
+    if isinstance(value, Model):
+        return value.get_id()
+    return value
@@ -1,18 +1,87 @@
-from typing import Any, Dict
+import threading
+from typing import Any, Dict, Optional, Tuple
 
 from ..app import app
-from ..models import User
+from ..cluster import cluster
+from ..models import Asset, User
+from ..models.asset import AssetStructure
+from ..upload import SlicedUpload
 from . import State
 
 
 class AssetState(State[User]):
+    name = "asset"
+
     def __init__(self) -> None:
         super().__init__()
-        self.pending_file_upload_cache: Dict[str, Any] = {}
+        self.pending_file_upload_cache: Dict[str, SlicedUpload] = {}
 
     def get_user(self, sid: str) -> User:
-        return self._sid_map[sid]
+        return self.get(sid)
+
+    def get_remote_ref(self, value: User) -> Any:
+        return value.id
+
+    def load_remote(self, ref: Any) -> Optional[User]:
+        return User.get_or_none(id=ref)
+
+
+class AssetTreeCache:
+    """
+    Cache of the asset structures (see Asset.get_user_structure) that are sent to the game clients.
+
+    Every change to the folders or files of a user has to `refresh` or `invalidate` the tree of that user.
+    The returned trees are shared between all callers and must not be mutated.
+    The cache can be used from the serialization pool threads.
+    """
+
+    def __init__(self) -> None:
+        self._trees: Dict[int, AssetStructure] = {}
+        # Bumped on every change, so that a tree built during a change is not stored
+        self._versions: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, user: User) -> AssetStructure:
+        with self._lock:
+            tree = self._trees.get(user.id)
+            version = self._versions.get(user.id, 0)
+        if tree is not None:
+            return tree
+
+        tree = Asset.get_user_structure(user)
+        with self._lock:
+            if self._versions.get(user.id, 0) == version:
+                self._trees[user.id] = tree
+        return tree
+
+    def refresh(self, user: User) -> Tuple[Optional[AssetStructure], AssetStructure]:
+        """Rebuilds the tree of the user, returns the previously cached tree (if any) and the new tree."""
+        tree = Asset.get_user_structure(user)
+        with self._lock:
+            self._versions[user.id] = self._versions.get(user.id, 0) + 1
+            old_tree = self._trees.get(user.id)
+            self._trees[user.id] = tree
+        cluster.publish("asset.invalidate", user.id)
+        return old_tree, tree
+
+    def invalidate(self, user_id: int) -> None:
+        self._invalidate(user_id)
+        cluster.publish("asset.invalidate", user_id)
+
+    def _invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._versions[user_id] = self._versions.get(user_id, 0) + 1
+            self._trees.pop(user_id, None)
 
 
 asset_state = AssetState()
 app["state"]["asset"] = asset_state
+asset_tree_cache = AssetTreeCache()
+
+
+# Changes made by other workers
+
+
+@cluster.on("asset.invalidate")
+async def _invalidate(user_id: int):
+    asset_tree_cache._invalidate(user_id)
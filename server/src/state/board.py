@@ -0,0 +1,180 @@
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Set, Tuple, Union
+
+from ..cluster import cluster
+from ..config import config
+from ..logs import logger
+from ..models import Floor, Layer, Location, Room, Shape, ShapeOwner, User
+from .changelog import change_log
+
+# Either "dm" (all DMs see the same board) or the set of shapes a player owns.
+# Two players that own the same shapes receive an identical serialization.
+VisibilityKey = Union[str, FrozenSet[str]]
+CacheKey = Tuple[int, VisibilityKey, int]
+
+
+class CacheEntry:
+    __slots__ = ("version", "data", "size")
+
+    def __init__(self, version: int, data: Dict[str, Any], size: int):
+        self.version = version
+        self.data = data
+        self.size = size
+
+
+class BoardCache:
+    """
+    In-process cache of serialized floors.
+
+    Every location has a version counter that must be bumped by every handler
+    that changes something that ends up in `Floor.as_dict`.
+    Bumping a location evicts all of its cached floors.
+    The cache is LRU-evicted once the total (approximate) size exceeds `max_size` bytes.
+
+    The returned dicts are shared between all callers and must not be mutated.
+    The cache can be used from the serialization pool threads.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._versions: Dict[int, int] = {}
+        self._entries: "OrderedDict[CacheKey, CacheEntry]" = OrderedDict()
+        self._location_keys: Dict[int, Set[CacheKey]] = {}
+        self._lock = threading.RLock()
+        # Floors that are being serialized right now, other threads wait for them instead
+        self._in_flight: Dict[CacheKey, threading.Event] = {}
+
+    def get_version(self, location: Union[Location, int]) -> int:
+        return self._versions.get(_location_id(location), 0)
+
+    def bump(self, location: Union[Location, int]) -> int:
+        location_id = _location_id(location)
+        version = self._invalidate(location_id)
+        change_log.touch(location_id)
+        cluster.publish("board.bump", location_id)
+        return version
+
+    def bump_room(self, room: Room) -> None:
+        for location in Location.select(Location.id).where(Location.room == room):
+            self.bump(location.id)
+
+    def evict(self, location_id: int) -> None:
+        with self._lock:
+            for key in self._location_keys.pop(location_id, set()):
+                entry = self._entries.pop(key, None)
+                if entry is not None:
+                    self.size -= entry.size
+
+    def clear(self) -> None:
+        self._invalidate_all()
+        change_log.touch_all()
+        cluster.publish("board.clear", None)
+
+    def _invalidate(self, location_id: int) -> int:
+        with self._lock:
+            version = self._versions.get(location_id, 0) + 1
+            self._versions[location_id] = version
+            self.evict(location_id)
+        return version
+
+    def _invalidate_all(self) -> None:
+        with self._lock:
+            for location_id in list(self._location_keys):
+                self._invalidate(location_id)
+
+    def get_visibility_key(self, location: Location, user: User, dm: bool):
+        if dm:
+            return "dm"
+        return frozenset(
+            so.shape_id
+            for so in ShapeOwner.select(ShapeOwner.shape)
+            .join(Shape)
+            .join(Layer)
+            .join(Floor)
+            .where((ShapeOwner.user == user) & (Floor.location == location))
+        )
+
+    def get_floor(
+        self, floor: Floor, user: User, dm: bool, visibility: VisibilityKey
+    ) -> Dict[str, Any]:
+        location_id = floor.location_id
+        key: CacheKey = (location_id, visibility, floor.id)
+        version = self.get_version(location_id)
+
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry.version == version:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry.data
+                in_flight = self._in_flight.get(key)
+                if in_flight is None:
+                    self.misses += 1
+                    in_flight = self._in_flight[key] = threading.Event()
+                    break
+            in_flight.wait()
+            version = self.get_version(location_id)
+
+        try:
+            data = floor.as_dict(user, dm)
+            self._store(key, CacheEntry(version, data, len(json.dumps(data))))
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            in_flight.set()
+        return data
+
+    def _store(self, key: CacheKey, entry: CacheEntry) -> None:
+        if entry.size > self.max_size:
+            logger.info(f"Floor {key[2]} is too large to be cached ({entry.size}B)")
+            return
+
+        with self._lock:
+            # The location was changed while this floor was being serialized
+            if entry.version != self.get_version(key[0]):
+                return
+
+            old_entry = self._entries.pop(key, None)
+            if old_entry is not None:
+                self.size -= old_entry.size
+
+            self._entries[key] = entry
+            self._location_keys.setdefault(key[0], set()).add(key)
+            self.size += entry.size
+
+            while self.size > self.max_size:
+                old_key, old_entry = self._entries.popitem(last=False)
+                self._location_keys[old_key[0]].discard(old_key)
+                self.size -= old_entry.size
+
+
+def _location_id(location: Union[Location, int]) -> int:
+    return location if isinstance(location, int) else location.id
+
+
+board_cache = BoardCache(
+    config.getint("General", "board_cache_size_in_bytes", fallback=50_000_000)
+)
+
+
+# Changes made by other workers
+# The changes themselves are only recorded by the worker that made them,
+# so clients of this worker need a full load to catch up.
+
+
+@cluster.on("board.bump")
+async def _bump(location_id: int):
+    board_cache._invalidate(location_id)
+    change_log.touch(location_id)
+
+
+@cluster.on("board.clear")
+async def _clear(_):
+    board_cache._invalidate_all()
+    change_log.touch_all()
@@ -0,0 +1,177 @@
+import asyncio
+from collections import deque
+from functools import partial
+from typing import Any, Deque, Dict, List, Optional, Tuple, Union
+from uuid import uuid4
+
+from ..api.socket.constants import GAME_NS
+from ..app import sio
+from ..config import config
+from ..models import Location, Room
+
+# (event, data, skip_sid)
+RecordedEvent = Tuple[str, Any, Optional[str]]
+
+VERSION_ROOM_PREFIX = "__versions__/"
+
+
+class Change:
+    __slots__ = ("version", "events", "filled", "tainted")
+
+    def __init__(self, version: int):
+        self.version = version
+        self.events: List[RecordedEvent] = []
+        # At least one broadcast to the location has been recorded
+        self.filled = False
+        # Something was sent that cannot be replayed (e.g. a message to a single client)
+        self.tainted = False
+
+    @property
+    def replayable(self) -> bool:
+        return self.filled and not self.tainted
+
+
+class LocationChanges:
+    def __init__(self, size: int):
+        self.version = 0
+        self.changes: Deque[Change] = deque(maxlen=size)
+
+
+class ChangeLog:
+    """
+    Keeps a version and a bounded buffer of recent changes for every location.
+
+    Every persisted mutation of a location must `touch` it, which creates a new version.
+    The location broadcasts that are emitted by the same task (i.e. the same socket event handler)
+    are recorded as the content of that version.
+    If the handler emits anything else (e.g. messages to individual clients),
+    the version can not be replayed and clients that missed it need a full load instead.
+
+    Clients that opted in are told about new versions through a separate socket.io room.
+    """
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        # Versions are only meaningful within a single server run
+        self.epoch = uuid4().hex
+        self._locations: Dict[int, LocationChanges] = {}
+        self._paths: Dict[str, int] = {}
+        self._pending: Dict[int, Tuple["asyncio.Task[Any]", Change]] = {}
+
+    def get_version(self, location: Union[Location, int]) -> int:
+        changes = self._locations.get(_location_id(location))
+        return 0 if changes is None else changes.version
+
+    def track(self, location: Location) -> None:
+        """Registers the socket.io room of the location so that its broadcasts are recorded."""
+        self._paths[location.get_path()] = location.id
+
+    def touch(self, location: Union[Location, int]) -> int:
+        location_id = _location_id(location)
+        changes = self._locations.get(location_id)
+        if changes is None:
+            changes = self._locations[location_id] = LocationChanges(self.size)
+
+        changes.version += 1
+        change = Change(changes.version)
+        changes.changes.append(change)
+
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        if task is None:
+            change.tainted = True
+        else:
+            self._pending[location_id] = (task, change)
+            task.add_done_callback(partial(self._clear_pending, location_id, change))
+        return changes.version
+
+    def _clear_pending(
+        self, location_id: int, change: Change, _task: "asyncio.Task[Any]"
+    ) -> None:
+        pending = self._pending.get(location_id)
+        if pending is not None and pending[1] is change:
+            del self._pending[location_id]
+
+    def touch_room(self, room: Room) -> None:
+        for location in Location.select(Location.id).where(Location.room == room):
+            self.touch(location.id)
+
+    def touch_all(self) -> None:
+        for location_id in {*self._locations, *self._paths.values()}:
+            self.touch(location_id)
+
+    def get_changes(
+        self, location: Union[Location, int], version: int
+    ) -> Optional[List[RecordedEvent]]:
+        """
+        Returns all events that were recorded after the given version,
+        or None if they can not be replayed and a full load is required.
+        """
+        changes = self._locations.get(_location_id(location))
+        current = 0 if changes is None else changes.version
+        if version == current:
+            return []
+        if changes is None or version > current:
+            return None
+
+        missed = [change for change in changes.changes if change.version > version]
+        if len(missed) != current - version:
+            # The buffer has been overrun
+            return None
+        if not all(change.replayable for change in missed):
+            return None
+        return [event for change in missed for event in change.events]
+
+    async def on_emit(
+        self, event: str, data: Any, room: Optional[str], skip_sid: Optional[str]
+    ) -> None:
+        if room is not None and room.startswith(VERSION_ROOM_PREFIX):
+            return
+
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            return
+
+        for location_id, (pending_task, change) in list(self._pending.items()):
+            if pending_task is not task:
+                continue
+
+            if room is None or self._paths.get(room) != location_id:
+                change.tainted = True
+                continue
+
+            change.events.append((event, data, skip_sid))
+            if not change.filled:
+                change.filled = True
+                await sio.emit(
+                    "Location.Version.Set",
+                    {
+                        "location": location_id,
+                        "version": change.version,
+                        "epoch": self.epoch,
+                    },
+                    room=get_version_room(location_id),
+                    namespace=GAME_NS,
+                )
+
+
+def get_version_room(location: Union[Location, int]) -> str:
+    return f"{VERSION_ROOM_PREFIX}{_location_id(location)}"
+
+
+def _location_id(location: Union[Location, int]) -> int:
+    return location if isinstance(location, int) else location.id
+
+
+change_log = ChangeLog(config.getint("General", "change_log_size", fallback=500))
+
+
+async def _record_emit(event, data, room, skip_sid, namespace):
+    if namespace == GAME_NS:
+        await change_log.on_emit(event, data, room, skip_sid)
+
+
+sio.emit_listeners.append(_record_emit)
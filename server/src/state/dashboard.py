@@ -1,14 +1,27 @@
+from typing import Any, Dict, Optional
+
 from ..app import app
 from ..models import User
 from . import State
 
 
 class DashboardState(State[User]):
+    name = "dashboard"
+
     def __init__(self) -> None:
         super().__init__()
 
     def get_user(self, sid: str) -> User:
-        return self._sid_map[sid]
+        return self.get(sid)
+
+    def get_remote_ref(self, value: User) -> Any:
+        return value.id
+
+    def load_remote(self, ref: Any) -> Optional[User]:
+        return User.get_or_none(id=ref)
+
+    def get_index_keys(self, value: User) -> Dict[str, Any]:
+        return {"id": value.id}
 
 
 dashboard_state = DashboardState()
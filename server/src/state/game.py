@@ -1,21 +1,134 @@
-from typing import Dict, Set
+import asyncio
+from typing import Any, Dict, FrozenSet, NamedTuple, Optional, Set, Tuple
 
 from ..api.socket.constants import GAME_NS
 from ..app import app, sio
+from ..cluster import ReplicatedDict, cluster
 from ..data_types.client import Viewport
-from ..models import PlayerRoom, User
+from ..models import Floor, Layer, Location, PlayerRoom, Room, User
+from ..models.role import Role
 from . import State
 
 
+class Session(NamedTuple):
+    """
+    Pre-resolved snapshot of the state of a connection that most handlers need.
+
+    Reading this does not cause any (lazy) queries.
+    It is replaced whenever one of its values changes (see GameState.refresh_session).
+    """
+
+    player: User
+    player_name: str
+    room: Room
+    room_path: str
+    location: Location
+    location_path: str
+    role: Role
+    # ids of the layers of the location
+    editable_layers: FrozenSet[int]
+    visible_layers: FrozenSet[int]
+
+
 class GameState(State[PlayerRoom]):
+    name = "game"
+
     def __init__(self) -> None:
         super().__init__()
         self.client_temporaries: Dict[str, Set[str]] = {}
-        self.client_viewports: Dict[str, Viewport] = {}
-        self.client_gameboards: Dict[str, str] = {}
+        # These are also used for clients of other workers
+        self.client_viewports: Dict[str, Viewport] = ReplicatedDict("client_viewports")
+        self.client_gameboards: Dict[str, str] = ReplicatedDict("client_gameboards")
+        # sids of clients that asked to receive location loads as a single Location.Snapshot
+        self.snapshot_clients: Set[str] = set()
+        # sids of clients that asked to receive the shapes of a location progressively
+        self.progressive_clients: Set[str] = set()
+        self.client_streams: Dict[str, "asyncio.Task[None]"] = {}
+        # sids of clients that want to be informed about location change versions
+        self.versioned_clients: Set[str] = set()
+        self._sessions: Dict[str, Session] = {}
 
     def get_user(self, sid: str) -> User:
-        return self._sid_map[sid].player
+        return self.get(sid).player
+
+    def get_remote_ref(self, value: PlayerRoom) -> Any:
+        return value.id
+
+    def load_remote(self, ref: Any) -> Optional[PlayerRoom]:
+        return PlayerRoom.get_or_none(id=ref)
+
+    def get_index_keys(self, value: PlayerRoom) -> Dict[str, Any]:
+        return {
+            "room": value.room_id,
+            "player": value.player_id,
+            "active_location": value.active_location_id,
+            "role": value.role,
+        }
+
+    def get_session(self, sid: str) -> Session:
+        return self._sessions[sid]
+
+    def refresh_session(self, sid: str) -> None:
+        pr = self._sid_map[sid]
+        room = pr.room
+        location = pr.active_location
+        if location.room_id == room.id:
+            location.room = room
+        layers = list(
+            Layer.select(Layer.id, Layer.player_editable, Layer.player_visible)
+            .join(Floor)
+            .where(Floor.location == location)
+        )
+        self._sessions[sid] = Session(
+            player=pr.player,
+            player_name=pr.player.name,
+            room=room,
+            room_path=room.get_path(),
+            location=location,
+            location_path=location.get_path(),
+            role=pr.role,
+            editable_layers=frozenset(
+                layer.id for layer in layers if layer.player_editable
+            ),
+            visible_layers=frozenset(
+                layer.id for layer in layers if layer.player_visible
+            ),
+        )
+
+    def refresh_location_sessions(self, location: Location) -> None:
+        """Refreshes the sessions on the given location, e.g. when its layers change."""
+        for sid in self.get_sids(active_location=location):
+            if self.is_local(sid):
+                self.refresh_session(sid)
+        cluster.publish("game.sessions.refresh", location.id)
+
+    def reload_room_sessions(self, room: Room, player: Optional[User] = None) -> None:
+        """
+        Reloads the PlayerRoom and session of the connections to the room (or only those of the player).
+
+        This is needed when the stored PlayerRoom or Room changes, e.g. when the role of a player changes.
+        """
+        _reload_sessions(room.id, None if player is None else player.id)
+        cluster.publish(
+            "game.sessions.reload", (room.id, None if player is None else player.id)
+        )
+
+    def reload(self, sid: str) -> None:
+        self._sid_map[sid] = PlayerRoom.get_by_id(self._sid_map[sid].id)
+        self.reindex(sid)
+        self.refresh_session(sid)
+
+    async def add_sid(self, sid: str, value: PlayerRoom) -> None:
+        await super().add_sid(sid, value)
+        self.refresh_session(sid)
+
+    def set_active_location(self, sid: str, location: Location) -> None:
+        pr = self._sid_map[sid]
+        if pr.active_location != location:
+            pr.active_location = location
+            pr.save()
+        self.reindex(sid)
+        self.refresh_session(sid)
 
     async def remove_sid(self, sid: str) -> None:
         await self.clear_temporaries(sid)
@@ -23,8 +136,18 @@ class GameState(State[PlayerRoom]):
             del self.client_viewports[sid]
         if sid in self.client_gameboards:
             del self.client_gameboards[sid]
+        self.snapshot_clients.discard(sid)
+        self.progressive_clients.discard(sid)
+        self.versioned_clients.discard(sid)
+        self.cancel_stream(sid)
+        self._sessions.pop(sid, None)
         await super().remove_sid(sid)
 
+    def cancel_stream(self, sid: str) -> None:
+        task = self.client_streams.pop(sid, None)
+        if task is not None:
+            task.cancel()
+
     async def clear_temporaries(self, sid: str) -> None:
         if sid in self.client_temporaries:
             await sio.emit(
@@ -45,4 +168,27 @@ class GameState(State[PlayerRoom]):
 
 
 game_state = GameState()
+
+
+@cluster.on("game.sessions.refresh")
+async def _refresh_location_sessions(location_id: int):
+    for sid in game_state.get_sids(active_location=Location(id=location_id)):
+        if game_state.is_local(sid):
+            game_state.refresh_session(sid)
+
+
+def _reload_sessions(room_id: int, player_id: Optional[int]) -> None:
+    options: Dict[str, Any] = {"room": Room(id=room_id)}
+    if player_id is not None:
+        options["player"] = User(id=player_id)
+    for sid in game_state.get_sids(**options):
+        if game_state.is_local(sid):
+            game_state.reload(sid)
+
+
+@cluster.on("game.sessions.reload")
+async def _reload_room_sessions(message: Tuple[int, Optional[int]]):
+    _reload_sessions(*message)
+
+
 app["state"]["game"] = game_state
@@ -0,0 +1,148 @@
+import asyncio
+import threading
+from typing import Dict, List, Optional
+
+from playhouse.signals import pre_delete, pre_save
+
+from ..cluster import cluster
+from ..config import config
+from ..logs import logger
+from ..models.db import db
+from ..models.shape import Shape
+from ..models.utils import get_table
+
+
+class BufferedPosition:
+    __slots__ = ("x", "y", "angle", "points", "type_")
+
+    def __init__(
+        self,
+        x: float,
+        y: float,
+        angle: float,
+        points: Optional[List[List[float]]],
+        type_: str,
+    ):
+        self.x = x
+        self.y = y
+        self.angle = angle
+        self.points = points
+        self.type_ = type_
+
+
+class PositionBuffer:
+    """
+    Write-behind buffer for shape positions.
+
+    Position updates are kept in memory (latest update wins) and written to the database
+    in a single transaction at most `interval` seconds later.
+
+    Durability: a position update is broadcast before it is persisted.
+    If the server crashes, the updates of the last `interval` seconds are lost.
+    A regular shutdown flushes the buffer.
+
+    Anything that reads shape positions from the database (e.g. loading a location or exporting a campaign)
+    has to `flush` first. Saving a Shape instance applies its buffered position,
+    unless the instance itself changed that field.
+
+    An interval of 0 writes every update immediately.
+    This is always the case with multiple workers (see get_flush_interval),
+    as the worker that loads a location does not hold the buffers of the other workers.
+
+    The pre_save/pre_delete hooks also run on the database writer thread,
+    so the pending updates are only accessed while holding `_lock`.
+    """
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self._dirty: Dict[str, BufferedPosition] = {}
+        self._lock = threading.Lock()
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+
+    def add(self, shape: Shape, points: List[List[float]], angle: float) -> None:
+        position = BufferedPosition(
+            points[0][0],
+            points[0][1],
+            angle,
+            points[1:] if len(points) > 1 else None,
+            shape.type_,
+        )
+        with self._lock:
+            self._dirty[shape.uuid] = position
+        if self.interval <= 0:
+            self.flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(
+                self.interval, self.flush
+            )
+
+    def pop(self, uuid: str) -> Optional[BufferedPosition]:
+        with self._lock:
+            return self._dirty.pop(uuid, None)
+
+    def flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        with self._lock:
+            dirty = self._dirty
+            self._dirty = {}
+
+        if len(dirty) == 0:
+            return
+
+        with db.atomic():
+            for uuid, position in dirty.items():
+                Shape.update(x=position.x, y=position.y, angle=position.angle).where(
+                    Shape.uuid == uuid
+                ).execute()
+                if position.points is not None:
+                    _set_subtype_location(uuid, position)
+
+
+def _set_subtype_location(uuid: str, position: BufferedPosition) -> None:
+    table = get_table(position.type_)
+    if table is None:
+        logger.error(f"Attempt to set location on shape with unknown type {uuid}")
+        return
+    subtype = table.get_or_none(table.shape == uuid)
+    if subtype is not None:
+        subtype.set_location(position.points)
+
+
+def get_flush_interval() -> float:
+    interval = config.getint("General", "position_flush_interval_in_ms", fallback=500)
+    # A location can be loaded by a worker that does not hold the buffered positions
+    if cluster.enabled and interval > 0:
+        logger.warning(
+            "position_flush_interval_in_ms is ignored with multiple workers, shape moves are written immediately"
+        )
+        return 0
+    return interval / 1000
+
+
+position_buffer = PositionBuffer(get_flush_interval())
+
+
+@pre_save(sender=Shape)
+def _apply_buffered_position(model_class, instance: Shape, created: bool):
+    if created:
+        return
+
+    position = position_buffer.pop(instance.uuid)
+    if position is None:
+        return
+
+    # Changes made to this instance are newer than the buffered position
+    if not {"x", "y", "angle"} & instance._dirty:
+        instance.x = position.x
+        instance.y = position.y
+        instance.angle = position.angle
+        if position.points is not None:
+            _set_subtype_location(instance.uuid, position)
+
+
+@pre_delete(sender=Shape)
+def _drop_buffered_position(model_class, instance: Shape):
+    position_buffer.pop(instance.uuid)
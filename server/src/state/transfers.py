@@ -0,0 +1,154 @@
+import asyncio
+import time
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from ..config import config
+from ..logs import logger
+
+
+class TransferLimitExceeded(Exception):
+    pass
+
+
+class Transfer:
+    __slots__ = ("kind", "key", "user_id", "size", "last_activity", "on_evict")
+
+    def __init__(
+        self,
+        kind: str,
+        key: Hashable,
+        user_id: int,
+        on_evict: Callable[[], Awaitable[None]],
+    ) -> None:
+        self.kind = kind
+        self.key = key
+        self.user_id = user_id
+        self.size = 0
+        self.last_activity = time.monotonic()
+        self.on_evict = on_evict
+
+
+class TransferManager:
+    """
+    Bookkeeping of the data held for transfers (asset uploads, campaign imports) that are still in progress.
+
+    Every transfer is identified by its kind and a key that is unique for that kind.
+    The owner of the transfer reserves the size of every piece of data it keeps around.
+    A reservation is refused if it would exceed the total `limit` or the `user_limit` of the user that started it.
+
+    Transfers without any activity for `timeout` seconds are evicted by calling their `on_evict` callback,
+    which has to release the data held for the transfer.
+
+    A limit of 0 disables that limit.
+    """
+
+    def __init__(self, timeout: float, limit: int, user_limit: int) -> None:
+        self.timeout = timeout
+        self.limit = limit
+        self.user_limit = user_limit
+        self.size = 0
+        self.evictions = 0
+        self.rejections = 0
+        self._transfers: Dict[Tuple[str, Hashable], Transfer] = {}
+        self._user_sizes: Dict[int, int] = defaultdict(int)
+        self._sweep_handle: Optional[asyncio.TimerHandle] = None
+
+    def add(
+        self,
+        kind: str,
+        key: Hashable,
+        user_id: int,
+        on_evict: Callable[[], Awaitable[None]],
+    ) -> Transfer:
+        self.remove(kind, key)
+        transfer = Transfer(kind, key, user_id, on_evict)
+        self._transfers[(kind, key)] = transfer
+        if self._sweep_handle is None:
+            self._schedule_sweep()
+        return transfer
+
+    def reserve(self, kind: str, key: Hashable, size: int) -> None:
+        transfer = self._transfers[(kind, key)]
+        transfer.last_activity = time.monotonic()
+
+        if self.limit > 0 and self.size + size > self.limit:
+            self.rejections += 1
+            raise TransferLimitExceeded(
+                "The server is receiving too much data at the moment, try again later."
+            )
+        user_size = self._user_sizes[transfer.user_id]
+        if self.user_limit > 0 and user_size + size > self.user_limit:
+            self.rejections += 1
+            raise TransferLimitExceeded(
+                "You have too many unfinished uploads, wait for them to finish."
+            )
+
+        transfer.size += size
+        self.size += size
+        self._user_sizes[transfer.user_id] += size
+
+    def remove(self, kind: str, key: Hashable) -> None:
+        transfer = self._transfers.pop((kind, key), None)
+        if transfer is None:
+            return
+        self.size -= transfer.size
+        self._user_sizes[transfer.user_id] -= transfer.size
+        if self._user_sizes[transfer.user_id] <= 0:
+            del self._user_sizes[transfer.user_id]
+
+    async def evict_stale(self) -> None:
+        threshold = time.monotonic() - self.timeout
+        for transfer in list(self._transfers.values()):
+            if transfer.last_activity > threshold:
+                continue
+            logger.info(
+                f"Dropping stale {transfer.kind} {transfer.key} ({transfer.size} bytes)"
+            )
+            self.remove(transfer.kind, transfer.key)
+            self.evictions += 1
+            try:
+                await transfer.on_evict()
+            except Exception:
+                logger.exception(f"Could not clean up {transfer.kind} {transfer.key}")
+
+    def _schedule_sweep(self) -> None:
+        if self.timeout <= 0:
+            return
+        self._sweep_handle = asyncio.get_running_loop().call_later(
+            min(self.timeout, 60), self._sweep
+        )
+
+    def _sweep(self) -> None:
+        task = asyncio.create_task(self.evict_stale())
+        task.add_done_callback(self._after_sweep)
+
+    def _after_sweep(self, _task: "asyncio.Task[None]") -> None:
+        self._sweep_handle = None
+        if self._transfers:
+            self._schedule_sweep()
+
+    def get_stats(self) -> Dict[str, Any]:
+        counts: Dict[str, int] = defaultdict(int)
+        sizes: Dict[str, int] = defaultdict(int)
+        for transfer in self._transfers.values():
+            counts[transfer.kind] += 1
+            sizes[transfer.kind] += transfer.size
+        return {
+            "count": dict(counts),
+            "bytes": dict(sizes),
+            "totalBytes": self.size,
+            "limit": self.limit,
+            "userLimit": self.user_limit,
+            "evictions": self.evictions,
+            "rejections": self.rejections,
+        }
+
+
+transfer_manager = TransferManager(
+    config.getfloat("General", "transfer_timeout_in_seconds", fallback=600),
+    config.getint("General", "transfer_limit_in_bytes", fallback=4 * 1024**3),
+    config.getint(
+        "General", "transfer_limit_per_user_in_bytes", fallback=2 * 1024**3
+    ),
+)
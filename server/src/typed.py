@@ -1,13 +1,52 @@
-from typing import TYPE_CHECKING, Callable, Optional, Union, overload
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Awaitable,
+    Callable,
+    List,
+    Optional,
+    Union,
+    overload,
+)
 
 import socketio
 
+# Called after every emit with (event, data, room, skip_sid, namespace)
+EmitListener = Callable[
+    [str, Any, Optional[str], Optional[str], Optional[str]], Awaitable[None]
+]
+
 
 class TypedAsyncServer(socketio.AsyncServer):
     def __init__(self, **kwargs):
         super().__init__(
             async_mode="aiohttp", engineio_logger=False, logger=False, **kwargs
         )
+        self.emit_listeners: List[EmitListener] = []
+
+    async def emit(
+        self,
+        event,
+        data=None,
+        to=None,
+        room=None,
+        skip_sid=None,
+        namespace=None,
+        callback=None,
+        **kwargs,
+    ):
+        await super().emit(
+            event,
+            data=data,
+            to=to,
+            room=room,
+            skip_sid=skip_sid,
+            namespace=namespace,
+            callback=callback,
+            **kwargs,
+        )
+        for listener in self.emit_listeners:
+            await listener(event, data, to or room, skip_sid, namespace)
 
     if TYPE_CHECKING:
 
@@ -0,0 +1,121 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Dict
+
+from .utils import ASSETS_DIR, TEMP_DIR
+
+UPLOAD_DIR = TEMP_DIR / "uploads"
+
+
+class UploadError(Exception):
+    pass
+
+
+class PendingUpload:
+    """
+    A file upload that is written to disk while it is received.
+
+    The data is appended to a temporary file and hashed as it arrives,
+    so memory use does not depend on the size of the file.
+    """
+
+    def __init__(self) -> None:
+        UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+        fd, path = tempfile.mkstemp(dir=UPLOAD_DIR, suffix=".part")
+        self.path = Path(path)
+        self.size = 0
+        self._file = os.fdopen(fd, "wb")
+        self._hash = hashlib.sha1()
+
+    @property
+    def file_hash(self) -> str:
+        return self._hash.hexdigest()
+
+    def append(self, data: bytes) -> None:
+        self._file.write(data)
+        self._hash.update(data)
+        self.size += len(data)
+
+    def close(self) -> None:
+        self._file.close()
+
+    def read(self) -> bytes:
+        self.close()
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def store(self) -> str:
+        """
+        Moves the completed file into the assets folder and returns its hash.
+
+        The file only appears in the assets folder once it is complete.
+        If a file with the same content is already present, the upload is discarded instead.
+        """
+        self.close()
+        file_hash = self.file_hash
+        target = ASSETS_DIR / file_hash
+        if target.exists():
+            self.discard()
+            return file_hash
+
+        try:
+            os.replace(self.path, target)
+        except OSError:
+            # The assets folder is on another device, copy next to the target first to keep the final move atomic
+            partial_target = target.with_name(f"{file_hash}.partial")
+            shutil.copyfile(self.path, partial_target)
+            os.replace(partial_target, target)
+            self.discard()
+        return file_hash
+
+    def discard(self) -> None:
+        self.close()
+        self.path.unlink(missing_ok=True)
+
+
+class SlicedUpload(PendingUpload):
+    """
+    An upload that is received as numbered slices.
+
+    Slices are written as soon as all slices before them are known,
+    so only slices that arrive out of order are kept in memory.
+    """
+
+    def __init__(self, sid: str, total_slices: int) -> None:
+        if total_slices < 1:
+            raise UploadError(f"Invalid number of slices: {total_slices}")
+
+        super().__init__()
+        self.sid = sid
+        self.total_slices = total_slices
+        self.next_slice = 0
+        self._out_of_order: Dict[int, bytes] = {}
+
+    @property
+    def complete(self) -> bool:
+        return self.next_slice == self.total_slices
+
+    def has_slice(self, index: int) -> bool:
+        return index < self.next_slice or index in self._out_of_order
+
+    def add_slice(self, index: int, data: bytes) -> None:
+        if not (0 <= index < self.total_slices):
+            raise UploadError(f"Slice {index} is out of range")
+        # A slice that is sent twice is ignored
+        if self.has_slice(index):
+            return
+
+        self._out_of_order[index] = data
+        while self.next_slice in self._out_of_order:
+            self.append(self._out_of_order.pop(self.next_slice))
+            self.next_slice += 1
+
+        if self.complete:
+            self.close()
+
+    def discard(self) -> None:
+        self._out_of_order.clear()
+        super().discard()
@@ -0,0 +1,77 @@
+"""
+Serving an asset file to a cold cache (full download) and a warm cache (revalidation or range).
+
+Run with `python -m pytest tests/benchmarks -s` to see the timings.
+"""
+import asyncio
+import hashlib
+import os
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from aiohttp import hdrs, web
+from aiohttp.test_utils import TestClient, TestServer
+
+from src.api.http import assets
+
+ASSET_SIZE = 1024 * 1024
+REQUESTS = 50
+
+
+def create_asset(directory: Path) -> Tuple[str, bytes]:
+    data = os.urandom(ASSET_SIZE)
+    file_hash = hashlib.sha1(data).hexdigest()
+    (directory / file_hash).write_bytes(data)
+    return file_hash, data
+
+
+async def time_requests(
+    client: TestClient, url: str, headers: Optional[Dict[str, str]] = None
+) -> float:
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        response = await client.get(url, headers=headers)
+        await response.read()
+    return (time.perf_counter() - start) / REQUESTS
+
+
+async def run_benchmark(file_hash: str, data: bytes) -> None:
+    app = web.Application()
+    app.router.add_get("/static/assets/{file_hash}", assets.get_file)
+    async with TestClient(TestServer(app)) as client:
+        url = f"/static/assets/{file_hash}"
+
+        response = await client.get(url)
+        assert response.status == 200
+        assert await response.read() == data
+        assert response.headers[hdrs.ETAG] == f'"{file_hash}"'
+        assert response.headers[hdrs.CACHE_CONTROL] == assets.ASSET_CACHE_CONTROL
+
+        revalidate = {hdrs.IF_NONE_MATCH: f'"{file_hash}"'}
+        response = await client.get(url, headers=revalidate)
+        assert response.status == 304
+        assert await response.read() == b""
+
+        byte_range = {hdrs.RANGE: "bytes=0-65535", hdrs.IF_RANGE: f'"{file_hash}"'}
+        response = await client.get(url, headers=byte_range)
+        assert response.status == 206
+        assert await response.read() == data[:65536]
+
+        response = await client.get("/static/assets/unknown")
+        assert response.status == 404
+
+        cold = await time_requests(client, url)
+        warm = await time_requests(client, url, revalidate)
+        ranged = await time_requests(client, url, byte_range)
+
+    assert warm < cold
+    print(
+        f"\n{ASSET_SIZE // 1024} KB asset: cold {cold * 1000:.2f} ms,"
+        f" warm (304) {warm * 1000:.2f} ms, 64 KB range {ranged * 1000:.2f} ms"
+    )
+
+
+def test_asset_cold_and_warm(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(assets, "ASSETS_DIR", tmp_path)
+    asyncio.run(run_benchmark(*create_asset(tmp_path)))
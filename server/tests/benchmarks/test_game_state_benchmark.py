@@ -0,0 +1,104 @@
+"""
+Fan-out lookups on the indexed game state with 1,000 connected clients across 100 rooms.
+
+Run with `python -m pytest tests/benchmarks -s` to see the timings.
+"""
+import asyncio
+import time
+from typing import Dict, List, Tuple
+
+from src.models import PlayerRoom, User, UserOptions
+from src.models.role import Role
+from src.state.game import game_state
+
+from helpers import Emit, World, connect, create_world
+
+ROOMS = 100
+CLIENTS_PER_ROOM = 10
+
+
+def scan_sids(**options) -> List[str]:
+    """The unindexed lookup: compares every connected sid."""
+    return [
+        sid
+        for sid in list(game_state._sid_map)
+        if all(
+            getattr(game_state.get(sid), option, None) == value
+            for option, value in options.items()
+        )
+    ]
+
+
+async def connect_rooms() -> Tuple[List[World], List[str]]:
+    worlds: List[World] = []
+    sids: List[str] = []
+    for _ in range(ROOMS):
+        world = create_world(2)
+        worlds.append(world)
+        sids.append(await connect(world.dm, world.room))
+        sids.append(await connect(world.player, world.room))
+        for i in range(CLIENTS_PER_ROOM - 2):
+            user = User.create(
+                name=f"{world.player.name}-{i}",
+                password_hash="x",
+                default_options=UserOptions.create(),
+            )
+            PlayerRoom.create(
+                player=user,
+                room=world.room,
+                role=Role.PLAYER,
+                active_location=world.location,
+            )
+            sids.append(await connect(user, world.room))
+    return worlds, sids
+
+
+def fan_out(worlds: List[World], lookup) -> Tuple[float, Dict[int, List[str]]]:
+    """Resolves the sids of every player in every room, like most handlers do."""
+    players = {
+        world.room.id: [room_player.player for room_player in world.room.players]
+        for world in worlds
+    }
+    found: Dict[int, List[str]] = {}
+    start = time.perf_counter()
+    for world in worlds:
+        found[world.room.id] = [
+            psid
+            for player in players[world.room.id]
+            for psid in lookup(player=player, active_location=world.location)
+        ]
+    return time.perf_counter() - start, found
+
+
+async def run_benchmark() -> None:
+    worlds, sids = await connect_rooms()
+    try:
+        assert len(list(game_state.get_sids())) >= ROOMS * CLIENTS_PER_ROOM
+
+        indexed, indexed_found = fan_out(
+            worlds, lambda **options: list(game_state.get_sids(**options))
+        )
+        scanned, scanned_found = fan_out(worlds, scan_sids)
+
+        assert indexed_found == scanned_found
+        assert all(len(found) == CLIENTS_PER_ROOM for found in indexed_found.values())
+        assert indexed < scanned
+
+        start = time.perf_counter()
+        for world in worlds:
+            assert len(list(game_state.get_sids(room=world.room))) == CLIENTS_PER_ROOM
+        by_room = time.perf_counter() - start
+
+        print(
+            f"\n{len(sids)} clients in {ROOMS} rooms:"
+            f" player fan-out {indexed * 1000:.1f} ms indexed,"
+            f" {scanned * 1000:.1f} ms scanning all sids;"
+            f" room lookup {by_room / ROOMS * 1e6:.1f} µs per room"
+        )
+    finally:
+        for sid in sids:
+            await game_state.remove_sid(sid)
+
+
+def test_game_state_fan_out(emitted: List[Emit]):
+    asyncio.run(run_benchmark())
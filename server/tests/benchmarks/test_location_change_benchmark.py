@@ -0,0 +1,64 @@
+"""
+Location.Change latency for a growing number of moved players.
+
+Run with `python -m pytest tests/benchmarks -s` to see the timings.
+"""
+import asyncio
+import time
+from typing import List
+
+import pytest
+
+from src.api.socket.location import change_location
+from src.models import Floor, Location, PlayerRoom, User, UserOptions
+from src.models.role import Role
+from src.state.board import board_cache
+
+from helpers import Emit, connect, create_world
+
+
+async def move_players(players: int, emitted: List[Emit]) -> None:
+    world = create_world(50)
+    target = Location.create(room=world.room, name="target", index=2)
+    # The target gets the populated floors, the start location an empty one
+    Floor.update(location=target).where(Floor.location == world.location).execute()
+    world.location.create_floor()
+
+    dm_sid = await connect(world.dm, world.room)
+    names = []
+    for i in range(players):
+        user = User.create(
+            name=f"{world.player.name}-{i}",
+            password_hash="x",
+            default_options=UserOptions.create(),
+        )
+        PlayerRoom.create(
+            player=user,
+            room=world.room,
+            role=Role.PLAYER,
+            active_location=world.location,
+        )
+        await connect(user, world.room)
+        names.append(user.name)
+
+    misses = board_cache.misses
+    start = time.perf_counter()
+    await change_location(
+        dm_sid, {"location": target.id, "users": names, "position": {"x": 0, "y": 0}}
+    )
+    elapsed = time.perf_counter() - start
+    serializations = board_cache.misses - misses
+
+    # Every player received the new location
+    assert len([e for e in emitted if e.event == "Location.Set"]) == players
+    # Players without shapes share a visibility class, so every floor is serialized once
+    assert serializations == 2
+    print(
+        f"\n{players:>3} players: {elapsed * 1000:7.1f} ms,"
+        f" {elapsed / players * 1000:6.2f} ms per player, {serializations} serializations"
+    )
+
+
+@pytest.mark.parametrize("players", [1, 4, 16, 64])
+def test_location_change_latency(players: int, emitted: List[Emit]):
+    asyncio.run(move_players(players, emitted))
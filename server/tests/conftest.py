@@ -0,0 +1,51 @@
+"""
+The tests run against a temporary save file.
+
+The database is set up before anything else is imported,
+as some modules (e.g. src.app) already query it at import time.
+The save is shared by all tests, every test creates its own world (see helpers.create_world).
+"""
+import shutil
+import tempfile
+from pathlib import Path
+from typing import List
+
+import pytest
+import socketio
+
+from src.models.db import PRAGMAS, db
+
+TEST_DIR = Path(tempfile.mkdtemp(prefix="planarally-tests-"))
+db.init(str(TEST_DIR / "planar.sqlite"), pragmas=PRAGMAS)
+
+from src.save import SAVE_VERSION, create_new_db  # noqa: E402
+
+create_new_db(db, SAVE_VERSION)
+
+from src.api.socket import load_socket_commands  # noqa: E402
+
+from helpers import Emit, World, create_world  # noqa: E402
+
+load_socket_commands()
+
+
+def pytest_sessionfinish():
+    db.close()
+    shutil.rmtree(TEST_DIR, ignore_errors=True)
+
+
+@pytest.fixture
+def world() -> World:
+    return create_world()
+
+
+@pytest.fixture
+def emitted(monkeypatch) -> List[Emit]:
+    """Records the socket.io messages instead of sending them."""
+    messages: List[Emit] = []
+
+    async def emit(self, event, data=None, to=None, room=None, **kwargs):
+        messages.append(Emit(event, data, to or room))
+
+    monkeypatch.setattr(socketio.AsyncServer, "emit", emit)
+    return messages
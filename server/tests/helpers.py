@@ -0,0 +1,217 @@
+"""Shared helpers for the tests, see conftest.py for the setup of the database."""
+import json
+import logging
+from contextlib import contextmanager
+from typing import Any, Iterator, List, NamedTuple, Optional, Tuple
+from uuid import uuid4
+
+from src.api.socket.constants import GAME_NS
+from src.app import sio
+from src.models import (
+    Aura,
+    Layer,
+    Location,
+    LocationOptions,
+    PlayerRoom,
+    Room,
+    Shape,
+    ShapeLabel,
+    ShapeOwner,
+    Tracker,
+    User,
+    UserOptions,
+)
+from src.models.groups import Group
+from src.models.label import Label
+from src.models.role import Role
+from src.models.shape import CompositeShapeAssociation, ToggleComposite
+from src.models.db import db
+from src.models.utils import get_table
+from src.state.game import game_state
+
+SHAPE_TYPES = [
+    "rect",
+    "circle",
+    "assetrect",
+    "polygon",
+    "text",
+    "circulartoken",
+    "line",
+]
+
+
+class Emit(NamedTuple):
+    event: str
+    data: Any
+    room: Optional[str]
+
+
+class World(NamedTuple):
+    dm: User
+    player: User
+    room: Room
+    location: Location
+
+
+def create_world(shapes_per_layer: int = 10) -> World:
+    """
+    Creates a room with a DM, a player and a location with two floors.
+
+    The map, tokens and dm layers of both floors get `shapes_per_layer` shapes of all types,
+    some of them with owners, trackers, auras, labels and groups.
+    """
+    suffix = uuid4().hex[:8]
+    with db.atomic():
+        dm = User.create(
+            name=f"dm-{suffix}", password_hash="x", default_options=UserOptions.create()
+        )
+        player = User.create(
+            name=f"player-{suffix}",
+            password_hash="x",
+            default_options=UserOptions.create(),
+        )
+        room = Room.create(
+            name="room", creator=dm, default_options=LocationOptions.create()
+        )
+        location = Location.create(room=room, name="start", index=1)
+        floors = [location.create_floor(), location.create_floor("upper")]
+        PlayerRoom.create(player=dm, room=room, role=Role.DM, active_location=location)
+        PlayerRoom.create(
+            player=player, room=room, role=Role.PLAYER, active_location=location
+        )
+
+        group = Group.create(uuid=str(uuid4()))
+        labels = [
+            Label.create(uuid=str(uuid4()), user=dm, name="visible", visible=True),
+            Label.create(uuid=str(uuid4()), user=dm, name="hidden", visible=False),
+        ]
+
+        shapes: List[Shape] = []
+        for floor in floors:
+            for layer in floor.layers.where(Layer.name << ["map", "tokens", "dm"]):
+                for i in range(shapes_per_layer):
+                    shapes.append(_create_shape(layer, i, group, labels, player))
+
+        tokens = floors[0].layers.where(Layer.name == "tokens").get()
+        composite = Shape.create(
+            uuid=str(uuid4()),
+            layer=tokens,
+            type_="togglecomposite",
+            x=0,
+            y=0,
+            index=len(shapes) + 1,
+        )
+        ToggleComposite.create(shape=composite, active_variant=shapes[0].uuid)
+        for i, variant in enumerate(shapes[:2]):
+            CompositeShapeAssociation.create(
+                parent=composite, variant=variant, name=f"v{i}"
+            )
+    return World(dm, player, room, location)
+
+
+def _create_shape(
+    layer: Layer, i: int, group: Group, labels: List[Label], player: User
+) -> Shape:
+    type_ = SHAPE_TYPES[i % len(SHAPE_TYPES)]
+    shape = Shape.create(
+        uuid=str(uuid4()),
+        layer=layer,
+        type_=type_,
+        x=i * 50,
+        y=(i % 10) * 50,
+        index=i,
+        name=f"shape {i}",
+        options=json.dumps({"key": i}),
+        group=group if i % 5 == 0 else None,
+        annotation="note" if i % 3 == 0 else "",
+        name_visible=i % 2 == 0,
+    )
+
+    if type_ in ("rect", "assetrect"):
+        subtype = {"width": 50, "height": 60}
+        if type_ == "assetrect":
+            subtype["src"] = "/static/assets/hash"
+    elif type_ in ("circle", "circulartoken"):
+        subtype = {"radius": 25}
+        if type_ == "circulartoken":
+            subtype.update(text="t", font="f")
+    elif type_ == "polygon":
+        subtype = {
+            "vertices": json.dumps([[1, 2], [3, 4]]),
+            "line_width": 2,
+            "open_polygon": False,
+        }
+    elif type_ == "text":
+        subtype = {"text": "text", "font_size": 12}
+    else:
+        subtype = {"x2": shape.x + 100, "y2": shape.y + 10, "line_width": 3}
+    get_table(type_).create(shape=shape, **subtype)
+
+    if i % 4 == 0:
+        ShapeOwner.create(
+            shape=shape,
+            user=player,
+            edit_access=True,
+            vision_access=True,
+            movement_access=True,
+        )
+    if i % 3 == 0:
+        Tracker.create(
+            uuid=str(uuid4()),
+            shape=shape,
+            visible=i % 2 == 0,
+            name="hp",
+            value=1,
+            maxvalue=2,
+            draw=True,
+            primary_color="red",
+            secondary_color="black",
+        )
+        Aura.create(
+            uuid=str(uuid4()),
+            shape=shape,
+            vision_source=False,
+            visible=i % 2 == 1,
+            name="light",
+            value=1,
+            dim=0,
+            colour="yellow",
+            active=True,
+            border_colour="black",
+            angle=360,
+            direction=0,
+        )
+    if i % 7 == 0:
+        ShapeLabel.create(shape=shape, label=labels[i % 2])
+    return shape
+
+
+class _QueryHandler(logging.Handler):
+    def __init__(self) -> None:
+        super().__init__(logging.DEBUG)
+        self.queries: List[Tuple[str, Any]] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.queries.append(record.msg)
+
+
+@contextmanager
+def log_queries() -> Iterator[List[Tuple[str, Any]]]:
+    """Collects the (sql, params) of every query that peewee executes in the block."""
+    handler = _QueryHandler()
+    logger = logging.getLogger("peewee")
+    level = logger.level
+    logger.addHandler(handler)
+    logger.setLevel(logging.DEBUG)
+    try:
+        yield handler.queries
+    finally:
+        logger.removeHandler(handler)
+        logger.setLevel(level)
+
+
+async def connect(user: User, room: Room) -> str:
+    """Registers a game connection of the user without an actual client, returns its sid."""
+    sid = sio.manager.connect(uuid4().hex, GAME_NS)
+    await game_state.add_sid(sid, PlayerRoom.get(player=user, room=room))
+    return sid
@@ -0,0 +1,267 @@
+"""
+Runs the server with two workers (see src/cluster) and connects a client to each of them.
+
+The server is started from a copy of the server directory,
+as the config and the save are looked up relative to the source.
+"""
+import asyncio
+import configparser
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Iterable, Iterator, List, NamedTuple
+
+import aiohttp
+import pytest
+import socketio
+
+from src.api.socket.constants import ASSET_NS, GAME_NS
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+
+SETUP = """
+from uuid import uuid4
+
+from src import planarserver  # noqa: F401 (creates the save)
+from src.models import (
+    Constants, Layer, Location, LocationOptions, PlayerRoom, Rect, Room, Shape, User, UserOptions
+)
+from src.models.db import db
+from src.models.role import Role
+
+with db.atomic():
+    users = []
+    for name in ("dm", "player"):
+        user = User.create(name=name, password_hash="", default_options=UserOptions.create())
+        user.set_password("pw")
+        user.save()
+        users.append(user)
+    room = Room.create(name="room", creator=users[0], default_options=LocationOptions.create())
+    location = Location.create(room=room, name="start", index=1)
+    floor = location.create_floor()
+    PlayerRoom.create(player=users[0], room=room, role=Role.DM, active_location=location)
+    PlayerRoom.create(player=users[1], room=room, role=Role.PLAYER, active_location=location)
+    shape = Shape.create(
+        uuid=str(uuid4()), layer=floor.layers.where(Layer.name == "tokens").get(),
+        type_="rect", x=0, y=0, index=0,
+    )
+    Rect.create(shape=shape, width=50, height=50)
+print(shape.uuid, Constants.get().api_token)
+"""
+
+
+class Cluster(NamedTuple):
+    url: str
+    api_url: str
+    worker_sockets: List[str]
+    shape: str
+    api_token: str
+
+
+def get_free_port() -> int:
+    with closing(socket.socket()) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def write_config(directory: Path, port: int, api_port: int) -> None:
+    config = configparser.ConfigParser()
+    config.read(SERVER_DIR / "server_config.cfg")
+    config["Webserver"].update(host="127.0.0.1", port=str(port), workers="2")
+    config["APIserver"].update(enabled="true", host="127.0.0.1", port=str(api_port))
+    with open(directory / "server_config.cfg", "w") as f:
+        config.write(f)
+
+
+@pytest.fixture
+def cluster(tmp_path: Path) -> Iterator[Cluster]:
+    directory = tmp_path / "server"
+    shutil.copytree(
+        SERVER_DIR / "src",
+        directory / "src",
+        ignore=shutil.ignore_patterns("__pycache__"),
+    )
+    for name in ("planarally.py", "VERSION"):
+        shutil.copy(SERVER_DIR / name, directory / name)
+    (directory / "static").mkdir()
+    port, api_port = get_free_port(), get_free_port()
+    write_config(directory, port, api_port)
+
+    shape, api_token = subprocess.run(
+        [sys.executable, "-c", SETUP],
+        cwd=directory,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout.split()[-2:]
+
+    # Unix socket paths are limited in length, so the sockets are not placed in tmp_path
+    socket_dir = tempfile.mkdtemp(prefix="pa-")
+    process = subprocess.Popen(
+        [sys.executable, "planarally.py"],
+        cwd=directory,
+        env={**os.environ, "TMPDIR": socket_dir},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    try:
+        worker_sockets = wait_for_workers(socket_dir, port)
+        yield Cluster(
+            f"http://127.0.0.1:{port}",
+            f"http://127.0.0.1:{api_port}",
+            worker_sockets,
+            shape,
+            api_token,
+        )
+    finally:
+        os.killpg(process.pid, signal.SIGINT)
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+        shutil.rmtree(socket_dir, ignore_errors=True)
+
+
+def wait_for_workers(socket_dir: str, port: int) -> List[str]:
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        sockets = sorted(str(s) for s in Path(socket_dir).glob("*/worker-*.sock"))
+        if len(sockets) == 2:
+            try:
+                with socket.create_connection(("127.0.0.1", port), timeout=1):
+                    return sockets
+            except OSError:
+                pass
+        time.sleep(0.2)
+    raise TimeoutError("The cluster did not start")
+
+
+async def login(cluster: Cluster, name: str) -> str:
+    async with aiohttp.ClientSession() as session:
+        response = await session.post(
+            f"{cluster.url}/api/login", json={"username": name, "password": "pw"}
+        )
+        assert response.status == 200
+        return "; ".join(f"{k}={v.value}" for k, v in response.cookies.items())
+
+
+async def connect_to_worker(
+    cluster: Cluster,
+    worker: int,
+    name: str,
+    received: List[str],
+    *,
+    namespace: str = GAME_NS,
+    events: Iterable[str] = ("Shapes.Position.Update",),
+) -> socketio.AsyncClient:
+    """Connects to the socket of a worker directly, bypassing the router."""
+    session = aiohttp.ClientSession(
+        connector=aiohttp.UnixConnector(path=cluster.worker_sockets[worker])
+    )
+    client = socketio.AsyncClient(http_session=session)
+    for event in events:
+        client.on(
+            event,
+            lambda data, event=event: received.append(event),
+            namespace=namespace,
+        )
+    await client.connect(
+        "http://worker/?user=dm&room=room",
+        headers={"Cookie": await login(cluster, name)},
+        namespaces=[namespace],
+        transports=["polling"],
+    )
+    assert client.eio.sid.startswith(f"w{worker}.")
+    return client
+
+
+async def broadcast_between_workers(cluster: Cluster) -> List[str]:
+    received: List[str] = []
+    dm = await connect_to_worker(cluster, 0, "dm", [])
+    player = await connect_to_worker(cluster, 1, "player", received)
+    try:
+        # Both workers have to know about both connections
+        await asyncio.sleep(1)
+        await dm.emit(
+            "Shapes.Position.Update",
+            {
+                "shapes": [
+                    {
+                        "uuid": cluster.shape,
+                        "position": {"angle": 0, "points": [[10.0, 20.0]]},
+                    }
+                ],
+                "temporary": False,
+            },
+            namespace=GAME_NS,
+        )
+        return await wait_for_events(received)
+    finally:
+        await disconnect(dm, player)
+
+
+async def update_assets_on_other_worker(cluster: Cluster) -> List[str]:
+    received: List[str] = []
+    assets = await connect_to_worker(cluster, 0, "dm", [], namespace=ASSET_NS)
+    game = await connect_to_worker(
+        cluster, 1, "dm", received, events=("Asset.List.Set", "Asset.List.Patch")
+    )
+    try:
+        await asyncio.sleep(1)
+        await assets.emit("Folder.Create", {"name": "maps"}, namespace=ASSET_NS)
+        return await wait_for_events(received)
+    finally:
+        await disconnect(assets, game)
+
+
+async def wait_for_events(received: List[str]) -> List[str]:
+    for _ in range(50):
+        if received:
+            # Give duplicates the time to arrive as well
+            await asyncio.sleep(0.5)
+            break
+        await asyncio.sleep(0.1)
+    return received
+
+
+async def disconnect(*clients: socketio.AsyncClient) -> None:
+    for client in clients:
+        await client.disconnect()
+        await client.eio.http.close()
+
+
+async def get_stats(cluster: Cluster):
+    async with aiohttp.ClientSession() as session:
+        # aiohttp 3.8 fails to resolve sub-app routes for hosts with a port on recent yarl versions
+        response = await session.get(
+            f"{cluster.api_url}/api/stats",
+            headers={
+                "Authorization": f"Bearer {cluster.api_token}",
+                "Host": "127.0.0.1",
+            },
+        )
+        assert response.status == 200
+        return await response.json()
+
+
+def test_broadcast_reaches_other_worker(cluster: Cluster):
+    assert asyncio.run(broadcast_between_workers(cluster)) == ["Shapes.Position.Update"]
+
+
+def test_asset_update_reaches_other_worker(cluster: Cluster):
+    # Exactly once, the first worker does not relay its own update to the client
+    assert asyncio.run(update_assets_on_other_worker(cluster)) == ["Asset.List.Set"]
+
+
+def test_stats_of_all_workers(cluster: Cluster):
+    stats = asyncio.run(get_stats(cluster))
+    assert set(stats["workers"]) == {"0", "1"}
+    assert all("serialization" in worker for worker in stats["workers"].values())
@@ -0,0 +1,112 @@
+import asyncio
+from typing import List
+
+from src.api.socket.initiative import (
+    add_initiative,
+    change_initiative_order,
+    set_initiative_sort,
+    set_initiative_value,
+)
+from src.models import Floor, Initiative, InitiativeEntry, Layer, Shape
+
+from helpers import Emit, World, connect, log_queries
+
+
+def get_tokens(world: World) -> List[str]:
+    return [
+        shape.uuid
+        for shape in Shape.select()
+        .join(Layer)
+        .join(Floor)
+        .where(
+            Floor.location == world.location,
+            Floor.name == "ground",
+            Layer.name == "tokens",
+        )
+        .order_by(Shape.index)
+    ]
+
+
+async def add_entries(sid: str, uuids: List[str]) -> None:
+    for i, uuid in enumerate(uuids):
+        await add_initiative(
+            sid,
+            {
+                "shape": uuid,
+                "initiative": i,
+                "isVisible": True,
+                "isGroup": False,
+                "effects": [],
+            },
+        )
+    # Manual order, the entries stay in the order in which they were added
+    await set_initiative_sort(sid, 2)
+
+
+def get_order(world: World) -> List[str]:
+    return [
+        entry.shape_id
+        for entry in Initiative.get(location=world.location).get_entries()
+    ]
+
+
+def count_entry_updates(queries) -> int:
+    return sum(1 for sql, _ in queries if sql.startswith('UPDATE "initiative_entry"'))
+
+
+def test_value_change_sends_a_patch(world: World, emitted: List[Emit]):
+    uuids = get_tokens(world)[:3]
+
+    async def change_value():
+        sid = await connect(world.dm, world.room)
+        await add_entries(sid, uuids)
+        emitted.clear()
+        await set_initiative_value(sid, {"shape": uuids[1], "value": 20})
+
+    asyncio.run(change_value())
+
+    assert [e.event for e in emitted] == ["Initiative.Entry.Patch"]
+    assert emitted[0].data == {"entries": [{"shape": uuids[1], "initiative": 20}]}
+    assert get_order(world) == uuids
+
+
+def test_order_change_updates_a_single_entry(world: World, emitted: List[Emit]):
+    uuids = get_tokens(world)[:5]
+
+    async def move():
+        sid = await connect(world.dm, world.room)
+        await add_entries(sid, uuids)
+        emitted.clear()
+        with log_queries() as queries:
+            await change_initiative_order(
+                sid, {"shape": uuids[4], "oldIndex": 4, "newIndex": 1}
+            )
+        return queries
+
+    queries = asyncio.run(move())
+
+    order = [uuids[0], uuids[4], *uuids[1:4]]
+    assert get_order(world) == order
+    assert count_entry_updates(queries) == 1
+    patch = next(e for e in emitted if e.event == "Initiative.Entry.Patch")
+    assert patch.data["order"] == order
+
+
+def test_order_change_between_adjacent_entries(world: World, emitted: List[Emit]):
+    uuids = get_tokens(world)[:4]
+
+    async def move():
+        sid = await connect(world.dm, world.room)
+        await add_entries(sid, uuids)
+        # Saves of older versions can have adjacent ordering keys
+        for i, uuid in enumerate(uuids):
+            InitiativeEntry.update(index=i).where(
+                InitiativeEntry.shape == uuid
+            ).execute()
+        await change_initiative_order(
+            sid, {"shape": uuids[0], "oldIndex": 0, "newIndex": 2}
+        )
+
+    asyncio.run(move())
+
+    assert get_order(world) == [uuids[1], uuids[2], uuids[0], uuids[3]]
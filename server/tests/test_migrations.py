@@ -0,0 +1,155 @@
+"""
+Runs single save migrations against a separate save, created with the current models
+and filled with data in the format that the migration expects.
+"""
+import json
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+import pytest
+from playhouse.sqlite_ext import SqliteExtDatabase
+
+from src.models import (
+    ALL_MODELS,
+    Initiative,
+    InitiativeEntry,
+    Layer,
+    Location,
+    LocationOptions,
+    Room,
+    Shape,
+    User,
+    UserOptions,
+)
+from src.models.db import PRAGMAS
+from src.save import create_new_db, get_save_version, upgrade
+
+
+@pytest.fixture
+def old_db(tmp_path: Path) -> Iterator[SqliteExtDatabase]:
+    old_db = SqliteExtDatabase(str(tmp_path / "old.sqlite"), pragmas=PRAGMAS)
+    with old_db.bind_ctx(ALL_MODELS):
+        yield old_db
+    old_db.close()
+
+
+def create_location(old_db: SqliteExtDatabase, version: int) -> Location:
+    create_new_db(old_db, version)
+    user = User.create(
+        name="dm", password_hash="x", default_options=UserOptions.create()
+    )
+    room = Room.create(
+        name="room", creator=user, default_options=LocationOptions.create()
+    )
+    location = Location.create(room=room, name="start", index=1)
+    location.create_floor()
+    location.create_floor("upper")
+    return location
+
+
+def get_shape_order(old_db: SqliteExtDatabase) -> List[Tuple[int, str, int]]:
+    return old_db.execute_sql(
+        'SELECT layer_id, uuid, "index" FROM shape ORDER BY layer_id, "index", uuid'
+    ).fetchall()
+
+
+def test_sparse_shape_index(old_db: SqliteExtDatabase):
+    create_location(old_db, 85)
+    layers = [layer.id for layer in Layer.select().where(Layer.name << ["map", "dm"])]
+    # The old index is a position, with gaps left by removals and duplicates of broken saves
+    old_indices = [3, 0, 7, 7, 1]
+    for layer_id in layers:
+        for i, index in enumerate(old_indices):
+            Shape.create(
+                uuid=f"{layer_id}-{i}",
+                layer=layer_id,
+                type_="rect",
+                x=0,
+                y=0,
+                index=index,
+            )
+    before = [(layer, uuid) for layer, uuid, _ in get_shape_order(old_db)]
+
+    upgrade(old_db, 85)
+
+    after = get_shape_order(old_db)
+    assert get_save_version(old_db) == 86
+    assert [(layer, uuid) for layer, uuid, _ in after] == before
+    for layer_id in layers:
+        assert [index for layer, _, index in after if layer == layer_id] == [
+            rank * 1024 for rank in range(len(old_indices))
+        ]
+
+
+def test_initiative_entries(old_db: SqliteExtDatabase):
+    location = create_location(old_db, 88)
+    layer = Layer.select().where(Layer.name == "tokens").first()
+    for i in range(4):
+        Shape.create(uuid=f"s{i}", layer=layer, type_="rect", x=0, y=0, index=i)
+    data = [
+        {"shape": "s2", "initiative": 15, "isVisible": True, "isGroup": False},
+        # removed shape
+        {"shape": "gone", "initiative": 12, "isVisible": True, "isGroup": False},
+        {
+            "shape": "s0",
+            "initiative": None,
+            "isVisible": False,
+            "isGroup": True,
+            "effects": [
+                {"name": "blessed", "turns": 3, "highlightsActor": True},
+                {"name": "prone", "turns": "-"},
+            ],
+        },
+        # duplicate
+        {"shape": "s2", "initiative": 1, "isVisible": True, "isGroup": False},
+        {"shape": "s3", "initiative": 5, "isVisible": True, "isGroup": False},
+    ]
+    # The initiative before version 88 stores its entries as json
+    old_db.execute_sql("DROP TABLE initiative")
+    old_db.execute_sql(
+        'CREATE TABLE "initiative" ("id" INTEGER NOT NULL PRIMARY KEY,'
+        ' "location_id" INTEGER NOT NULL, "round" INTEGER NOT NULL, "turn" INTEGER NOT NULL,'
+        ' "sort" INTEGER NOT NULL, "data" TEXT NOT NULL, "is_active" INTEGER NOT NULL)'
+    )
+    old_db.execute_sql(
+        'INSERT INTO "initiative" VALUES (1, ?, 3, 2, 2, ?, 1)',
+        (location.id, json.dumps(data)),
+    )
+
+    upgrade(old_db, 88)
+
+    assert get_save_version(old_db) == 89
+    initiative = Initiative.get_by_id(1)
+    # It is still the turn of s0
+    assert (initiative.round, initiative.turn, initiative.sort) == (3, 1, 2)
+    assert initiative.is_active
+    entries = initiative.get_entries()
+    assert [entry.shape_id for entry in entries] == ["s2", "s0", "s3"]
+    assert [entry.index for entry in entries] == [0, 1024, 2048]
+    assert initiative.as_dict()["data"] == [
+        {
+            "shape": "s2",
+            "initiative": 15,
+            "isVisible": True,
+            "isGroup": False,
+            "effects": [],
+        },
+        {
+            "shape": "s0",
+            "initiative": None,
+            "isVisible": False,
+            "isGroup": True,
+            "effects": [
+                {"name": "blessed", "turns": "3", "highlightsActor": True},
+                {"name": "prone", "turns": "-", "highlightsActor": False},
+            ],
+        },
+        {
+            "shape": "s3",
+            "initiative": 5,
+            "isVisible": True,
+            "isGroup": False,
+            "effects": [],
+        },
+    ]
+    assert InitiativeEntry.select().count() == 3
@@ -0,0 +1,105 @@
+import asyncio
+from typing import List
+
+from src.api.socket.shape import get_shape_info, update_shape_options
+from src.cluster import cluster
+from src.db_executor import db_executor
+from src.models import Floor, Layer, Shape
+from src.state.positions import get_flush_interval, position_buffer
+
+from helpers import Emit, World, connect
+
+
+def get_token(world: World) -> Shape:
+    return (
+        Shape.select()
+        .join(Layer)
+        .join(Floor)
+        .where(Floor.location == world.location, Shape.type_ == "rect")
+        .get()
+    )
+
+
+async def move_and_get_info(world: World, shape: Shape):
+    sid = await connect(world.dm, world.room)
+    position_buffer.add(shape, [[1234.0, 5678.0]], 90)
+    await get_shape_info(sid, shape.uuid)
+    position_buffer.flush()
+
+
+def test_shape_info_contains_buffered_position(world: World, emitted: List[Emit]):
+    old_interval = position_buffer.interval
+    position_buffer.interval = 60
+    try:
+        shape = get_token(world)
+        asyncio.run(move_and_get_info(world, shape))
+    finally:
+        position_buffer.interval = old_interval
+
+    info = next(e for e in emitted if e.event == "Shape.Info")
+    assert (info.data["shape"]["x"], info.data["shape"]["y"]) == (1234.0, 5678.0)
+    assert info.data["shape"]["angle"] == 90
+
+
+def test_explicit_write_wins_over_buffered_position(world: World):
+    old_interval = position_buffer.interval
+    position_buffer.interval = 60
+    shape = get_token(world)
+
+    async def move_and_save():
+        position_buffer.add(shape, [[1234.0, 5678.0]], 90)
+        db_shape = Shape.get_by_id(shape.uuid)
+        db_shape.x = 10.0
+        db_shape.y = 20.0
+        db_shape.save()
+        position_buffer.flush()
+
+    try:
+        asyncio.run(move_and_save())
+    finally:
+        position_buffer.interval = old_interval
+
+    db_shape = Shape.get_by_id(shape.uuid)
+    assert (db_shape.x, db_shape.y) == (10.0, 20.0)
+
+
+def test_option_change_keeps_flushed_position(
+    world: World, emitted: List[Emit], monkeypatch
+):
+    old_interval = position_buffer.interval
+    position_buffer.interval = 60
+    shape = get_token(world)
+
+    write = db_executor.write
+
+    async def flush_then_write(fn, *args, **kwargs):
+        # The buffer is flushed while the handler waits for its ownership check
+        position_buffer.flush()
+        return await write(fn, *args, **kwargs)
+
+    monkeypatch.setattr(db_executor, "write", flush_then_write)
+
+    async def move_and_change_option():
+        sid = await connect(world.dm, world.room)
+        position_buffer.add(shape, [[1234.0, 5678.0]], 90)
+        await update_shape_options(
+            sid,
+            {
+                "options": [{"uuid": shape.uuid, "option": '{"skipDraw": true}'}],
+                "temporary": False,
+            },
+        )
+
+    try:
+        asyncio.run(move_and_change_option())
+    finally:
+        position_buffer.interval = old_interval
+
+    db_shape = Shape.get_by_id(shape.uuid)
+    assert (db_shape.x, db_shape.y, db_shape.angle) == (1234.0, 5678.0, 90)
+    assert db_shape.options == '{"skipDraw": true}'
+
+
+def test_positions_are_written_immediately_with_multiple_workers(monkeypatch):
+    monkeypatch.setattr(cluster, "worker_id", 0)
+    assert get_flush_interval() == 0
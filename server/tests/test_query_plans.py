@@ -0,0 +1,150 @@
+"""
+Checks the query plans of the hot queries against a synthetic save.
+
+Every query that a hot path executes is run again with EXPLAIN QUERY PLAN,
+none of them may scan a full table without using an index.
+"""
+import asyncio
+import re
+from typing import Any, Callable, List, Tuple
+from uuid import uuid4
+
+import pytest
+
+from src.api.socket.initiative import get_initiative_data, update_initiative
+from src.api.socket.location import get_connection_state, prepare_location_load
+from src.models import (
+    Asset,
+    Floor,
+    Initiative,
+    InitiativeEntry,
+    Layer,
+    PlayerRoom,
+    Shape,
+    User,
+)
+from src.models.db import db
+from src.models.shape.access import has_ownership_many
+from src.state.asset import asset_tree_cache
+from src.state.game import game_state
+
+from helpers import World, connect, create_world, log_queries
+
+# A full table scan is reported as `SCAN <table or alias>`,
+# a scan of an index as `SCAN <table> USING ... INDEX` and a subquery as `SCAN (subquery-1)`
+FULL_SCAN = re.compile(r"^SCAN (?!CONSTANT ROW)\w+$")
+
+# Statements without a query plan
+SKIPPED = ("BEGIN", "COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE", "PRAGMA", "INSERT")
+
+
+def get_full_scans(queries: List[Tuple[str, Any]]) -> List[Tuple[str, str]]:
+    scans = []
+    for sql, params in queries:
+        if sql.lstrip().upper().startswith(SKIPPED):
+            continue
+        for *_, detail in db.execute_sql(f"EXPLAIN QUERY PLAN {sql}", params):
+            if FULL_SCAN.match(detail):
+                scans.append((detail, sql))
+    return scans
+
+
+@pytest.fixture(scope="module")
+def big_world() -> World:
+    world = create_world(70)
+    with db.atomic():
+        root = Asset.get_root_folder(world.dm)
+        for i in range(20):
+            folder = Asset.create(name=f"folder {i}", owner=world.dm, parent=root)
+            for j in range(10):
+                Asset.create(
+                    name=f"file {j}",
+                    owner=world.dm,
+                    parent=folder,
+                    file_hash=uuid4().hex,
+                )
+
+        initiative = Initiative.create(location=world.location, round=0, turn=0)
+        for i, shape in enumerate(get_shapes(world)[:30]):
+            InitiativeEntry.create(initiative=initiative, shape=shape, index=i)
+    return world
+
+
+def get_shapes(world: World) -> List[Shape]:
+    return list(
+        Shape.select()
+        .join(Layer)
+        .join(Floor)
+        .where(Floor.location == world.location)
+        .order_by(Shape.index)
+    )
+
+
+def load_location(world: World, user: User):
+    sid = asyncio.run(connect(user, world.room))
+    pr = PlayerRoom.get(player=user, room=world.room)
+    return lambda: prepare_location_load(
+        sid,
+        pr,
+        world.location,
+        get_connection_state(sid, pr),
+        complete=True,
+        progressive=True,
+    )
+
+
+def check_ownership(world: World, user: User):
+    sid = asyncio.run(connect(user, world.room))
+    uuids = [shape.uuid for shape in get_shapes(world)]
+    return lambda: has_ownership_many(uuids, game_state.get_session(sid))
+
+
+def load_asset_structure(world: World, user: User):
+    return lambda: Asset.get_user_structure(world.dm)
+
+
+def load_initiative(world: World, user: User):
+    uuids = [shape.uuid for shape in get_shapes(world)[:5]]
+    return lambda: get_initiative_data(world.location, uuids)
+
+
+def patch_initiative(world: World, user: User):
+    pr = PlayerRoom.get(player=user, room=world.room)
+    shape = get_shapes(world)[0]
+
+    def update(location_data: Initiative, patch):
+        entry = InitiativeEntry.get(
+            InitiativeEntry.initiative == location_data,
+            InitiativeEntry.shape == shape.uuid,
+        )
+        entry.value = 5
+        entry.save()
+
+    return lambda: asyncio.run(update_initiative(pr, update))
+
+
+def patch_option(world: World, user: User):
+    shape = get_shapes(world)[0]
+    return lambda: Shape.set_option(shape.uuid, ["door", "permissions"], ["dm"])
+
+
+HOT_PATHS: List[Callable[[World, User], Callable[[], Any]]] = [
+    load_location,
+    check_ownership,
+    load_asset_structure,
+    load_initiative,
+    patch_initiative,
+    patch_option,
+]
+
+
+@pytest.mark.parametrize("dm", [True, False], ids=["dm", "player"])
+@pytest.mark.parametrize("path", HOT_PATHS, ids=lambda path: path.__name__)
+def test_no_full_table_scans(big_world: World, path, dm: bool):
+    run = path(big_world, big_world.dm if dm else big_world.player)
+    asset_tree_cache.invalidate(big_world.dm.id)
+    with log_queries() as queries:
+        run()
+
+    assert len(queries) > 0
+    assert get_full_scans(queries) == []
@@ -0,0 +1,40 @@
+import pytest
+
+from src.models import Floor, Layer, Shape
+from src.models.shape.bulk import shapes_as_dict
+
+from helpers import SHAPE_TYPES, World, create_world, log_queries
+
+
+def get_shapes(world: World):
+    return list(
+        Shape.select()
+        .join(Layer)
+        .join(Floor)
+        .where(Floor.location == world.location)
+        .order_by(Shape.index)
+    )
+
+
+def test_bulk_serialization_matches_as_dict(world: World):
+    shapes = get_shapes(world)
+    for user, dm in ((world.dm, True), (world.player, False)):
+        assert shapes_as_dict(shapes, user, dm) == [
+            shape.as_dict(user, dm) for shape in shapes
+        ]
+
+
+@pytest.mark.parametrize("dm", [True, False])
+def test_floor_query_count_does_not_depend_on_shape_count(dm: bool):
+    query_counts = []
+    # Every size contains all shape types, as each type is fetched with its own query
+    for shapes_per_layer in (len(SHAPE_TYPES), 10 * len(SHAPE_TYPES)):
+        world = create_world(shapes_per_layer)
+        user = world.dm if dm else world.player
+        floor = world.location.floors.order_by(Floor.index).get()
+        with log_queries() as queries:
+            floor.as_dict(user, dm)
+        query_counts.append(len(queries))
+
+    assert query_counts[0] == query_counts[1]
+    assert query_counts[1] <= 25
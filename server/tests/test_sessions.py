@@ -0,0 +1,50 @@
+import asyncio
+from typing import List
+
+from src.api.socket.player import set_player_role
+from src.app import sio
+from src.models import Floor, Layer, PlayerRoom, Shape
+from src.models.role import Role
+from src.models.shape.access import has_ownership_many
+from src.state.game import game_state
+
+from helpers import Emit, World, connect
+
+
+def test_role_downgrade_is_visible_to_the_next_ownership_check(
+    world: World, emitted: List[Emit], monkeypatch
+):
+    dm_shapes = [
+        shape.uuid
+        for shape in Shape.select()
+        .join(Layer)
+        .join(Floor)
+        .where(Floor.location == world.location, Layer.name == "dm")
+    ]
+    PlayerRoom.update(role=Role.DM).where(
+        PlayerRoom.player == world.player, PlayerRoom.room == world.room
+    ).execute()
+
+    # Keep the connection, as if it was still handling an event when its role changed
+    async def disconnect(sid: str, namespace=None):
+        pass
+
+    monkeypatch.setattr(sio, "disconnect", disconnect)
+
+    async def downgrade() -> str:
+        dm_sid = await connect(world.dm, world.room)
+        player_sid = await connect(world.player, world.room)
+        assert has_ownership_many(dm_shapes, game_state.get_session(player_sid))[0]
+
+        await set_player_role(
+            dm_sid, {"player": world.player.id, "role": Role.PLAYER.value}
+        )
+        return player_sid
+
+    player_sid = asyncio.run(downgrade())
+
+    session = game_state.get_session(player_sid)
+    assert session.role == Role.PLAYER
+    assert game_state.get(player_sid).role == Role.PLAYER
+    assert player_sid not in game_state.get_sids(room=world.room, role=Role.DM)
+    assert not has_ownership_many(dm_shapes, session)[0]
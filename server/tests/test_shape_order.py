@@ -0,0 +1,109 @@
+from typing import List
+
+import pytest
+
+from src.models import Floor, Layer, Shape
+from src.models.shape.order import (
+    SHAPE_INDEX_GAP,
+    get_index_for_rank,
+    rebalance_layer,
+)
+
+from helpers import World
+
+
+def get_layer(world: World) -> Layer:
+    return (
+        Layer.select()
+        .join(Floor)
+        .where(
+            Floor.location == world.location,
+            Floor.name == "ground",
+            Layer.name == "map",
+        )
+        .get()
+    )
+
+
+def get_order(layer: Layer) -> List[str]:
+    return [
+        shape.uuid
+        for shape in Shape.select(Shape.uuid)
+        .where(Shape.layer == layer)
+        .order_by(Shape.index)
+    ]
+
+
+def move(layer: Layer, uuid: str, rank: int) -> None:
+    shape = Shape.get_by_id(uuid)
+    shape.index = get_index_for_rank(layer, rank, shape)
+    shape.save()
+
+
+@pytest.mark.parametrize("rank", [0, 1, 5, 9, 100], ids=str)
+def test_move_to_rank(world: World, rank: int):
+    layer = get_layer(world)
+    rebalance_layer(layer)
+    order = get_order(layer)
+    moved = order.pop(3)
+    order.insert(rank, moved)
+
+    move(layer, moved, rank)
+
+    assert get_order(layer) == order
+
+
+def test_move_only_updates_the_moved_shape(world: World):
+    layer = get_layer(world)
+    rebalance_layer(layer)
+    order = get_order(layer)
+    indices = {s.uuid: s.index for s in Shape.select().where(Shape.layer == layer)}
+
+    move(layer, order[-1], 1)
+
+    changed = [
+        s.uuid
+        for s in Shape.select().where(Shape.layer == layer)
+        if s.index != indices[s.uuid]
+    ]
+    assert changed == [order[-1]]
+
+
+def test_rebalance_between_adjacent_shapes(world: World):
+    layer = get_layer(world)
+    # create_world numbers the shapes 0..n-1, so every neighbour is adjacent
+    order = get_order(layer)
+    assert sorted(s.index for s in Shape.select().where(Shape.layer == layer)) == list(
+        range(len(order))
+    )
+    moved = order.pop()
+    order.insert(4, moved)
+
+    move(layer, moved, 4)
+
+    assert get_order(layer) == order
+    indices = sorted(s.index for s in Shape.select().where(Shape.layer == layer))
+    assert all(
+        upper - lower >= SHAPE_INDEX_GAP // 2
+        for lower, upper in zip(indices, indices[1:])
+    )
+
+
+def test_rebalance_keeps_order(world: World):
+    layer = get_layer(world)
+    order = get_order(layer)
+
+    rebalance_layer(layer)
+
+    assert get_order(layer) == order
+    assert sorted(s.index for s in Shape.select().where(Shape.layer == layer)) == [
+        i * SHAPE_INDEX_GAP for i in range(len(order))
+    ]
+
+
+def test_empty_layer(world: World):
+    layer = get_layer(world)
+    Shape.delete().where(Shape.layer == layer).execute()
+
+    assert get_index_for_rank(layer, 0) == 0
+    assert get_index_for_rank(layer, 3) == 0
@@ -0,0 +1,104 @@
+import asyncio
+from typing import List
+
+import pytest
+
+from src.api.socket.shape import change_shape_layer, move_shape_order, remove_shapes
+from src.db_executor import db_executor
+from src.models import Floor, Layer, Shape
+
+from helpers import Emit, World, connect
+
+
+def get_layer_shapes(world: World, layer: str) -> List[Shape]:
+    return list(
+        Shape.select()
+        .join(Layer)
+        .join(Floor)
+        .where(
+            Floor.location == world.location,
+            Floor.name == "ground",
+            Layer.name == layer,
+        )
+        .order_by(Shape.index)
+    )
+
+
+def test_remove_shapes_in_a_single_write(
+    world: World, emitted: List[Emit], monkeypatch
+):
+    shapes = get_layer_shapes(world, "map")[:3]
+    uuids = [shape.uuid for shape in shapes]
+
+    writes = []
+    write = db_executor.write
+
+    async def record_write(fn, *args, **kwargs):
+        writes.append(fn.__name__)
+        return await write(fn, *args, **kwargs)
+
+    monkeypatch.setattr(db_executor, "write", record_write)
+
+    async def remove():
+        sid = await connect(world.dm, world.room)
+        await remove_shapes(sid, {"uuids": uuids, "temporary": False})
+
+    asyncio.run(remove())
+
+    assert Shape.select().where(Shape.uuid << uuids).count() == 0
+    # The initiative is updated per shape, the shapes are deleted together
+    assert [fn for fn in writes if "delete" in fn] == ["_delete_shapes"]
+
+
+def test_layer_change_and_order(world: World, emitted: List[Emit]):
+    moved = get_layer_shapes(world, "map")[:2]
+    tokens = get_layer_shapes(world, "tokens")
+
+    async def move():
+        sid = await connect(world.dm, world.room)
+        await change_shape_layer(
+            sid,
+            {"uuids": [s.uuid for s in moved], "layer": "tokens", "floor": "ground"},
+        )
+        await move_shape_order(
+            sid, {"uuid": moved[1].uuid, "index": 0, "temporary": False}
+        )
+
+    asyncio.run(move())
+
+    assert [s.uuid for s in get_layer_shapes(world, "tokens")] == [
+        moved[1].uuid,
+        *(s.uuid for s in tokens),
+        moved[0].uuid,
+    ]
+
+
+def test_set_option(world: World):
+    shape = get_layer_shapes(world, "map")[0]
+
+    Shape.set_option(shape.uuid, ["door", "permissions"], ["dm"])
+    Shape.set_option(shape.uuid, ["skipDraw"], True)
+
+    assert Shape.get_by_id(shape.uuid).get_options() == {
+        "key": 0,
+        "door": {"permissions": ["dm"]},
+        "skipDraw": True,
+    }
+    for key in ('a"b', "a\\b"):
+        with pytest.raises(ValueError):
+            Shape.set_option(shape.uuid, ["door", key], True)
+
+
+def test_executor_rejects_model_instances(world: World):
+    shape = get_layer_shapes(world, "map")[0]
+
+    async def write():
+        with pytest.raises(TypeError):
+            await db_executor.write(shape.save)
+        with pytest.raises(TypeError):
+            await db_executor.write(Shape.delete_by_id, [shape])
+        await db_executor.write(Shape.delete_by_id, shape.uuid)
+
+    asyncio.run(write())
+
+    assert Shape.get_or_none(uuid=shape.uuid) is None
@@ -0,0 +1,41 @@
+import asyncio
+from typing import List
+from uuid import uuid4
+
+from src.api.socket.asset_manager import assetmgmt_upload, drop_upload
+from src.api.socket.constants import ASSET_NS
+from src.app import sio
+from src.state.asset import asset_state
+from src.state.transfers import transfer_manager
+
+from helpers import Emit, World
+
+
+def test_duplicate_slices_are_reserved_once(world: World, emitted: List[Emit]):
+    uuid = str(uuid4())
+    data = b"x" * 100
+
+    async def upload() -> int:
+        sid = sio.manager.connect(uuid4().hex, ASSET_NS)
+        await asset_state.add_sid(sid, world.dm)
+        try:
+            for index in (0, 0, 2, 2):
+                await assetmgmt_upload(
+                    sid,
+                    {
+                        "uuid": uuid,
+                        "name": "map.png",
+                        "directory": 0,
+                        "newDirectories": [],
+                        "slice": index,
+                        "totalSlices": 3,
+                        "data": data,
+                    },
+                )
+            return transfer_manager.get_stats()["bytes"]["upload"]
+        finally:
+            drop_upload(uuid)
+            await asset_state.remove_sid(sid)
+
+    assert asyncio.run(upload()) == 2 * len(data)
+    assert transfer_manager.get_stats()["totalBytes"] == 0